@@ -8,6 +8,14 @@ from modules.pdf_converter import PDFConverter
 from modules.pdf_processor import PDFProcessor
 from utils.file_handler import FileManager
 from utils.session_manager import SessionManager
+from utils.result_cache import ResultCache
+from utils.zip_stream import ZipStream
+from utils.buffer_io import upload_view, deferred_download
+from utils.page_ranges import parse_pages, parse_ranges
+from utils.job_manager import JobManager, DONE, FAILED, CANCELLED
+from utils.instrumentation import Instrumentation, StreamlitSink, LoggingSink
+from utils.telemetry import Telemetry, size_of
+from utils.temp_storage import TempStorage
 
 # 页面配置
 st.set_page_config(
@@ -17,12 +25,61 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource
+def get_temp_storage():
+    """临时空间索引和后台清理线程在所有会话之间共享"""
+    storage = TempStorage(base_dir="temp")
+    storage.start_reaper()
+    return storage
+
+temp_storage = get_temp_storage()
+
 # 初始化会话管理器
 session_manager = SessionManager()
-session_manager.initialize_session()
+session_manager.initialize_session(temp_storage)
+upload_registry = session_manager.get_upload_registry(temp_storage)
+
+# 初始化文件管理器；过期清理由临时空间的后台线程按索引进行
+file_manager = FileManager(base_dir="temp", storage=temp_storage)
+
+@st.cache_resource
+def get_result_cache():
+    """结果缓存在所有会话和重跑之间共享"""
+    return ResultCache(base_dir="temp")
+
+result_cache = get_result_cache()
+
+@st.cache_resource
+def get_job_manager():
+    """后台任务进程池在所有会话和重跑之间共享"""
+    return JobManager(max_workers=4, max_jobs_per_session=2)
+
+job_manager = get_job_manager()
 
-# 初始化文件管理器
-file_manager = FileManager(base_dir="temp")
+@st.cache_resource
+def get_telemetry():
+    """各页面操作的指标在所有会话之间共享
+
+    设置 PDF_TOOLS_METRICS_FILE 时每次记录后写入该文件，设置 PDF_TOOLS_METRICS_PORT 时在该端口提供 /metrics
+    """
+    telemetry = Telemetry(metrics_path=os.environ.get("PDF_TOOLS_METRICS_FILE"))
+    telemetry.register_gauge("job_queue_depth", job_manager.queue_depth, "进程池中排队或运行中的后台任务数")
+    telemetry.register_gauge(
+        "temp_usage_bytes", lambda: temp_storage.usage()["usage_bytes"], "各会话登记的临时文件总大小"
+    )
+    telemetry.register_gauge(
+        "temp_reclaimed_bytes", lambda: temp_storage.usage()["reclaimed_bytes"], "临时空间累计回收的字节数"
+    )
+    port = os.environ.get("PDF_TOOLS_METRICS_PORT")
+    if port:
+        telemetry.serve(int(port), host=os.environ.get("PDF_TOOLS_METRICS_HOST", "127.0.0.1"))
+    return telemetry
+
+telemetry = get_telemetry()
+
+def request_instrumentation():
+    """页面内同步执行的操作：进度显示在进度条上，同时写结构化日志，阶段耗时计入指标"""
+    return Instrumentation(StreamlitSink(st.progress(0.0)), LoggingSink(), telemetry)
 
 def get_output_filename(original_filename, prefix):
     """生成输出文件名，保留原始文件名"""
@@ -34,27 +91,110 @@ def get_output_filename(original_filename, prefix):
     return f"{name}_{prefix}{new_ext}"
 
 def save_uploaded_file(uploaded_file, work_dir):
-    """保存上传的文件并返回保存路径"""
+    """保存上传的文件并返回保存路径；同一上传在重跑时只保存一次"""
     if not os.path.exists(work_dir):
         os.makedirs(work_dir)
-    file_path = os.path.join(work_dir, uploaded_file.name)
-    with open(file_path, "wb") as f:
-        f.write(uploaded_file.getbuffer())
-    return file_path
+    return upload_registry.register(uploaded_file, work_dir)["path"]
+
+def work_output(prefix):
+    """会话工作目录中的输出路径，用于直接处理内存中的上传内容"""
+    return os.path.join(st.session_state.work_dir, f"{prefix}_{int(time.time())}.pdf")
+
+def job_output_dir():
+    """后台任务的输出目录；每个任务单独一个子目录，同一会话中并发的任务不会写入同一个文件"""
+    return os.path.join(st.session_state.work_dir, "jobs", uuid.uuid4().hex)
 
 def process_download(output_path, original_filename, prefix):
-    """处理文件下载"""
+    """处理文件下载；大文件返回延迟读取的函数，点击下载时才读取文件"""
     try:
         if os.path.exists(output_path):
-            with open(output_path, "rb") as file:
-                output_filename = get_output_filename(original_filename, prefix)
-                file_bytes = file.read()
-                return file_bytes, output_filename
+            # 会话目录中的输出计入会话配额（结果缓存中的文件由缓存自身淘汰）
+            if os.path.abspath(output_path).startswith(os.path.abspath(st.session_state.work_dir) + os.sep):
+                temp_storage.track(st.session_state.session_id, output_path)
+            output_filename = get_output_filename(original_filename, prefix)
+            return deferred_download(output_path), output_filename
         return None, None
     except Exception as e:
         st.error(f"文件处理失败: {str(e)}")
         return None, None
 
+def start_job(job_key, owner, input_paths, operation, target, method, *args, page, cache_params=None, **kwargs):
+    """提交后台任务；结果缓存命中时直接记录缓存路径
+    :param job_key: 在session_state中保存任务信息的键
+    :param owner: 标识任务所属的输入和参数（如上传文件路径和水印设置），变化后旧结果不再显示
+    :param page: 发起任务的页面，用于指标标签
+    :param cache_params: 参与缓存键计算的参数
+    """
+    cache_key = result_cache.make_key(input_paths, operation, **(cache_params or {}))
+    cached_path = result_cache.get(cache_key)
+    if cached_path:
+        telemetry.record(page, operation, status="cached")
+        st.session_state[job_key] = {"owner": owner, "result_path": cached_path}
+        return
+    
+    try:
+        job_id = job_manager.submit(st.session_state.work_dir, target, method, *args, **kwargs)
+    except RuntimeError as e:
+        telemetry.record(page, operation, status="rejected", error="SessionJobLimit")
+        st.error(str(e))
+        return
+    # 任务运行期间输入文件不参与配额淘汰
+    temp_storage.pin(job_id, input_paths)
+    st.session_state[job_key] = {
+        "owner": owner, "job_id": job_id, "cache_key": cache_key,
+        "page": page, "operation": operation, "input_size": size_of(input_paths)
+    }
+
+def record_job(info, status):
+    """任务结束时记录指标；每个任务只在轮询到结束状态时记录一次"""
+    state = status["state"]
+    seconds = queue_seconds = None
+    if state != CANCELLED and status.get("finished_at"):
+        seconds = status["finished_at"] - status["submitted_at"]
+    if status.get("started_at"):
+        queue_seconds = status["started_at"] - status["submitted_at"]
+    telemetry.record(
+        info["page"], info["operation"], seconds,
+        status={DONE: "ok", FAILED: "failed", CANCELLED: "cancelled"}[state],
+        error=status.get("error_type", "Exception") if state == FAILED else None,
+        input_size=info["input_size"],
+        output_size=size_of(status["result"]) if state == DONE else None,
+        queue_seconds=queue_seconds
+    )
+
+def poll_job(job_key, owner):
+    """轮询后台任务；完成时返回结果路径，未完成时显示进度并自动刷新"""
+    info = st.session_state.get(job_key)
+    if not info or info["owner"] != owner:
+        return None
+    if "result_path" in info:
+        return info["result_path"]
+    
+    status = job_manager.status(st.session_state.work_dir, info["job_id"])
+    if status["state"] in (DONE, FAILED, CANCELLED):
+        temp_storage.unpin(info["job_id"])
+    if status["state"] == DONE:
+        record_job(info, status)
+        info["result_path"] = result_cache.put(info["cache_key"], status["result"])
+        return info["result_path"]
+    if status["state"] in (FAILED, CANCELLED):
+        record_job(info, status)
+        del st.session_state[job_key]
+        if status["state"] == FAILED:
+            st.error(f"处理失败: {status['error']}")
+        else:
+            st.warning("任务已取消")
+        return None
+    
+    # 排队或运行中
+    label = "排队中..." if status["state"] == "queued" else "处理中..."
+    st.progress(status["progress"], text=label)
+    if st.button("取消任务", key=f"cancel_{job_key}"):
+        job_manager.cancel(st.session_state.work_dir, info["job_id"])
+        st.rerun()
+    time.sleep(1)
+    st.rerun()
+
 def main():
     st.title("PDF工具集")
     
@@ -65,6 +205,26 @@ def main():
         ["PDF转Word", "PDF处理工具", "PDF合并", "提取图片", "添加水印"]
     )
     
+    # 结果缓存命中统计
+    cache_stats = result_cache.stats()
+    st.sidebar.caption(
+        f"结果缓存: 命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']}"
+        f"（命中率 {cache_stats['hit_rate']:.0%}）"
+    )
+    st.sidebar.caption(f"后台任务队列: {job_manager.queue_depth()}")
+    
+    # 临时空间占用
+    storage_usage = temp_storage.usage(st.session_state.session_id)
+    mb = 1024 * 1024
+    st.sidebar.caption(
+        f"临时空间: 本会话 {storage_usage['session_bytes'] / mb:.1f} / {storage_usage['session_quota_bytes'] / mb:.0f} MB，"
+        f"全部 {storage_usage['usage_bytes'] / mb:.1f} / {storage_usage['budget_bytes'] / mb:.0f} MB，"
+        f"已回收 {storage_usage['reclaimed_bytes'] / mb:.1f} MB"
+    )
+    if st.sidebar.button("清空本会话文件"):
+        reclaimed = session_manager.clear_session(temp_storage)
+        st.sidebar.success(f"已清理 {reclaimed / mb:.1f} MB")
+    
     # 根据选择显示不同功能
     if option == "PDF转Word":
         pdf_to_word_page()
@@ -88,19 +248,22 @@ def pdf_to_word_page():
             pdf_path = save_uploaded_file(uploaded_file, st.session_state.work_dir)
             
             if st.button("转换为Word"):
-                with st.spinner("正在转换..."):
-                    converter = PDFConverter()
-                    docx_path = converter.pdf_to_word(pdf_path)
-                    
-                    # 显示下载按钮
-                    file_bytes, output_filename = process_download(docx_path, uploaded_file.name, "converted")
-                    if file_bytes:
-                        st.download_button(
-                            label="下载Word文档",
-                            data=file_bytes,
-                            file_name=output_filename,
-                            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                        )
+                start_job(
+                    "pdf_to_word_job", pdf_path, pdf_path, "pdf_to_word", "converter", "pdf_to_word", pdf_path,
+                    output_dir=job_output_dir(), page="pdf_to_word"
+                )
+            
+            docx_path = poll_job("pdf_to_word_job", pdf_path)
+            if docx_path:
+                # 显示下载按钮
+                file_bytes, output_filename = process_download(docx_path, uploaded_file.name, "converted")
+                if file_bytes:
+                    st.download_button(
+                        label="下载Word文档",
+                        data=file_bytes,
+                        file_name=output_filename,
+                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                    )
         except Exception as e:
             st.error(f"转换失败: {str(e)}")
 
@@ -119,14 +282,38 @@ def pdf_tools_page():
             ["加密PDF", "解密PDF", "压缩PDF", "PDF拆分", "PDF旋转"]
         )
         
+        # 只用于读取页数、加密状态等；各操作在执行时另建带进度条的处理器，缓存命中时不显示进度条
         processor = PDFProcessor()
         
         if tool_option == "加密PDF":
             password = st.text_input("设置密码", type="password")
+            algorithm = st.selectbox("加密算法", ["AES-256", "AES-128", "RC4-128"])
+            permission_labels = {
+                "print": "打印", "print_hq": "高质量打印", "copy": "复制内容", "modify": "修改文档",
+                "annotate": "添加注释", "form": "填写表单", "accessibility": "辅助功能提取", "assemble": "组合页面",
+            }
+            permissions = st.multiselect(
+                "允许的操作", list(permission_labels), default=list(permission_labels),
+                format_func=permission_labels.get
+            )
+            owner_password = None
+            if set(permissions) != set(permission_labels):
+                # 限制了权限时需要单独的所有者密码，之后凭它解除限制
+                owner_password = st.text_input("所有者密码（用于解除权限限制，需与打开密码不同）", type="password")
             if st.button("加密") and password:
                 with st.spinner("正在加密..."):
                     try:
-                        output_path = processor.encrypt_pdf(pdf_path, password)
+                        with telemetry.track("pdf_tools", "encrypt_pdf", pdf_path) as span:
+                            output_path = result_cache.get_or_compute(
+                                pdf_path, "encrypt_pdf",
+                                lambda: PDFProcessor(instrumentation=request_instrumentation()).encrypt_pdf(
+                                    upload_view(uploaded_file), password, output=work_output("encrypted"),
+                                    algorithm=algorithm, permissions=permissions, owner_password=owner_password
+                                ),
+                                password=password, algorithm=algorithm, permissions=sorted(permissions),
+                                owner_password=owner_password
+                            )
+                            span.set_output(output_path)
                         file_bytes, output_filename = process_download(output_path, uploaded_file.name, "encrypted")
                         if file_bytes:
                             st.download_button(
@@ -139,11 +326,24 @@ def pdf_tools_page():
                         st.error(f"加密失败: {str(e)}")
                         
         elif tool_option == "解密PDF":
+            encrypted = upload_registry.cached(
+                pdf_path, "encrypted", lambda: processor.get_document_index(pdf_path).encrypted
+            )
+            if not encrypted:
+                st.info("该文件未加密")
             password = st.text_input("输入密码", type="password")
             if st.button("解密") and password:
                 with st.spinner("正在解密..."):
                     try:
-                        output_path = processor.decrypt_pdf(pdf_path, password)
+                        with telemetry.track("pdf_tools", "decrypt_pdf", pdf_path) as span:
+                            output_path = result_cache.get_or_compute(
+                                pdf_path, "decrypt_pdf",
+                                lambda: PDFProcessor(instrumentation=request_instrumentation()).decrypt_pdf(
+                                    upload_view(uploaded_file), password, output=work_output("decrypted")
+                                ),
+                                password=password
+                            )
+                            span.set_output(output_path)
                         file_bytes, output_filename = process_download(output_path, uploaded_file.name, "decrypted")
                         if file_bytes:
                             st.download_button(
@@ -156,10 +356,30 @@ def pdf_tools_page():
                         st.error("密码错误或PDF解密失败")
                         
         elif tool_option == "压缩PDF":
+            profile = st.selectbox(
+                "压缩级别",
+                ["screen", "ebook", "print"],
+                index=1,
+                format_func=lambda p: {"screen": "屏幕（72 DPI）", "ebook": "电子书（150 DPI）", "print": "打印（300 DPI）"}[p]
+            )
             if st.button("压缩"):
                 with st.spinner("正在压缩..."):
                     try:
-                        output_path = processor.compress_pdf(pdf_path)
+                        with telemetry.track("pdf_tools", "compress_pdf", pdf_path) as span:
+                            compress_processor = PDFProcessor(instrumentation=request_instrumentation())
+                            output_path, report = compress_processor.compress_pdf(
+                                pdf_path, profile=profile, return_report=True
+                            )
+                            span.set_output(output_path)
+                        
+                        # 显示各类别节省的字节数
+                        st.write(f"压缩前: {report['input_size'] / 1024:.1f} KB，压缩后: {report['output_size'] / 1024:.1f} KB")
+                        category_names = {"images": "图片", "fonts": "字体", "content": "内容流", "other_streams": "其他流", "structure": "对象结构"}
+                        st.table({
+                            "类别": [category_names[k] for k in report["saved"]],
+                            "节省(KB)": [round(v / 1024, 1) for v in report["saved"].values()]
+                        })
+                        
                         file_bytes, output_filename = process_download(output_path, uploaded_file.name, "compressed")
                         if file_bytes:
                             st.download_button(
@@ -172,16 +392,62 @@ def pdf_tools_page():
                         st.error(f"压缩失败: {str(e)}")
                         
         elif tool_option == "PDF拆分":
-            total_pages = processor.get_page_count(pdf_path)
+            total_pages = upload_registry.cached(pdf_path, "page_count", lambda: processor.get_page_count(pdf_path))
             st.write(f"总页数: {total_pages}")
             
-            start_page = st.number_input("起始页", min_value=1, max_value=total_pages, value=1)
-            end_page = st.number_input("结束页", min_value=start_page, max_value=total_pages, value=total_pages)
+            split_mode = st.radio("拆分方式", ["单个范围", "多个范围", "每N页", "按书签"], horizontal=True)
             
-            if st.button("拆分"):
+            if split_mode != "单个范围":
+                split_options = {}
+                if split_mode == "多个范围":
+                    range_input = st.text_input("页码范围（如：1-3,4-10,11-）")
+                    split_options["ranges"] = None
+                    if range_input.strip():
+                        try:
+                            split_options["ranges"] = parse_ranges(range_input, total_pages)
+                        except ValueError as e:
+                            st.error(str(e))
+                elif split_mode == "每N页":
+                    split_options["chunk_size"] = st.number_input("每个文件的页数", min_value=1, max_value=total_pages, value=min(10, total_pages))
+                else:
+                    split_options["bookmark_level"] = st.number_input("书签层级", min_value=1, max_value=9, value=1)
+                
+                if st.button("拆分", disabled=not any(value is not None for value in split_options.values())):
+                    with st.spinner("正在拆分..."):
+                        try:
+                            # 源文件只解析一次，各部分并行写出后直接打包为ZIP
+                            split_processor = PDFProcessor(instrumentation=request_instrumentation())
+                            with telemetry.track("pdf_tools", "split_pdf_multi", pdf_path) as span, \
+                                    ZipStream(dir=st.session_state.work_dir) as archive:
+                                part_count = split_processor.split_pdf_zip(pdf_path, archive, **split_options)
+                                zip_file = archive.finish()
+                                span.set_output(zip_file)
+                                st.success(f"已拆分为 {part_count} 个文件")
+                                st.download_button(
+                                    label="下载拆分结果(ZIP)",
+                                    data=zip_file.read(),
+                                    file_name=f"{os.path.splitext(uploaded_file.name)[0]}_split.zip",
+                                    mime="application/zip"
+                                )
+                        except Exception as e:
+                            st.error(f"拆分失败: {str(e)}")
+            
+            else:
+                start_page = st.number_input("起始页", min_value=1, max_value=total_pages, value=1)
+                end_page = st.number_input("结束页", min_value=start_page, max_value=total_pages, value=total_pages)
+            
+            if split_mode == "单个范围" and st.button("拆分"):
                 with st.spinner("正在拆分..."):
                     try:
-                        output_path = processor.split_pdf(pdf_path, start_page, end_page)
+                        with telemetry.track("pdf_tools", "split_pdf", pdf_path) as span:
+                            output_path = result_cache.get_or_compute(
+                                pdf_path, "split_pdf",
+                                lambda: PDFProcessor(instrumentation=request_instrumentation()).split_pdf(
+                                    upload_view(uploaded_file), start_page, end_page, output=work_output("split")
+                                ),
+                                start_page=start_page, end_page=end_page
+                            )
+                            span.set_output(output_path)
                         file_bytes, output_filename = process_download(output_path, uploaded_file.name, f"split_{start_page}-{end_page}")
                         if file_bytes:
                             st.download_button(
@@ -195,7 +461,7 @@ def pdf_tools_page():
                         
         elif tool_option == "PDF旋转":
             # 获取总页数
-            total_pages = processor.get_page_count(pdf_path)
+            total_pages = upload_registry.cached(pdf_path, "page_count", lambda: processor.get_page_count(pdf_path))
             st.write(f"总页数: {total_pages}")
             
             # 旋转选项
@@ -209,21 +475,24 @@ def pdf_tools_page():
                 page_input = st.text_input("输入页码（例如：1,3,5-7）")
                 if page_input:
                     try:
-                        pages = []
-                        for part in page_input.split(','):
-                            if '-' in part:
-                                start, end = map(int, part.split('-'))
-                                pages.extend(range(start, end + 1))
-                            else:
-                                pages.append(int(part))
-                    except:
-                        st.error("页码格式无效")
+                        pages = parse_pages(page_input, total_pages)
+                    except ValueError as e:
+                        st.error(str(e))
                         return
             
             if st.button("旋转"):
                 with st.spinner("正在旋转..."):
                     try:
-                        output_path = processor.rotate_pdf(pdf_path, rotation_angle, pages)
+                        with telemetry.track("pdf_tools", "rotate_pdf", pdf_path) as span:
+                            output_path = result_cache.get_or_compute(
+                                pdf_path, "rotate_pdf",
+                                # 只修改各页的 /Rotate：复制已保存的上传文件后追加增量更新，不重写整个文档
+                                lambda: PDFProcessor(instrumentation=request_instrumentation()).rotate_pdf(
+                                    pdf_path, rotation_angle, pages, output=work_output("rotated"), incremental=True
+                                ),
+                                rotation_angle=rotation_angle, pages=pages
+                            )
+                            span.set_output(output_path)
                         # 生成旋转文件名后缀
                         rotate_suffix = f"rotated_{rotation_angle}deg"
                         if pages != 'all':
@@ -252,12 +521,12 @@ def merge_pdfs_page():
     
     if uploaded_file:
         # 检查文件是否已经上传
-        if uploaded_file.name not in [f.name for f in st.session_state.uploaded_pdfs]:
+        if uploaded_file.name not in [f["name"] for f in st.session_state.uploaded_pdfs]:
             # 保存上传的文件
             pdf_path = save_uploaded_file(uploaded_file, st.session_state.work_dir)
-            # 将文件信息添加到列表
-            st.session_state.uploaded_pdfs.append(uploaded_file)
-            st.experimental_rerun()
+            # 记录文件名和登记后的保存路径，合并时使用实际保存的文件
+            st.session_state.uploaded_pdfs.append({"name": uploaded_file.name, "path": pdf_path})
+            st.rerun()
     
     # 显示已上传的文件
     if st.session_state.uploaded_pdfs:
@@ -265,11 +534,11 @@ def merge_pdfs_page():
         for i, pdf in enumerate(st.session_state.uploaded_pdfs):
             col1, col2 = st.columns([3, 1])
             with col1:
-                st.write(f"{i+1}. {pdf.name}")
+                st.write(f"{i+1}. {pdf['name']}")
             with col2:
                 if st.button("删除", key=f"del_{i}"):
                     st.session_state.uploaded_pdfs.pop(i)
-                    st.experimental_rerun()
+                    st.rerun()
         
         # 文件排序
         if len(st.session_state.uploaded_pdfs) > 1:
@@ -286,35 +555,41 @@ def merge_pdfs_page():
                 st.error("序号格式无效")
                 return
             
+            # 按指定顺序获取文件路径
+            pdf_paths = [st.session_state.uploaded_pdfs[i]["path"] for i in new_order]
+            owner = "|".join(pdf_paths)
+            
             # 合并按钮
             if st.button("合并PDF"):
-                with st.spinner("正在合并..."):
-                    try:
-                        processor = PDFProcessor()
-                        # 按指定顺序获取文件路径
-                        pdf_paths = [os.path.join(st.session_state.work_dir, st.session_state.uploaded_pdfs[i].name) for i in new_order]
-                        output_path = processor.merge_pdfs(pdf_paths, st.session_state.work_dir)
-                        
-                        # 生成合并后的文件名（使用所有文件名的前缀）
-                        merged_names = "_".join(os.path.splitext(st.session_state.uploaded_pdfs[i].name)[0] for i in new_order)
-                        if len(merged_names) > 100:  # 如果名字太长，只使用第一个文件名
-                            merged_names = os.path.splitext(st.session_state.uploaded_pdfs[new_order[0]].name)[0]
-                        
-                        file_bytes, output_filename = process_download(output_path, f"{merged_names}.pdf", "merged")
-                        if file_bytes:
-                            st.download_button(
-                                label="下载合并后的PDF",
-                                data=file_bytes,
-                                file_name=output_filename,
-                                mime="application/pdf"
-                            )
-                    except Exception as e:
-                        st.error(f"合并失败: {str(e)}")
+                try:
+                    start_job(
+                        "merge_pdfs_job", owner, pdf_paths, "merge_pdfs",
+                        "processor", "merge_pdfs", pdf_paths, job_output_dir(), streaming=True,
+                        page="merge_pdfs"
+                    )
+                except Exception as e:
+                    st.error(f"合并失败: {str(e)}")
+            
+            output_path = poll_job("merge_pdfs_job", owner)
+            if output_path:
+                # 生成合并后的文件名（使用所有文件名的前缀）
+                merged_names = "_".join(os.path.splitext(st.session_state.uploaded_pdfs[i]["name"])[0] for i in new_order)
+                if len(merged_names) > 100:  # 如果名字太长，只使用第一个文件名
+                    merged_names = os.path.splitext(st.session_state.uploaded_pdfs[new_order[0]]["name"])[0]
+                
+                file_bytes, output_filename = process_download(output_path, f"{merged_names}.pdf", "merged")
+                if file_bytes:
+                    st.download_button(
+                        label="下载合并后的PDF",
+                        data=file_bytes,
+                        file_name=output_filename,
+                        mime="application/pdf"
+                    )
         
         # 清空按钮
         if st.button("清空所有"):
             st.session_state.uploaded_pdfs = []
-            st.experimental_rerun()
+            st.rerun()
     else:
         st.info("请上传需要合并的PDF文件")
 
@@ -337,48 +612,51 @@ def extract_images_page():
         if st.button("提取图片"):
             with st.spinner("正在提取图片..."):
                 try:
-                    processor = PDFProcessor()
-                    image_paths = processor.extract_images(
-                        pdf_path, 
-                        st.session_state.work_dir,
-                        image_type=image_type,  
-                        min_size=min_size
-                    )
+                    processor = PDFProcessor(instrumentation=request_instrumentation())
                     
-                    if image_paths:
-                        st.success(f"成功提取 {len(image_paths)} 张图片")
-                        
-                        # 创建zip文件
-                        import zipfile
-                        zip_path = os.path.join(st.session_state.work_dir, "images.zip")
-                        with zipfile.ZipFile(zip_path, 'w') as zipf:
-                            for img_path in image_paths:
-                                zipf.write(img_path, os.path.basename(img_path))
-                        
-                        # 提供zip下载
-                        with open(zip_path, "rb") as f:
-                            st.download_button(
-                                label="下载所有图片(ZIP)",
-                                data=f,
-                                file_name=f"{os.path.splitext(uploaded_file.name)[0]}_images.zip",
-                                mime="application/zip"
-                            )
-                        
-                        # 预览图片
-                        st.write("图片预览：")
-                        cols = st.columns(3)
-                        for i, img_path in enumerate(image_paths):
+                    # 结果和下载区域在预览之前占位，提取完成后再填充
+                    summary = st.empty()
+                    zip_area = st.empty()
+                    st.write("图片预览：")
+                    cols = st.columns(3)
+                    
+                    # 边提取边预览，图片字节直接写入ZIP，不落地为中间文件
+                    image_count = 0
+                    with telemetry.track("extract_images", "extract_images", pdf_path) as span, \
+                            ZipStream(dir=st.session_state.work_dir) as archive:
+                        for record in processor.iter_images(
+                            pdf_path,
+                            None,
+                            image_type=image_type,
+                            min_size=min_size
+                        ):
+                            archive.add(record["name"], record["data"])
+                            i = image_count
+                            image_count += 1
                             with cols[i % 3]:
-                                st.image(img_path, caption=f"图片 {i+1}")
-                                with open(img_path, "rb") as img_file:
-                                    st.download_button(
-                                        label=f"下载图片 {i+1}",
-                                        data=img_file,
-                                        file_name=os.path.basename(img_path),
-                                        mime=f"image/{os.path.splitext(img_path)[1][1:]}"
-                                    )
+                                st.image(record["data"], caption=f"图片 {i+1}（第{record['page']}页）")
+                                st.download_button(
+                                    label=f"下载图片 {i+1}",
+                                    data=record["data"],
+                                    file_name=record["name"],
+                                    mime=f"image/{record['ext']}"
+                                )
+                        zip_file = archive.finish()
+                        span.set_output(zip_file)
+                    
+                    if image_count:
+                        summary.success(f"成功提取 {image_count} 张图片")
+                        
+                        # 提供zip下载（归档只在此处读取一次）
+                        zip_area.download_button(
+                            label="下载所有图片(ZIP)",
+                            data=zip_file.read(),
+                            file_name=f"{os.path.splitext(uploaded_file.name)[0]}_images.zip",
+                            mime="application/zip"
+                        )
                     else:
-                        st.warning("未找到符合条件的图片")
+                        summary.warning("未找到符合条件的图片")
+                    zip_file.close()
                         
                 except Exception as e:
                     st.error(f"提取图片失败: {str(e)}")
@@ -396,8 +674,6 @@ def add_watermark_page():
         watermark_type = st.radio("水印类型", ["文字水印", "图片水印"])
         
         try:
-            processor = PDFProcessor()
-            
             if watermark_type == "文字水印":
                 # 文字水印选项
                 col1, col2 = st.columns(2)
@@ -413,33 +689,43 @@ def add_watermark_page():
                 # 将颜色转换为RGB元组
                 color = tuple(int(color.lstrip('#')[i:i+2], 16) for i in (0, 2, 4))
                 
+                # 参数变化后旧结果不再显示
+                owner = (pdf_path, watermark_text, font_size, opacity, angle, color)
                 if st.button("添加水印"):
-                    with st.spinner("正在添加水印..."):
-                        try:
-                            output_path = processor.add_watermark(
-                                pdf_path,
-                                watermark_text,
-                                st.session_state.work_dir,
-                                font_size=font_size,
-                                opacity=opacity,
-                                angle=angle,
-                                color=color
-                            )
-                            
-                            file_bytes, output_filename = process_download(
-                                output_path,
-                                uploaded_file.name,
-                                f"watermark_text"
-                            )
-                            if file_bytes:
-                                st.download_button(
-                                    label="下载添加水印的PDF",
-                                    data=file_bytes,
-                                    file_name=output_filename,
-                                    mime="application/pdf"
-                                )
-                        except Exception as e:
-                            st.error(f"添加水印失败: {str(e)}")
+                    start_job(
+                        "text_watermark_job", owner, pdf_path, "add_watermark",
+                        "processor", "add_watermark",
+                        pdf_path,
+                        watermark_text,
+                        job_output_dir(),
+                        font_size=font_size,
+                        opacity=opacity,
+                        angle=angle,
+                        color=color,
+                        page="add_watermark",
+                        cache_params={
+                            "watermark_text": watermark_text,
+                            "font_size": font_size,
+                            "opacity": opacity,
+                            "angle": angle,
+                            "color": color
+                        }
+                    )
+                
+                output_path = poll_job("text_watermark_job", owner)
+                if output_path:
+                    file_bytes, output_filename = process_download(
+                        output_path,
+                        uploaded_file.name,
+                        f"watermark_text"
+                    )
+                    if file_bytes:
+                        st.download_button(
+                            label="下载添加水印的PDF",
+                            data=file_bytes,
+                            file_name=output_filename,
+                            mime="application/pdf"
+                        )
             
             else:  # 图片水印
                 uploaded_image = st.file_uploader("上传水印图片", type=["png", "jpg", "jpeg"], key="watermark_image")
@@ -457,31 +743,34 @@ def add_watermark_page():
                     with col2:
                         opacity = st.slider("不透明度", 0.1, 1.0, 0.3, 0.1)
                     
+                    owner = (pdf_path, image_path, scale, opacity)
                     if st.button("添加水印"):
-                        with st.spinner("正在添加水印..."):
-                            try:
-                                output_path = processor.add_image_watermark(
-                                    pdf_path,
-                                    image_path,
-                                    st.session_state.work_dir,
-                                    scale=scale,
-                                    opacity=opacity
-                                )
-                                
-                                file_bytes, output_filename = process_download(
-                                    output_path,
-                                    uploaded_file.name,
-                                    f"watermark_image"
-                                )
-                                if file_bytes:
-                                    st.download_button(
-                                        label="下载添加水印的PDF",
-                                        data=file_bytes,
-                                        file_name=output_filename,
-                                        mime="application/pdf"
-                                    )
-                            except Exception as e:
-                                st.error(f"添加水印失败: {str(e)}")
+                        start_job(
+                            "image_watermark_job", owner, [pdf_path, image_path], "add_image_watermark",
+                            "processor", "add_image_watermark",
+                            pdf_path,
+                            image_path,
+                            job_output_dir(),
+                            scale=scale,
+                            opacity=opacity,
+                            page="add_watermark",
+                            cache_params={"scale": scale, "opacity": opacity}
+                        )
+                    
+                    output_path = poll_job("image_watermark_job", owner)
+                    if output_path:
+                        file_bytes, output_filename = process_download(
+                            output_path,
+                            uploaded_file.name,
+                            f"watermark_image"
+                        )
+                        if file_bytes:
+                            st.download_button(
+                                label="下载添加水印的PDF",
+                                data=file_bytes,
+                                file_name=output_filename,
+                                mime="application/pdf"
+                            )
                 
         except Exception as e:
             st.error(f"处理失败: {str(e)}")
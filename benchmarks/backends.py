@@ -0,0 +1,154 @@
+"""pypdf / PyMuPDF 后端对比
+
+示例:
+    python -m benchmarks.backends --scale small
+
+对每个样本分别用两个后端执行页面操作，检查输出是否等价（页数、每页文字、旋转角度、页面尺寸），
+记录耗时，并列出pypdf更快的样本（modules.pdf_backends.AUTO_BACKEND 的依据）。
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import statistics
+import fitz  # PyMuPDF
+from benchmarks.fixtures import build_fixtures, make_text_pdf
+from modules.pdf_backends import BACKENDS, AUTO_BACKEND
+
+PASSWORD = "benchmark"
+
+# pypdf的AES需要额外安装cryptography，对比时两个后端统一使用RC4-128
+ALGORITHM = "RC4-128"
+
+
+def page_signature(pdf_path, password=None):
+    """输出的可比较特征：每页的 (文字, 旋转角度, 页面尺寸)"""
+    with fitz.open(pdf_path) as doc:
+        if doc.needs_pass and not doc.authenticate(password or ""):
+            raise ValueError(f"无法打开: {pdf_path}")
+        return [
+            (
+                " ".join(page.get_text().split()),
+                page.rotation,
+                (round(page.mediabox.width, 2), round(page.mediabox.height, 2)),
+            )
+            for page in doc
+        ]
+
+
+def _operations(source, sources, page_count):
+    """操作名 -> (调用函数(后端, 输出路径), 打开输出所需的密码)"""
+    half = max(1, page_count // 2)
+    odd_pages = set(range(0, page_count, 2))
+    return {
+        "split": (lambda b, out: b.split(source, out, 1, half), None),
+        "merge": (lambda b, out: b.merge(sources, out), None),
+        "rotate_all": (lambda b, out: b.rotate(source, out, 90), None),
+        "rotate_odd": (lambda b, out: b.rotate(source, out, 270, odd_pages), None),
+        "encrypt": (lambda b, out: b.encrypt(source, out, PASSWORD, ALGORITHM), PASSWORD),
+    }
+
+
+def _time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def run_case(case, source, work_dir, repeat, sources=None, only=None):
+    """对单个样本运行全部操作
+    :param only: 只运行这些操作
+    :return: 结果列表，每项包含操作、输入大小、各后端耗时以及是否等价
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    sources = sources or [source, source]
+    page_count = BACKENDS["pypdf"].page_count(source)
+    input_size = sum(os.path.getsize(path) for path in sources) if case == "merge" else os.path.getsize(source)
+
+    operations = _operations(source, sources, page_count)
+    # 加密输出再用两个后端解密，确认交叉兼容
+    encrypted = os.path.join(work_dir, "encrypted_input.pdf")
+    BACKENDS["pypdf"].encrypt(source, encrypted, PASSWORD, ALGORITHM)
+    operations["decrypt"] = (lambda b, out: b.decrypt(encrypted, out, PASSWORD), None)
+
+    results = []
+    for name, (call, password) in operations.items():
+        if only and name not in only:
+            continue
+        timings, signatures, sizes = {}, {}, {}
+        for backend_name, backend in BACKENDS.items():
+            output_path = os.path.join(work_dir, f"{name}_{backend_name}.pdf")
+            timings[backend_name] = _time(lambda: call(backend, output_path), repeat)
+            signatures[backend_name] = page_signature(output_path, password)
+            sizes[backend_name] = os.path.getsize(output_path)
+        reference = signatures["pypdf"]
+        results.append({
+            "case": case,
+            "operation": name,
+            "input_size": input_size,
+            "pages": len(reference),
+            "seconds": timings,
+            "output_size": sizes,
+            "equivalent": all(signature == reference for signature in signatures.values()),
+        })
+    return results
+
+
+def pypdf_faster(results):
+    """pypdf比PyMuPDF更快的结果；为空时 'auto' 总是使用PyMuPDF是合理的"""
+    return [result for result in results if result["seconds"]["pypdf"] < result["seconds"]["pymupdf"]]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="pypdf / PyMuPDF 后端对比")
+    parser.add_argument("--scale", choices=["small", "medium", "large"], default="small", help="样本规模")
+    parser.add_argument("--repeat", type=int, default=3, help="每个操作重复运行的次数")
+    parser.add_argument("--fixtures", default=os.path.join("temp", "benchmarks"), help="样本和临时文件目录")
+    args = parser.parse_args(argv)
+
+    fixtures = build_fixtures(args.fixtures, args.scale)
+    # 额外的小样本，确认小文件上PyMuPDF同样更快
+    tiny = make_text_pdf(os.path.join(args.fixtures, args.scale, "tiny.pdf"), 2, lines_per_page=10)
+    cases = {
+        "tiny": tiny,
+        "text_only": fixtures["text_only"],
+        "image_heavy": fixtures["image_heavy"],
+        "many_pages": fixtures["many_pages"],
+    }
+
+    work_root = os.path.join(args.fixtures, "work", "backends")
+    results = []
+    for case, source in cases.items():
+        results.extend(run_case(case, source, os.path.join(work_root, case), args.repeat))
+    results.extend(run_case(
+        "merge", fixtures["many_small_files"][0], os.path.join(work_root, "merge"), args.repeat,
+        sources=fixtures["many_small_files"], only=("merge",)
+    ))
+    shutil.rmtree(work_root, ignore_errors=True)
+
+    print(f"{'样本/操作':<28} {'输入KB':>10} {'页数':>6} {'pypdf':>9} {'pymupdf':>9} {'倍数':>7} "
+          f"{'输出KB(pypdf/pymupdf)':>24}  等价")
+    for result in results:
+        seconds, sizes = result["seconds"], result["output_size"]
+        speedup = seconds["pypdf"] / seconds["pymupdf"] if seconds["pymupdf"] else float("inf")
+        print(f"{result['case'] + '/' + result['operation']:<28} {result['input_size'] / 1024:>10.1f} "
+              f"{result['pages']:>6} {seconds['pypdf']:>9.4f} {seconds['pymupdf']:>9.4f} {speedup:>6.1f}x "
+              f"{sizes['pypdf'] / 1024:>12.1f}/{sizes['pymupdf'] / 1024:<11.1f}  "
+              f"{'是' if result['equivalent'] else '否'}")
+
+    faster = pypdf_faster(results)
+    print(f"'auto' 使用 {AUTO_BACKEND}；pypdf更快的样本: "
+          f"{', '.join(result['case'] + '/' + result['operation'] for result in faster) or '无'}")
+
+    mismatches = [result for result in results if not result["equivalent"]]
+    for result in mismatches:
+        print(f"输出不一致: {result['case']}/{result['operation']}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import os
+import io
+import random
+import fitz  # PyMuPDF
+from PIL import Image
+
+# 各规模下的样本参数
+SCALES = {
+    "small": {"text_pages": 20, "image_pages": 5, "many_pages": 200, "small_files": 20, "image_px": 800},
+    "medium": {"text_pages": 100, "image_pages": 20, "many_pages": 1000, "small_files": 100, "image_px": 1600},
+    "large": {"text_pages": 300, "image_pages": 60, "many_pages": 3000, "small_files": 400, "image_px": 2400},
+}
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit, sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua. 这是一段用于基准测试的示例文字。"
+)
+
+
+def _noise_image(rng, size, fmt):
+    """生成确定性的噪声图片，噪声图难以压缩，接近扫描件的体积"""
+    width, height = size
+    image = Image.frombytes("RGB", (width, height), rng.randbytes(width * height * 3))
+    buffer = io.BytesIO()
+    if fmt == "JPEG":
+        image.save(buffer, format="JPEG", quality=90)
+    else:
+        image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def make_text_pdf(path, pages, lines_per_page=40):
+    """纯文字PDF"""
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 60), f"Page {page_num + 1}", fontsize=18)
+        for line in range(lines_per_page):
+            page.insert_text((72, 90 + line * 17), f"{line:02d} {LOREM[:80]}", fontsize=10)
+    doc.save(path, deflate=True)
+    doc.close()
+    return path
+
+
+def make_image_pdf(path, pages, image_px, seed=0):
+    """图片密集的PDF：每页一张大JPEG、一张PNG，并在每页重复同一个logo"""
+    rng = random.Random(seed)
+    logo = _noise_image(rng, (200, 200), "PNG")
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        photo = _noise_image(rng, (image_px, int(image_px * 0.75)), "JPEG")
+        chart = _noise_image(rng, (image_px // 2, image_px // 2), "PNG")
+        page.insert_image(fitz.Rect(36, 36, 576, 441), stream=photo)
+        page.insert_image(fitz.Rect(36, 460, 306, 730), stream=chart)
+        page.insert_image(fitz.Rect(500, 740, 570, 810), stream=logo)
+        page.insert_text((320, 480), f"Figure page {page_num + 1}", fontsize=12)
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def make_mixed_geometry_pdf(path, pages):
+    """混合A4/Letter和旋转页面的PDF，用于水印等与页面几何相关的操作"""
+    geometries = [(595, 842, 0), (612, 792, 0), (842, 595, 0), (595, 842, 90), (612, 792, 270)]
+    doc = fitz.open()
+    for page_num in range(pages):
+        width, height, rotation = geometries[page_num % len(geometries)]
+        page = doc.new_page(width=width, height=height)
+        page.insert_text((72, 72), f"Page {page_num + 1} {LOREM[:60]}", fontsize=11)
+        page.set_rotation(rotation)
+    doc.save(path, deflate=True)
+    doc.close()
+    return path
+
+
+def make_small_files(directory, count, pages=2):
+    """大量小PDF，用于合并"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for index in range(count):
+        paths.append(make_text_pdf(os.path.join(directory, f"small_{index:04d}.pdf"), pages, lines_per_page=10))
+    return paths
+
+
+def make_watermark_image(path, size=(240, 120), seed=1):
+    rng = random.Random(seed)
+    with open(path, "wb") as f:
+        f.write(_noise_image(rng, size, "PNG"))
+    return path
+
+
+def build_fixtures(directory, scale="small"):
+    """生成全部样本，已存在的文件直接复用
+    :return: {样本名: 路径或路径列表}
+    """
+    params = SCALES[scale]
+    directory = os.path.join(directory, scale)
+    os.makedirs(directory, exist_ok=True)
+
+    def cached(name, builder, *args):
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            builder(path, *args)
+        return path
+
+    small_dir = os.path.join(directory, "small_files")
+    small_files = sorted(
+        os.path.join(small_dir, name) for name in os.listdir(small_dir)
+    ) if os.path.isdir(small_dir) else []
+    if len(small_files) != params["small_files"]:
+        small_files = make_small_files(small_dir, params["small_files"])
+
+    return {
+        "text_only": cached("text_only.pdf", make_text_pdf, params["text_pages"]),
+        "image_heavy": cached("image_heavy.pdf", make_image_pdf, params["image_pages"], params["image_px"]),
+        "many_pages": cached("many_pages.pdf", make_mixed_geometry_pdf, params["many_pages"]),
+        "many_small_files": small_files,
+        "watermark_image": cached("watermark.png", make_watermark_image),
+    }
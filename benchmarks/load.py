@@ -0,0 +1,241 @@
+"""负载生成：按页面的操作组合直接驱动处理器，测量容量
+
+示例:
+    python -m benchmarks.load --workers 4 --concurrency 8 --duration 60
+    python -m benchmarks.load --workers 4 --rate 2.5 --duration 120 --metrics bench/load.prom
+    python -m benchmarks.load --mix pdf_tools=4,add_watermark=2,pdf_to_word=1 --output bench/load.json
+
+与界面相同，操作在进程池中执行：
+    --concurrency N  闭环，始终保持N个请求在途，测量最大吞吐
+    --rate R         开环，按平均每秒R个请求（泊松到达）提交，测量给定负载下的延迟和队列深度
+结果按 (页面, 操作) 记录到 utils.telemetry.Telemetry，可用 --metrics 写出与界面相同格式的指标文件。
+"""
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import random
+import logging
+import argparse
+import statistics
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from benchmarks.fixtures import build_fixtures
+from benchmarks.run import _output_size, _run_operation
+from utils.telemetry import Telemetry, error_class, size_of
+
+# 页面 -> [(操作, 后端, 输入样本)]，与app.py中各页面调用的处理器方法对应
+SCENARIOS = {
+    "pdf_to_word": [("pdf_to_word", "serial", "text_only")],
+    "pdf_tools": [
+        ("encrypt_pdf", "pymupdf", "text_only"),
+        ("compress_pdf", "ebook", "image_heavy"),
+        ("split_pdf", "pymupdf", "many_pages"),
+        ("rotate_pdf", "pymupdf", "many_pages"),
+    ],
+    "merge_pdfs": [("merge_pdfs", "streaming", "many_small_files")],
+    "extract_images": [("extract_images", "pymupdf", "image_heavy")],
+    "add_watermark": [
+        ("add_watermark", "pymupdf", "text_only"),
+        ("add_image_watermark", "pymupdf", "text_only"),
+    ],
+}
+
+
+def parse_mix(expression):
+    """'pdf_tools=4,pdf_to_word=1' -> {页面: 权重}，未指定时各页面权重相同"""
+    if not expression:
+        return {page: 1.0 for page in SCENARIOS}
+    mix = {}
+    for part in expression.split(","):
+        page, _, weight = part.partition("=")
+        page = page.strip()
+        if page not in SCENARIOS:
+            raise ValueError(f"未知的页面: {page}")
+        mix[page] = float(weight or 1)
+    return mix
+
+
+def _execute(page, operation, backend, inputs, work_dir):
+    """工作进程入口：执行一次操作
+    :return: (开始时间戳, 耗时, 输出大小, 异常类别)
+    """
+    logging.disable(logging.INFO)
+    os.makedirs(work_dir, exist_ok=True)
+    # 输出可能写在输入旁边，每个请求使用输入的副本，复制不计入耗时
+    if "source" in inputs:
+        inputs = dict(inputs, source=shutil.copy(inputs["source"], work_dir))
+    started_at = time.time()
+    started = time.perf_counter()
+    try:
+        result = _run_operation(operation, backend, inputs, work_dir)
+        return started_at, time.perf_counter() - started, _output_size(result), None
+    except Exception as e:
+        return started_at, time.perf_counter() - started, None, error_class(e)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _inputs_for(fixtures, sample):
+    if sample == "many_small_files":
+        return {"sources": fixtures[sample]}
+    inputs = {"source": fixtures[sample]}
+    if sample == "text_only":
+        inputs["image"] = fixtures["watermark_image"]
+    return inputs
+
+
+def run_load(fixture_dir, scale="small", workers=2, concurrency=None, rate=None, duration=30.0, mix=None, seed=0,
+             telemetry=None):
+    """运行负载
+    :param concurrency: 闭环模式的在途请求数（与rate二选一）
+    :param rate: 开环模式的平均到达率（请求/秒）
+    :return: 报告字典
+    """
+    fixtures = build_fixtures(fixture_dir, scale)
+    telemetry = telemetry or Telemetry()
+    mix = mix or parse_mix(None)
+    rng = random.Random(seed)
+    pages, weights = list(mix), list(mix.values())
+    work_root = os.path.join(fixture_dir, "load")
+
+    pending = {}  # future -> (页面, 操作, 提交时间戳, 输入大小)
+    samples = {}  # (页面, 操作) -> [(总耗时, 处理耗时, 异常类别)]
+    max_depth = 0
+    submitted = 0
+    telemetry.register_gauge("load_queue_depth", lambda: len(pending), "负载生成器在途的请求数")
+
+    def submit(executor):
+        nonlocal submitted
+        page = rng.choices(pages, weights)[0]
+        operation, backend, sample = rng.choice(SCENARIOS[page])
+        inputs = _inputs_for(fixtures, sample)
+        input_size = size_of(inputs.get("sources") or inputs["source"])
+        work_dir = os.path.join(work_root, f"{submitted:06d}_{operation}")
+        future = executor.submit(_execute, page, operation, backend, inputs, work_dir)
+        pending[future] = (page, operation, time.time(), input_size)
+        submitted += 1
+
+    def collect(done):
+        for future in done:
+            page, operation, submitted_at, input_size = pending.pop(future)
+            started_at, seconds, output_size, error = future.result()
+            finished_at = started_at + seconds
+            telemetry.record(
+                page, operation, finished_at - submitted_at,
+                status="failed" if error else "ok", error=error,
+                input_size=input_size, output_size=output_size,
+                queue_seconds=started_at - submitted_at
+            )
+            samples.setdefault((page, operation), []).append((finished_at - submitted_at, seconds, error))
+
+    started = time.perf_counter()
+    deadline = started + duration
+    next_arrival = started
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while time.perf_counter() < deadline:
+            if rate:
+                # 开环：到达时间与完成情况无关，积压体现为队列深度和排队时间
+                while next_arrival <= time.perf_counter():
+                    submit(executor)
+                    next_arrival += rng.expovariate(rate)
+                timeout = max(0.0, min(next_arrival, deadline) - time.perf_counter())
+            else:
+                while len(pending) < concurrency:
+                    submit(executor)
+                timeout = max(0.0, deadline - time.perf_counter())
+            max_depth = max(max_depth, len(pending))
+            if pending:
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                collect(done)
+            else:
+                time.sleep(timeout)
+        # 停止提交，等待在途请求完成
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    elapsed = time.perf_counter() - started
+    shutil.rmtree(work_root, ignore_errors=True)
+
+    operations = {}
+    for (page, operation), runs in sorted(samples.items()):
+        latencies = sorted(latency for latency, _, _ in runs)
+        operations[f"{page}/{operation}"] = {
+            "requests": len(runs),
+            "failed": sum(1 for _, _, error in runs if error),
+            "errors": sorted({error for _, _, error in runs if error}),
+            "p50": _percentile(latencies, 0.50),
+            "p95": _percentile(latencies, 0.95),
+            "p99": _percentile(latencies, 0.99),
+            "service_mean": round(statistics.mean(seconds for _, seconds, _ in runs), 4),
+        }
+    completed = sum(len(runs) for runs in samples.values())
+    return {
+        "meta": {
+            "mode": f"rate={rate}" if rate else f"concurrency={concurrency}",
+            "scale": scale,
+            "workers": workers,
+            "duration": duration,
+            "cpu_count": os.cpu_count(),
+        },
+        "elapsed_seconds": round(elapsed, 3),
+        "completed": completed,
+        "throughput": round(completed / elapsed, 3) if elapsed else None,
+        "max_queue_depth": max_depth,
+        "operations": operations,
+    }
+
+
+def _percentile(values, q):
+    """最近秩分位数，values已排序"""
+    if not values:
+        return None
+    index = min(len(values) - 1, max(0, math.ceil(q * len(values)) - 1))
+    return round(values[index], 4)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PDF工具集负载生成")
+    parser.add_argument("--scale", choices=["small", "medium", "large"], default="small", help="样本规模")
+    parser.add_argument("--fixtures", default=os.path.join("temp", "benchmarks"), help="样本和临时文件目录")
+    parser.add_argument("--workers", type=int, default=2, help="处理进程数（对应界面的JobManager进程池）")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--concurrency", type=int, help="闭环：保持在途的请求数，默认为进程数的2倍")
+    mode.add_argument("--rate", type=float, help="开环：平均每秒到达的请求数")
+    parser.add_argument("--duration", type=float, default=30.0, help="提交请求的时长（秒）")
+    parser.add_argument("--mix", help="页面权重，如 'pdf_tools=4,pdf_to_word=1'，默认各页面相同")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--metrics", help="写出Prometheus文本格式的指标文件")
+    parser.add_argument("--output", help="结果JSON路径")
+    args = parser.parse_args(argv)
+
+    telemetry = Telemetry()
+    report = run_load(
+        args.fixtures, args.scale, args.workers,
+        concurrency=None if args.rate else (args.concurrency or args.workers * 2),
+        rate=args.rate, duration=args.duration, mix=parse_mix(args.mix), seed=args.seed, telemetry=telemetry
+    )
+
+    print(f"{'页面/操作':<36} {'请求':>6} {'失败':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'处理均值':>9}")
+    for name, result in report["operations"].items():
+        print(f"{name:<36} {result['requests']:>6} {result['failed']:>6} {result['p50']:>8.3f}s "
+              f"{result['p95']:>8.3f}s {result['p99']:>8.3f}s {result['service_mean']:>8.3f}s")
+    print(f"完成 {report['completed']} 个请求，用时 {report['elapsed_seconds']}s，"
+          f"吞吐 {report['throughput']} 请求/秒，最大在途 {report['max_queue_depth']}")
+
+    if args.metrics:
+        telemetry.write(args.metrics)
+        print(f"指标已写入 {args.metrics}")
+    if args.output:
+        output_dir = os.path.dirname(args.output)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+    return 1 if any(result["failed"] for result in report["operations"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
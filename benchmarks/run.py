@@ -0,0 +1,247 @@
+"""PDFProcessor / PDFConverter 基准测试
+
+示例:
+    python -m benchmarks.run --scale small --output bench/latest.json
+    python -m benchmarks.run --scale small --output bench/new.json --baseline bench/latest.json --threshold 0.15
+
+每个操作在独立的子进程中运行，记录墙钟时间、峰值RSS和输出大小；
+指定 --baseline 时与之前的结果对比，超过阈值的变慢或内存增长会被标记为回归。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import logging
+import argparse
+import statistics
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from benchmarks.fixtures import build_fixtures
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def _peak_rss_mb():
+    """当前进程及其已结束子进程的峰值RSS（MB）"""
+    if resource is None:
+        return None
+    usage = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # Linux单位为KB，macOS为字节
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(usage / divisor, 2)
+
+
+def _output_size(result):
+    if isinstance(result, tuple):
+        result = result[0]
+    if isinstance(result, list):
+        return sum(os.path.getsize(path) for path in result)
+    if isinstance(result, str) and os.path.exists(result):
+        return os.path.getsize(result)
+    return None
+
+
+def _run_operation(operation, backend, inputs, work_dir):
+    """执行单个操作并返回结果路径（在子进程中调用）"""
+    from modules.pdf_processor import PDFProcessor
+    from modules.pdf_converter import PDFConverter
+
+    processor = PDFProcessor()
+    source = inputs.get("source")
+    if operation == "encrypt_pdf":
+        # pypdf的AES需要额外安装cryptography，两个后端统一使用RC4-128
+        return processor.encrypt_pdf(source, "benchmark", backend=backend, algorithm="RC4-128")
+    if operation == "compress_pdf":
+        return processor.compress_pdf(source, profile=backend)
+    if operation == "split_pdf":
+        page_count = processor.get_page_count(source)
+        return processor.split_pdf(source, 1, max(1, page_count // 2), backend=backend)
+    if operation == "merge_pdfs":
+        if backend == "streaming":
+            return processor.merge_pdfs(inputs["sources"], work_dir, streaming=True)
+        return processor.merge_pdfs(inputs["sources"], work_dir, backend=backend)
+    if operation == "rotate_pdf":
+        return processor.rotate_pdf(source, 90, "all", backend=backend)
+    if operation == "extract_images":
+        return processor.extract_images(source, os.path.join(work_dir, "images"))
+    if operation == "add_watermark":
+        return processor.add_watermark(source, "CONFIDENTIAL 机密", work_dir, backend=backend)
+    if operation == "add_image_watermark":
+        return processor.add_image_watermark(source, inputs["image"], work_dir, backend=backend)
+    if operation == "pdf_to_word":
+        return PDFConverter().pdf_to_word(source, parallel=backend == "parallel")
+    raise ValueError(f"未知的操作: {operation}")
+
+
+def _measure(args):
+    """子进程入口：计时执行一次操作"""
+    operation, backend, inputs, work_dir = args
+    os.makedirs(work_dir, exist_ok=True)
+    # pdf2docx逐页输出INFO日志，测量时关闭
+    logging.disable(logging.INFO)
+    baseline_rss = _peak_rss_mb()
+    started = time.perf_counter()
+    try:
+        result = _run_operation(operation, backend, inputs, work_dir)
+        error = None
+    except Exception as e:
+        result = None
+        error = str(e)
+    wall = time.perf_counter() - started
+    return {
+        "wall_seconds": round(wall, 4),
+        "peak_rss_mb": _peak_rss_mb(),
+        "baseline_rss_mb": baseline_rss,
+        "output_size": _output_size(result) if result else None,
+        "error": error,
+    }
+
+
+def benchmark_plan(fixtures):
+    """(样本, 操作, 后端, 输入) 列表"""
+    plan = []
+    single = ("text_only", "image_heavy", "many_pages")
+    for case in single:
+        source = {"source": fixtures[case]}
+        for backend in ("pymupdf", "pypdf"):
+            plan.append((case, "encrypt_pdf", backend, source))
+        for profile in ("screen", "ebook", "print"):
+            plan.append((case, "compress_pdf", profile, source))
+        for backend in ("pymupdf", "pypdf"):
+            plan.append((case, "split_pdf", backend, source))
+            plan.append((case, "rotate_pdf", backend, source))
+            plan.append((case, "add_watermark", backend, source))
+            plan.append((case, "add_image_watermark", backend, dict(source, image=fixtures["watermark_image"])))
+    plan.append(("image_heavy", "extract_images", "pymupdf", {"source": fixtures["image_heavy"]}))
+    for backend in ("serial", "parallel"):
+        plan.append(("text_only", "pdf_to_word", backend, {"source": fixtures["text_only"]}))
+    for backend in ("pymupdf", "pypdf", "streaming"):
+        plan.append(("many_small_files", "merge_pdfs", backend, {"sources": fixtures["many_small_files"]}))
+    return plan
+
+
+def run_benchmarks(fixture_dir, scale="small", repeat=3, only=None):
+    """运行全部基准测试
+    :param only: 只运行名称中包含该字符串的条目
+    """
+    fixtures = build_fixtures(fixture_dir, scale)
+    results = {}
+    # spawn保证每次测量都从干净的进程开始，峰值RSS不受之前操作影响
+    context = multiprocessing.get_context("spawn")
+
+    for case, operation, backend, inputs in benchmark_plan(fixtures):
+        name = f"{case}/{operation}/{backend}"
+        if only and only not in name:
+            continue
+
+        runs = []
+        for run_index in range(repeat):
+            work_dir = os.path.join(fixture_dir, "work", f"{case}_{operation}_{backend}_{run_index}")
+            # 每次运行使用输入的副本，避免输出写到样本目录
+            run_inputs = dict(inputs)
+            if "source" in inputs:
+                os.makedirs(work_dir, exist_ok=True)
+                run_inputs["source"] = shutil.copy(inputs["source"], work_dir)
+            # 进程池的工作进程不是守护进程，被测操作内部仍可再创建进程池
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                runs.append(executor.submit(_measure, (operation, backend, run_inputs, work_dir)).result())
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+        errors = [run["error"] for run in runs if run["error"]]
+        results[name] = {
+            "wall_seconds": statistics.median(run["wall_seconds"] for run in runs),
+            "wall_seconds_min": min(run["wall_seconds"] for run in runs),
+            "peak_rss_mb": max((run["peak_rss_mb"] or 0) for run in runs) or None,
+            "output_size": runs[-1]["output_size"],
+            "runs": len(runs),
+            "error": errors[0] if errors else None,
+        }
+        status = f"失败: {errors[0]}" if errors else f"{results[name]['wall_seconds']:.3f}s, {results[name]['peak_rss_mb']} MB"
+        print(f"{name:<55} {status}", flush=True)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "scale": scale,
+            "repeat": repeat,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "versions": _library_versions(),
+        },
+        "results": results,
+    }
+
+
+def _library_versions():
+    versions = {}
+    for module_name in ("pypdf", "fitz", "pdf2docx", "reportlab", "PIL"):
+        try:
+            module = __import__(module_name)
+            versions[module_name] = getattr(module, "__version__", None) or getattr(module, "VersionBind", None)
+        except Exception:
+            versions[module_name] = None
+    return versions
+
+
+def compare(current, baseline, threshold=0.15):
+    """与基准结果对比
+    :return: 回归列表，每项为 (名称, 指标, 旧值, 新值, 变化比例)
+    """
+    regressions = []
+    for name, result in current["results"].items():
+        previous = baseline.get("results", {}).get(name)
+        if not previous or result["error"] or previous.get("error"):
+            continue
+        for metric in ("wall_seconds", "peak_rss_mb", "output_size"):
+            old, new = previous.get(metric), result.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change > threshold:
+                regressions.append((name, metric, old, new, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PDF工具集基准测试")
+    parser.add_argument("--scale", choices=["small", "medium", "large"], default="small", help="样本规模")
+    parser.add_argument("--repeat", type=int, default=3, help="每个操作重复运行的次数")
+    parser.add_argument("--fixtures", default=os.path.join("temp", "benchmarks"), help="样本和临时文件目录")
+    parser.add_argument("--output", required=True, help="结果JSON路径")
+    parser.add_argument("--baseline", help="用于对比的历史结果JSON")
+    parser.add_argument("--threshold", type=float, default=0.15, help="判定为回归的增长比例")
+    parser.add_argument("--only", help="只运行名称包含该字符串的条目，如 'merge_pdfs'")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.fixtures, args.scale, args.repeat, args.only)
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for name, metric, old, new, change in regressions:
+            print(f"回归: {name} {metric} {old} -> {new} (+{change:.0%})")
+        if regressions:
+            return 1
+        print("未发现回归")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""HTML清理器对比
+
+示例:
+    python -m benchmarks.sanitizer
+    python -m benchmarks.sanitizer --pages saved/*.html --repeat 5
+
+默认使用合成的大页面（正文段落、脚本、样式、跟踪像素、内联data URI），
+也可以用 --pages 指定保存下来的真实页面。输出每个清理器的耗时，并检查结果是否一致：
+不含脚本和样式、可见文字相同。
+"""
+import os
+import sys
+import glob
+import time
+import base64
+import random
+import argparse
+import statistics
+from bs4 import BeautifulSoup
+from modules.html_sanitizer import SANITIZERS, MAX_DATA_URI_LENGTH, lxml
+
+
+def make_large_page(paragraphs=20000, seed=0):
+    """生成数MB的合成页面"""
+    rng = random.Random(seed)
+    words = ["pdf", "文档", "转换", "archive", "page", "layout", "渲染", "content", "数据", "network"]
+    big_image = "data:image/png;base64," + base64.b64encode(rng.randbytes(MAX_DATA_URI_LENGTH)).decode("ascii")
+    parts = ["<!DOCTYPE html><html><head><meta charset='utf-8'><title>bench</title>",
+             "<style>body{font-family:sans-serif}</style>",
+             "<script src='https://www.googletagmanager.com/gtag/js'></script></head><body>"]
+    for index in range(paragraphs):
+        text = " ".join(rng.choice(words) for _ in range(30))
+        parts.append(f"<div class='item'><h3>Item {index}</h3><p>{text} <a href='/p/{index}'>link</a></p></div>")
+        if index % 50 == 0:
+            parts.append(f"<script>var x{index} = {index};</script><style>.c{index}{{color:red}}</style>")
+        if index % 200 == 0:
+            parts.append("<img src='https://www.google-analytics.com/collect?v=1' width='1' height='1'>")
+            parts.append("<img src='data:image/gif;base64,R0lGODlhAQABAAAAACw=' alt='small'>")
+        if index % 2000 == 0:
+            parts.append(f"<img src='{big_image}' alt='big'>")
+    parts.append("</body></html>")
+    return "".join(parts).encode("utf-8")
+
+
+def visible_text(html):
+    """去掉脚本和样式后的可见文字，用于比较不同清理器的结果"""
+    soup = BeautifulSoup(html, "lxml" if lxml is not None else "html.parser")
+    for element in soup(["script", "style", "noscript"]):
+        element.decompose()
+    return " ".join(soup.get_text(" ").split())
+
+
+def check_output(output):
+    """清理结果中不应再出现的内容"""
+    lowered = output.lower()
+    problems = []
+    if "<script" in lowered or "<style" in lowered:
+        problems.append("残留脚本或样式")
+    if "google-analytics.com" in lowered or "googletagmanager.com" in lowered:
+        problems.append("残留跟踪代码")
+    if any(len(chunk) > MAX_DATA_URI_LENGTH for chunk in lowered.split("data:")[1:]):
+        problems.append("残留过大的data URI")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="HTML清理器对比")
+    parser.add_argument("--pages", nargs="*", default=[], help="保存的HTML页面（支持通配符），默认使用合成页面")
+    parser.add_argument("--paragraphs", type=int, default=20000, help="合成页面的段落数")
+    parser.add_argument("--repeat", type=int, default=3, help="每个清理器重复运行的次数")
+    args = parser.parse_args(argv)
+
+    pages = {}
+    for pattern in args.pages:
+        for path in sorted(glob.glob(pattern)):
+            with open(path, "rb") as f:
+                pages[os.path.basename(path)] = f.read()
+    if not pages:
+        pages["synthetic"] = make_large_page(args.paragraphs)
+
+    available = [name for name in SANITIZERS if name != "lxml" or lxml is not None]
+    failures = 0
+    print(f"{'页面':<24} {'大小KB':>10} " + " ".join(f"{name:>14}" for name in available) + "  一致")
+    for page_name, html in pages.items():
+        timings, outputs = {}, {}
+        for name in available:
+            sanitizer = SANITIZERS[name]()
+            runs = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                outputs[name] = sanitizer.sanitize(html)
+                runs.append(time.perf_counter() - started)
+            timings[name] = statistics.median(runs)
+
+        texts = {name: visible_text(output) for name, output in outputs.items()}
+        consistent = len(set(texts.values())) == 1
+        problems = {name: check_output(output) for name, output in outputs.items()}
+        print(f"{page_name:<24} {len(html) / 1024:>10.1f} "
+              + " ".join(f"{timings[name]:>13.3f}s" for name in available)
+              + f"  {'是' if consistent else '否'}")
+        for name, issues in problems.items():
+            for issue in issues:
+                print(f"  {name}: {issue}")
+        if not consistent or any(problems.values()):
+            failures += 1
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""URL转PDF渲染启动开销对比
+
+示例:
+    python -m benchmarks.url_render --repeat 50
+
+用很小的HTML反复渲染，比较两种方式的单次耗时：
+    fresh  - 每次重新解析页面样式表、重新创建字体配置（共用缓存之前的做法）
+    shared - 使用进程内预编译的样式表和共用的字体配置
+小页面的排版本身几乎不花时间，差值即每次转换省下的启动开销。同时检查两种方式输出的页数和页面尺寸一致。
+"""
+import os
+import sys
+import time
+import tempfile
+import argparse
+import statistics
+import fitz  # PyMuPDF
+import weasyprint
+from weasyprint.text.fonts import FontConfiguration
+from modules.url_to_pdf import PAGE_SIZES, _page_css, _render_pdf, _init_render_worker
+
+TINY_HTML = "<!DOCTYPE html><html><head><meta charset='utf-8'></head><body><h1>标题</h1><p>Hello PDF</p></body></html>"
+
+
+def render_fresh(html_content, output_path, page_size, orientation):
+    """每次新建字体配置和样式表"""
+    font_config = FontConfiguration()
+    css = weasyprint.CSS(string=_page_css(page_size, orientation), font_config=font_config)
+    weasyprint.HTML(string=html_content).write_pdf(output_path, stylesheets=[css], font_config=font_config)
+
+
+def render_shared(html_content, output_path, page_size, orientation):
+    _render_pdf(html_content, output_path, page_size, orientation)
+
+
+def page_geometry(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        return [(round(page.rect.width, 1), round(page.rect.height, 1)) for page in doc]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="URL转PDF渲染启动开销对比")
+    parser.add_argument("--repeat", type=int, default=30, help="每种方式、每种页面设置的渲染次数")
+    args = parser.parse_args(argv)
+
+    # 与渲染进程初始化相同，预编译放在计时之外
+    started = time.perf_counter()
+    _init_render_worker()
+    print(f"预编译样式表: {time.perf_counter() - started:.3f}s")
+
+    failures = 0
+    print(f"{'页面设置':<16} {'fresh':>10} {'shared':>10} {'节省':>10}  一致")
+    with tempfile.TemporaryDirectory() as work_dir:
+        for page_size in PAGE_SIZES:
+            for orientation in ("纵向", "横向"):
+                timings, geometries = {}, {}
+                for mode, render in (("fresh", render_fresh), ("shared", render_shared)):
+                    output_path = os.path.join(work_dir, f"{mode}.pdf")
+                    runs = []
+                    for _ in range(args.repeat):
+                        started = time.perf_counter()
+                        render(TINY_HTML, output_path, page_size, orientation)
+                        runs.append(time.perf_counter() - started)
+                    timings[mode] = statistics.median(runs)
+                    geometries[mode] = page_geometry(output_path)
+
+                consistent = geometries["fresh"] == geometries["shared"]
+                saved = timings["fresh"] - timings["shared"]
+                print(f"{page_size + ' ' + orientation:<16} {timings['fresh'] * 1000:>8.1f}ms "
+                      f"{timings['shared'] * 1000:>8.1f}ms {saved * 1000:>8.1f}ms  {'是' if consistent else '否'}")
+                if not consistent:
+                    failures += 1
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
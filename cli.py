@@ -0,0 +1,335 @@
+"""PDF工具集命令行批处理
+
+示例:
+    python cli.py --inputs "nightly/*.pdf" --op "compress profile=screen" --op "rotate angle=90 pages=1-2" \\
+        --output-dir out --workers 8 --summary out/summary.json
+
+每个输入文件依次执行 --op 指定的操作链，最终结果写入输出目录；
+输出文件已存在时跳过，因此中断后重新执行同一命令即可续跑。
+"""
+import os
+import re
+import sys
+import glob
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from modules.pdf_processor import PDFProcessor
+from modules.pdf_converter import PDFConverter
+from modules.pdf_backends import DEFAULT_ENCRYPTION_ALGORITHM
+from utils.zip_stream import ZipStream
+
+
+def _parse_color(value):
+    value = value.lstrip("#")
+    return tuple(int(value[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def _op_encrypt(path, work_dir, params):
+    # permissions=print,copy 只允许列出的操作，permissions=none 禁止全部
+    permissions = params.get("permissions")
+    if permissions is not None:
+        permissions = [] if permissions == "none" else permissions.split(",")
+    return PDFProcessor().encrypt_pdf(
+        path,
+        params["password"],
+        backend=params.get("backend", "auto"),
+        algorithm=params.get("algorithm", DEFAULT_ENCRYPTION_ALGORITHM),
+        permissions=permissions,
+        owner_password=params.get("owner_password")
+    )
+
+
+def _op_decrypt(path, work_dir, params):
+    return PDFProcessor().decrypt_pdf(path, params["password"], backend=params.get("backend", "auto"))
+
+
+def _op_compress(path, work_dir, params):
+    return PDFProcessor().compress_pdf(path, profile=params.get("profile", "ebook"))
+
+
+def _op_split(path, work_dir, params):
+    return PDFProcessor().split_pdf(
+        path, int(params["start"]), int(params["end"]), backend=params.get("backend", "auto")
+    )
+
+
+def _op_split_multi(path, work_dir, params):
+    """一次拆分为多个部分并打包为ZIP：ranges=1-3,4-9、chunk=页数 或 bookmarks=书签层级"""
+    options = {}
+    if "ranges" in params:
+        options["ranges"] = params["ranges"]
+    if "chunk" in params:
+        options["chunk_size"] = int(params["chunk"])
+    if "bookmarks" in params:
+        options["bookmark_level"] = int(params["bookmarks"])
+    output_path = os.path.join(work_dir, "split.zip")
+    with ZipStream(dir=work_dir) as archive:
+        # 批处理已经按文件并行，这里不再开进程池
+        PDFProcessor().split_pdf_zip(path, archive, max_workers=1, **options)
+        archive_file = archive.finish()
+        with open(output_path, "wb") as f:
+            shutil.copyfileobj(archive_file, f)
+    return output_path
+
+
+def _op_rotate(path, work_dir, params):
+    # 页码表达式（如 1-3,8,10-）交给rotate_pdf按总页数解析
+    return PDFProcessor().rotate_pdf(
+        path,
+        int(params.get("angle", 90)),
+        params.get("pages", "all"),
+        backend=params.get("backend", "auto"),
+        incremental=params.get("incremental", "0") in ("1", "true", "yes")
+    )
+
+
+def _op_watermark(path, work_dir, params):
+    return PDFProcessor().add_watermark(
+        path,
+        params["text"],
+        work_dir,
+        font_size=int(params.get("font_size", 40)),
+        opacity=float(params.get("opacity", 0.3)),
+        angle=int(params.get("angle", 45)),
+        color=_parse_color(params.get("color", "#808080"))
+    )
+
+
+def _op_image_watermark(path, work_dir, params):
+    return PDFProcessor().add_image_watermark(
+        path,
+        params["image"],
+        work_dir,
+        scale=float(params.get("scale", 0.3)),
+        opacity=float(params.get("opacity", 0.3))
+    )
+
+
+def _op_to_word(path, work_dir, params):
+    return PDFConverter().pdf_to_word(path)
+
+
+def _op_url2pdf(url, work_dir, params):
+    # WeasyPrint依赖较重，只在需要时导入
+    from modules.url_to_pdf import URLToPDFConverter
+    # 每个输入只转换一个URL，HTTP缓存无法复用，也不应在当前目录留下缓存文件
+    converter = URLToPDFConverter(cache_dir=None)
+    try:
+        return converter.convert(
+            url,
+            work_dir,
+            page_size=params.get("page_size", "A4"),
+            orientation=params.get("orientation", "纵向")
+        )
+    finally:
+        converter.close()
+
+
+# 操作名 -> (处理函数, 输出扩展名)
+OPERATIONS = {
+    "encrypt": (_op_encrypt, ".pdf"),
+    "decrypt": (_op_decrypt, ".pdf"),
+    "compress": (_op_compress, ".pdf"),
+    "split": (_op_split, ".pdf"),
+    "split_multi": (_op_split_multi, ".zip"),
+    "rotate": (_op_rotate, ".pdf"),
+    "watermark": (_op_watermark, ".pdf"),
+    "image_watermark": (_op_image_watermark, ".pdf"),
+    "to_word": (_op_to_word, ".docx"),
+    "url2pdf": (_op_url2pdf, ".pdf"),
+}
+
+
+def parse_operation(spec):
+    """解析操作描述，如 'rotate angle=90 pages=1-3'"""
+    parts = spec.split()
+    if not parts or parts[0] not in OPERATIONS:
+        raise argparse.ArgumentTypeError(f"未知的操作: {spec}")
+    params = {}
+    for item in parts[1:]:
+        if "=" not in item:
+            raise argparse.ArgumentTypeError(f"参数格式应为 key=value: {item}")
+        key, value = item.split("=", 1)
+        params[key] = value
+    return parts[0], params
+
+
+def validate_chain(operations):
+    """检查操作链：url2pdf只能位于开头，to_word、split_multi只能位于末尾"""
+    names = [name for name, _ in operations]
+    if not names:
+        raise ValueError("至少需要一个 --op")
+    if "url2pdf" in names[1:]:
+        raise ValueError("url2pdf 只能作为第一个操作")
+    if "to_word" in names[:-1]:
+        raise ValueError("to_word 只能作为最后一个操作")
+    if "split_multi" in names[:-1]:
+        raise ValueError("split_multi 只能作为最后一个操作")
+
+
+def collect_inputs(patterns, manifest):
+    """展开通配符和清单文件中的输入（清单每行一个路径或URL，# 开头为注释）"""
+    inputs = []
+    for pattern in patterns or []:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        inputs.extend(matches)
+    if manifest:
+        with open(manifest, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    inputs.append(line)
+
+    # 去重并保持顺序
+    seen = set()
+    return [item for item in inputs if not (item in seen or seen.add(item))]
+
+
+def _is_url(source):
+    return source.startswith(("http://", "https://"))
+
+
+def plan_outputs(inputs, output_dir, extension):
+    """为每个输入确定最终输出路径，同名输入追加路径哈希区分"""
+    stems = {}
+    for source in inputs:
+        if _is_url(source):
+            stem = re.sub(r"[^\w.-]+", "_", source.split("://", 1)[1]).strip("_")
+        else:
+            stem = os.path.splitext(os.path.basename(source))[0]
+        stems.setdefault(stem, []).append(source)
+
+    plan = {}
+    for stem, sources in stems.items():
+        for source in sources:
+            name = stem
+            if len(sources) > 1:
+                name = f"{stem}_{hashlib.sha1(source.encode('utf-8')).hexdigest()[:8]}"
+            plan[source] = os.path.join(output_dir, f"{name}{extension}")
+    return plan
+
+
+def _stage_input(path, step_dir):
+    """把输入放进步骤目录；处理函数把结果写在输入文件所在目录，固定的名称不会与任何输出重名"""
+    staged = os.path.join(step_dir, "input" + os.path.splitext(path)[1])
+    try:
+        os.link(path, staged)
+    except OSError:
+        shutil.copyfile(path, staged)
+    return staged
+
+
+def process_one(source, operations, output_path, work_root):
+    """在独立的临时目录中对单个输入执行整条操作链
+    :return: 该文件的处理记录
+    """
+    record = {"input": source, "output": output_path, "status": "ok", "error": None, "steps": []}
+    started = time.perf_counter()
+    work_dir = tempfile.mkdtemp(prefix="job_", dir=work_root)
+    try:
+        current = source
+        for index, (name, params) in enumerate(operations, 1):
+            step_started = time.perf_counter()
+            handler, _ = OPERATIONS[name]
+            # 每一步使用单独的目录，重复的操作（如两次水印）不会把结果写到自己的输入上
+            step_dir = os.path.join(work_dir, f"step{index}_{name}")
+            os.makedirs(step_dir)
+            if not _is_url(current):
+                current = _stage_input(current, step_dir)
+            current = handler(current, step_dir, params)
+            record["steps"].append({"op": name, "seconds": round(time.perf_counter() - step_started, 4)})
+
+        # 原子替换：输出文件存在即代表该输入已完成
+        os.replace(current, output_path)
+        record["output_size"] = os.path.getsize(output_path)
+    except Exception as e:
+        record["status"] = "failed"
+        record["error"] = str(e)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    record["seconds"] = round(time.perf_counter() - started, 4)
+    return record
+
+
+def run_batch(inputs, operations, output_dir, workers=None, force=False):
+    """并行处理所有输入，返回汇总结果"""
+    validate_chain(operations)
+    os.makedirs(output_dir, exist_ok=True)
+    extension = OPERATIONS[operations[-1][0]][1]
+    plan = plan_outputs(inputs, output_dir, extension)
+
+    summary = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "operations": [{"op": name, "params": params} for name, params in operations],
+        "files": [],
+    }
+    started = time.perf_counter()
+
+    pending = []
+    for source in inputs:
+        if not force and os.path.exists(plan[source]):
+            summary["files"].append({"input": source, "output": plan[source], "status": "skipped"})
+        else:
+            pending.append(source)
+
+    work_root = os.path.join(output_dir, ".work")
+    os.makedirs(work_root, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(process_one, source, operations, plan[source], work_root): source
+            for source in pending
+        }
+        for future in as_completed(futures):
+            record = future.result()
+            summary["files"].append(record)
+            print(f"[{record['status']}] {record['input']} ({record['seconds']}s)"
+                  + (f": {record['error']}" if record["error"] else ""), flush=True)
+    shutil.rmtree(work_root, ignore_errors=True)
+
+    summary["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    summary["seconds"] = round(time.perf_counter() - started, 4)
+    for status in ("ok", "failed", "skipped"):
+        summary[status] = sum(1 for item in summary["files"] if item["status"] == status)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="PDF工具集命令行批处理")
+    parser.add_argument("--inputs", nargs="*", default=[], help="输入文件通配符，如 'nightly/**/*.pdf'")
+    parser.add_argument("--manifest", help="输入清单文件，每行一个路径或URL")
+    parser.add_argument("--op", dest="operations", action="append", type=parse_operation, default=[],
+                        help="操作及参数，如 'compress profile=screen'；可重复指定组成操作链。"
+                             f"可用操作: {', '.join(OPERATIONS)}")
+    parser.add_argument("--output-dir", required=True, help="输出目录")
+    parser.add_argument("--workers", type=int, default=None, help="并行进程数，默认使用全部CPU")
+    parser.add_argument("--summary", help="汇总结果JSON的路径，默认写入输出目录下的 summary.json")
+    parser.add_argument("--force", action="store_true", help="忽略已存在的输出，全部重新处理")
+    args = parser.parse_args(argv)
+
+    inputs = collect_inputs(args.inputs, args.manifest)
+    if not inputs:
+        parser.error("没有找到任何输入")
+    try:
+        validate_chain(args.operations)
+    except ValueError as e:
+        parser.error(str(e))
+
+    summary = run_batch(inputs, args.operations, args.output_dir, args.workers, args.force)
+
+    summary_path = args.summary or os.path.join(args.output_dir, "summary.json")
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    print(f"完成: {summary['ok']} 成功, {summary['failed']} 失败, {summary['skipped']} 跳过 "
+          f"({summary['seconds']}s)，汇总: {summary_path}")
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
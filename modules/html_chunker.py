@@ -0,0 +1,111 @@
+import html as html_lib
+import fitz  # PyMuPDF
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # lxml为可选依赖，缺失时不分块渲染
+    lxml = None
+
+# 跨分块的页内链接在渲染前改写为该前缀的外部链接，合并后再改回页内跳转
+CHUNK_LINK_PREFIX = "https://pdf-chunk.invalid/#"
+
+
+def split_html(html, target_chunk_bytes):
+    """在body的顶层块元素边界把HTML拆分为多个完整文档
+
+    每个分块保留原文档的head（样式表、base等），按序列化大小累积到target_chunk_bytes为止；
+    指向其他分块中元素的 '#id' 链接改写为 CHUNK_LINK_PREFIX 开头的链接。
+    :return: 分块HTML列表；无法拆分（缺少lxml或只有一个分块）时返回只含原文档的列表
+    """
+    if lxml is None:
+        return [html]
+    document = lxml.html.document_fromstring(html)
+    body = document.find("body")
+    if body is None or len(body) < 2:
+        return [html]
+
+    # 按大小分组顶层子元素
+    groups, current, current_size = [], [], 0
+    for child in body:
+        size = len(etree.tostring(child, method="html", encoding="unicode"))
+        if current and current_size + size > target_chunk_bytes:
+            groups.append(current)
+            current, current_size = [], 0
+        current.append(child)
+        current_size += size
+    if current:
+        groups.append(current)
+    if len(groups) < 2:
+        return [html]
+
+    # 记录每个id所在的分块，跨分块的链接需要改写
+    id_chunk = {}
+    for chunk_index, group in enumerate(groups):
+        for child in group:
+            for element in child.iter():
+                if isinstance(element.tag, str):
+                    element_id = element.get("id") or (element.get("name") if element.tag == "a" else None)
+                    if element_id:
+                        id_chunk.setdefault(element_id, chunk_index)
+
+    head = document.find("head")
+    head_html = etree.tostring(head, method="html", encoding="unicode") if head is not None else ""
+    body_attributes = "".join(
+        f' {name}="{html_lib.escape(value, quote=True)}"' for name, value in body.attrib.items()
+    )
+
+    chunks = []
+    for chunk_index, group in enumerate(groups):
+        # body开头的文本（第一个子元素之前）放在第一个分块
+        parts = [html_lib.escape(body.text)] if chunk_index == 0 and body.text else []
+        for child in group:
+            for element in child.iter("a"):
+                href = element.get("href") or ""
+                if href.startswith("#") and id_chunk.get(href[1:], chunk_index) != chunk_index:
+                    element.set("href", CHUNK_LINK_PREFIX + href[1:])
+            parts.append(etree.tostring(child, method="html", encoding="unicode"))
+        chunks.append(f"<!DOCTYPE html><html>{head_html}<body{body_attributes}>{''.join(parts)}</body></html>")
+    return chunks
+
+
+def merge_chunks(chunk_paths, output_path):
+    """按顺序合并分块PDF，修正跨分块链接和页码标签
+    :return: 合并后的页数
+    """
+    merged = fitz.open()
+    # 命名目标 -> (合并后的页码, PDF坐标中的位置)
+    targets = {}
+    try:
+        # 先收集每个分块中的命名目标，换算成合并后的页码
+        for chunk_path in chunk_paths:
+            with fitz.open(chunk_path) as chunk:
+                page_offset = merged.page_count
+                for name, destination in chunk.resolve_names().items():
+                    if destination.get("page", -1) >= 0:
+                        targets.setdefault(name, (page_offset + destination["page"], destination.get("to")))
+                merged.insert_pdf(chunk)
+
+        # 跨分块链接在渲染时是外部链接，改为合并文档内的跳转
+        for page in merged:
+            for link in page.get_links():
+                uri = link.get("uri") or ""
+                if link["kind"] != fitz.LINK_URI or not uri.startswith(CHUNK_LINK_PREFIX):
+                    continue
+                page.delete_link(link)
+                target = targets.get(uri[len(CHUNK_LINK_PREFIX):])
+                if target is None:
+                    continue
+                target_page, point = target
+                new_link = {"kind": fitz.LINK_GOTO, "from": link["from"], "page": target_page}
+                if point is not None:
+                    # 命名目标使用PDF坐标（原点在左下），链接使用MuPDF坐标（原点在左上）
+                    new_link["to"] = fitz.Point(point) * merged[target_page].transformation_matrix
+                page.insert_link(new_link)
+
+        # 各分块的页码标签都从1开始，统一为连续的页码
+        merged.set_page_labels([{"startpage": 0, "prefix": "", "style": "D", "firstpagenum": 1}])
+        merged.save(output_path, garbage=1, deflate=True)
+        return merged.page_count
+    finally:
+        merged.close()
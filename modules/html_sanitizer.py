@@ -0,0 +1,144 @@
+import re
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # lxml为可选依赖，缺失时只能使用BeautifulSoup
+    lxml = None
+
+# 整个移除的标签
+STRIP_TAGS = ("script", "style", "noscript")
+
+# 常见统计/广告跟踪域名，指向这些域名的图片和iframe会被移除
+TRACKER_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "facebook.com/tr",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "hotjar.com",
+    "mc.yandex.ru",
+    "hm.baidu.com",
+    "cnzz.com",
+)
+
+# 超过该长度（字符）的内联data URI会被移除
+MAX_DATA_URI_LENGTH = 100 * 1024
+
+_TRACKER_PATTERN = re.compile(
+    r"^(?:https?:)?//(?:[^/]*\.)?(?:" + "|".join(re.escape(host) for host in TRACKER_HOSTS) + r")",
+    re.IGNORECASE
+)
+_CHARSET_PATTERN = re.compile(rb"""<meta[^>]+charset=["']?([\w.-]+)""", re.IGNORECASE)
+
+
+def _is_tracker(element_get):
+    """根据src和尺寸判断图片/iframe是否为跟踪像素
+    :param element_get: 读取属性的函数
+    """
+    src = (element_get("src") or "").strip()
+    if _TRACKER_PATTERN.match(src):
+        return True
+    return element_get("width") in ("0", "1") and element_get("height") in ("0", "1")
+
+
+def _is_oversized_data_uri(value, limit):
+    return value is not None and len(value) > limit and value.lstrip()[:5].lower() == "data:"
+
+
+class BeautifulSoupSanitizer:
+    """基于BeautifulSoup html.parser的纯Python实现，不依赖C扩展"""
+
+    name = "beautifulsoup"
+
+    def __init__(self, max_data_uri_length=MAX_DATA_URI_LENGTH):
+        self.max_data_uri_length = max_data_uri_length
+
+    def sanitize(self, html):
+        """:param html: HTML字符串或字节（字节时按文档声明自动检测编码）"""
+        # 使用BeautifulSoup处理HTML
+        soup = BeautifulSoup(html, 'html.parser')
+
+        # 移除不需要的元素
+        for element in soup(list(STRIP_TAGS)):
+            element.decompose()
+
+        for element in soup(["img", "iframe"]):
+            if _is_tracker(element.get):
+                element.decompose()
+
+        for element in soup.find_all(True):
+            for attribute in ("src", "href", "srcset"):
+                if _is_oversized_data_uri(element.get(attribute), self.max_data_uri_length):
+                    del element[attribute]
+
+        return str(soup)
+
+
+class LxmlSanitizer:
+    """基于lxml（libxml2）的实现，解析和序列化都在C代码中完成，一次遍历完成全部过滤"""
+
+    name = "lxml"
+
+    def __init__(self, max_data_uri_length=MAX_DATA_URI_LENGTH):
+        if lxml is None:
+            raise ImportError("需要安装lxml才能使用该清理器")
+        self.max_data_uri_length = max_data_uri_length
+
+    @staticmethod
+    def _decode(html):
+        """字节按文档中声明的编码解码，没有声明时依次尝试UTF-8和GB18030"""
+        if isinstance(html, str):
+            return html
+        html = bytes(html)
+        declared = _CHARSET_PATTERN.search(html[:4096])
+        encodings = ([declared.group(1).decode("ascii")] if declared else []) + ["utf-8", "gb18030"]
+        for encoding in encodings:
+            try:
+                return html.decode(encoding)
+            except (LookupError, UnicodeDecodeError):
+                continue
+        return html.decode("utf-8", errors="replace")
+
+    def sanitize(self, html):
+        """:param html: HTML字符串或字节"""
+        text = self._decode(html)
+        if not text.strip():
+            return ""
+        document = lxml.html.document_fromstring(text)
+
+        removals = []
+        for element in document.iter():
+            tag = element.tag
+            if not isinstance(tag, str):
+                # 注释和处理指令
+                continue
+            if tag in STRIP_TAGS or (tag in ("img", "iframe") and _is_tracker(element.get)):
+                removals.append(element)
+                continue
+            for attribute in ("src", "href", "srcset"):
+                if _is_oversized_data_uri(element.get(attribute), self.max_data_uri_length):
+                    del element.attrib[attribute]
+
+        for element in removals:
+            # 保留元素后面的文本
+            element.drop_tree()
+
+        return etree.tostring(document, method="html", encoding="unicode")
+
+
+SANITIZERS = {
+    BeautifulSoupSanitizer.name: BeautifulSoupSanitizer,
+    LxmlSanitizer.name: LxmlSanitizer,
+}
+
+
+def select_sanitizer(sanitizer="auto", **options):
+    """按名称创建清理器；'auto' 在安装了lxml时使用lxml，否则使用BeautifulSoup"""
+    if sanitizer == "auto":
+        sanitizer = LxmlSanitizer.name if lxml is not None else BeautifulSoupSanitizer.name
+    if sanitizer not in SANITIZERS:
+        raise ValueError(f"未知的HTML清理器: {sanitizer}")
+    return SANITIZERS[sanitizer](**options)
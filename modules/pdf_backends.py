@@ -0,0 +1,269 @@
+import io
+import os
+import importlib.util
+import fitz  # PyMuPDF
+from pypdf import PdfReader, PdfWriter
+from pypdf.constants import UserAccessPermissions
+from utils.buffer_io import is_in_memory
+
+# 'auto' 使用PyMuPDF。依据 `python -m benchmarks.backends` 的结果：从几KB的两页文件到数MB的图片文件，
+# PyMuPDF在拆分、合并、旋转上快2-10倍，加解密快15-90倍，输出页面一致且体积略小，不存在pypdf更快的输入大小；
+# pypdf保留给显式指定或需要纯Python实现的场合。
+AUTO_BACKEND = "pymupdf"
+
+
+# 加密算法，默认AES-256
+ENCRYPTION_ALGORITHMS = ("AES-256", "AES-128", "RC4-128")
+DEFAULT_ENCRYPTION_ALGORITHM = "AES-256"
+
+# 权限名 -> (PyMuPDF标志, pypdf标志)；未列出的权限即被禁止
+PERMISSIONS = {
+    "print": (fitz.PDF_PERM_PRINT, UserAccessPermissions.PRINT),
+    "print_hq": (fitz.PDF_PERM_PRINT_HQ, UserAccessPermissions.PRINT_TO_REPRESENTATION),
+    "modify": (fitz.PDF_PERM_MODIFY, UserAccessPermissions.MODIFY),
+    "copy": (fitz.PDF_PERM_COPY, UserAccessPermissions.EXTRACT),
+    "annotate": (fitz.PDF_PERM_ANNOTATE, UserAccessPermissions.ADD_OR_MODIFY),
+    "form": (fitz.PDF_PERM_FORM, UserAccessPermissions.FILL_FORM_FIELDS),
+    "accessibility": (fitz.PDF_PERM_ACCESSIBILITY, UserAccessPermissions.EXTRACT_TEXT_AND_GRAPHICS),
+    "assemble": (fitz.PDF_PERM_ASSEMBLE, UserAccessPermissions.ASSEMBLE_DOC),
+}
+
+
+def check_encryption_options(algorithm, permissions, password=None, owner_password=None):
+    """检查加密算法、权限名和所有者密码，返回权限名元组；permissions为None表示允许全部
+
+    限制了权限时必须指定与打开密码不同的所有者密码，否则用打开密码即可获得全部权限，
+    而自动生成的随机密码不会告诉任何人，之后就无法再解除限制。
+    """
+    if algorithm not in ENCRYPTION_ALGORITHMS:
+        raise ValueError(f"不支持的加密算法: {algorithm}")
+    if permissions is None:
+        return tuple(PERMISSIONS)
+    unknown = set(permissions) - set(PERMISSIONS)
+    if unknown:
+        raise ValueError(f"未知的权限: {', '.join(sorted(unknown))}")
+    if set(permissions) != set(PERMISSIONS) and (not owner_password or owner_password == password):
+        raise ValueError("限制了权限时需要设置与打开密码不同的所有者密码")
+    return tuple(permissions)
+
+
+def _check_pypdf_algorithm(algorithm):
+    """pypdf的AES依赖cryptography（或pycryptodome），缺少时在读取输入前给出明确的错误"""
+    if algorithm.startswith("AES") and not any(
+        importlib.util.find_spec(module) for module in ("cryptography", "Crypto")
+    ):
+        raise ValueError(f"pypdf后端的{algorithm}加密需要安装cryptography，或改用PyMuPDF后端")
+
+
+class PypdfBackend:
+    """基于pypdf的纯Python实现
+
+    输入可以是文件路径、bytes/memoryview或二进制流，输出可以是文件路径或可写的二进制流。
+    """
+
+    name = "pypdf"
+
+    @staticmethod
+    def _reader(source):
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            # pypdf需要可seek的流，内存数据只能复制一份
+            return PdfReader(io.BytesIO(source))
+        if hasattr(source, "read"):
+            source.seek(0)
+        return PdfReader(source)
+
+    def page_count(self, pdf_path):
+        return len(self._reader(pdf_path).pages)
+
+    def split(self, pdf_path, output_path, start_page, end_page):
+        reader = self._reader(pdf_path)
+        writer = PdfWriter()
+
+        # 检查页码范围
+        if start_page < 1 or end_page > len(reader.pages):
+            raise ValueError("页码范围无效")
+
+        # 复制选定范围的页面
+        for page_num in range(start_page - 1, end_page):
+            writer.add_page(reader.pages[page_num])
+
+        self._write(writer, output_path)
+
+    def merge(self, pdf_paths, output_path):
+        writer = PdfWriter()
+
+        # 遍历所有PDF文件并添加页面
+        for pdf_path in pdf_paths:
+            reader = self._reader(pdf_path)
+            for page in reader.pages:
+                writer.add_page(page)
+
+        self._write(writer, output_path)
+
+    def rotate(self, pdf_path, output_path, rotation_angle, page_indexes=None):
+        """:param page_indexes: 需要旋转的页面索引集合（从0开始），None表示所有页面"""
+        reader = self._reader(pdf_path)
+        writer = PdfWriter()
+
+        for i, page in enumerate(reader.pages):
+            if page_indexes is None or i in page_indexes:
+                page.rotate(rotation_angle)
+            writer.add_page(page)
+
+        self._write(writer, output_path)
+
+    def encrypt(self, pdf_path, output_path, password, algorithm=DEFAULT_ENCRYPTION_ALGORITHM, permissions=None,
+                owner_password=None):
+        """:param permissions: 允许的权限名列表（见 PERMISSIONS），None表示允许全部
+        AES需要安装cryptography或pycryptodome
+        """
+        permissions = check_encryption_options(algorithm, permissions, password, owner_password)
+        _check_pypdf_algorithm(algorithm)
+        # 一次克隆整个对象图，不逐页复制
+        writer = PdfWriter(clone_from=self._reader(pdf_path))
+
+        # 保留位按pypdf默认值设置，只改动具名权限位
+        flag = UserAccessPermissions.all()
+        for name in set(PERMISSIONS) - set(permissions):
+            flag &= ~PERMISSIONS[name][1]
+
+        # 设置加密
+        writer.encrypt(
+            password, owner_password or password,
+            permissions_flag=flag, algorithm=algorithm
+        )
+        self._write(writer, output_path)
+
+    def decrypt(self, pdf_path, output_path, password):
+        reader = self._reader(pdf_path)
+
+        # 尝试解密
+        if reader.is_encrypted and not reader.decrypt(password):
+            raise ValueError("密码错误")
+
+        # 一次克隆整个对象图，输出不带加密字典
+        writer = PdfWriter(clone_from=reader)
+        self._write(writer, output_path)
+
+    @staticmethod
+    def _write(writer, output_path):
+        if is_in_memory(output_path):
+            writer.write(output_path)
+            return
+        with open(output_path, "wb") as output_file:
+            writer.write(output_file)
+
+
+class PyMuPDFBackend:
+    """基于MuPDF的C实现，页面复制和保存都在原生代码中完成
+
+    内存中的输入直接交给MuPDF读取，不复制。
+    """
+
+    name = "pymupdf"
+
+    _ENCRYPTION_METHODS = {
+        "AES-256": fitz.PDF_ENCRYPT_AES_256,
+        "AES-128": fitz.PDF_ENCRYPT_AES_128,
+        "RC4-128": fitz.PDF_ENCRYPT_RC4_128,
+    }
+
+    @staticmethod
+    def _open(source):
+        if isinstance(source, str):
+            return fitz.open(source)
+        if hasattr(source, "getbuffer"):
+            source = source.getbuffer()
+        elif hasattr(source, "read"):
+            source.seek(0)
+            source = source.read()
+        return fitz.open(stream=source, filetype="pdf")
+
+    def page_count(self, pdf_path):
+        with self._open(pdf_path) as doc:
+            return doc.page_count
+
+    def split(self, pdf_path, output_path, start_page, end_page):
+        with self._open(pdf_path) as source:
+            # 检查页码范围
+            if start_page < 1 or end_page > source.page_count:
+                raise ValueError("页码范围无效")
+
+            with fitz.open() as result:
+                result.insert_pdf(source, from_page=start_page - 1, to_page=end_page - 1)
+                result.save(output_path, garbage=1)
+
+    def merge(self, pdf_paths, output_path):
+        with fitz.open() as result:
+            for pdf_path in pdf_paths:
+                with self._open(pdf_path) as source:
+                    result.insert_pdf(source)
+            result.save(output_path, garbage=1)
+
+    def rotate(self, pdf_path, output_path, rotation_angle, page_indexes=None):
+        """:param page_indexes: 需要旋转的页面索引集合（从0开始），None表示所有页面"""
+        with self._open(pdf_path) as doc:
+            indexes = range(doc.page_count) if page_indexes is None else page_indexes
+            for i in indexes:
+                if 0 <= i < doc.page_count:
+                    page = doc[i]
+                    page.set_rotation((page.rotation + rotation_angle) % 360)
+            doc.save(output_path, garbage=1)
+
+    def rotate_in_place(self, pdf_path, rotation_angle, page_indexes=None):
+        """直接修改文件中各页的 /Rotate，以增量更新写回，只在文件末尾追加改动的页面对象
+        :param pdf_path: PDF文件路径（会被修改）
+        :return: 文件无法增量保存（如需要修复的损坏文件）时返回False，文件保持不变
+        """
+        with fitz.open(pdf_path) as doc:
+            if doc.needs_pass:
+                raise ValueError("PDF已加密，请先解密")
+            if not doc.can_save_incrementally():
+                return False
+            indexes = range(doc.page_count) if page_indexes is None else page_indexes
+            for i in indexes:
+                if 0 <= i < doc.page_count:
+                    page = doc[i]
+                    page.set_rotation((page.rotation + rotation_angle) % 360)
+            doc.saveIncr()
+        return True
+
+    def encrypt(self, pdf_path, output_path, password, algorithm=DEFAULT_ENCRYPTION_ALGORITHM, permissions=None,
+                owner_password=None):
+        """:param permissions: 允许的权限名列表（见 PERMISSIONS），None表示允许全部"""
+        permissions = check_encryption_options(algorithm, permissions, password, owner_password)
+        flag = 0
+        for name in permissions:
+            flag |= PERMISSIONS[name][0]
+        with self._open(pdf_path) as doc:
+            # 直接保存原文档的对象，只替换安全处理器
+            doc.save(
+                output_path,
+                garbage=1,
+                encryption=self._ENCRYPTION_METHODS[algorithm],
+                user_pw=password,
+                owner_pw=owner_password or password,
+                permissions=flag
+            )
+
+    def decrypt(self, pdf_path, output_path, password):
+        with self._open(pdf_path) as doc:
+            # 尝试解密
+            if doc.needs_pass and not doc.authenticate(password):
+                raise ValueError("密码错误")
+            doc.save(output_path, garbage=1, encryption=fitz.PDF_ENCRYPT_NONE)
+
+
+BACKENDS = {
+    PypdfBackend.name: PypdfBackend(),
+    PyMuPDFBackend.name: PyMuPDFBackend(),
+}
+
+
+def select_backend(backend="auto"):
+    """按名称返回后端，'auto' 见 AUTO_BACKEND"""
+    if backend == "auto":
+        backend = AUTO_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的PDF后端: {backend}")
+    return BACKENDS[backend]
@@ -0,0 +1,189 @@
+import os
+import io
+import fitz  # PyMuPDF
+from PIL import Image
+from utils.instrumentation import NULL_INSTRUMENTATION, PARSE, TRANSFORM, WRITE
+
+# 压缩配置：目标DPI、触发降采样的阈值倍数、JPEG质量、是否子集化字体
+COMPRESSION_PROFILES = {
+    "screen": {"dpi": 72, "threshold": 1.5, "quality": 50, "subset_fonts": True},
+    "ebook": {"dpi": 150, "threshold": 1.5, "quality": 70, "subset_fonts": True},
+    "print": {"dpi": 300, "threshold": 1.5, "quality": 85, "subset_fonts": True},
+}
+
+# 字体文件流的Subtype
+FONT_SUBTYPES = ("/Type1C", "/CIDFontType0C", "/OpenType")
+
+
+class PDFCompressor:
+    def __init__(self, profile="ebook", instrumentation=None):
+        """:param instrumentation: 接收图片处理进度和分阶段计时，默认不记录"""
+        if profile not in COMPRESSION_PROFILES:
+            raise ValueError(f"未知的压缩配置: {profile}")
+        self.profile = profile
+        self.settings = COMPRESSION_PROFILES[profile]
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
+
+    def compress(self, pdf_path, output_path):
+        """按配置压缩PDF
+        :param pdf_path: PDF文件路径
+        :param output_path: 输出文件路径
+        :return: 压缩报告，包含各类别节省的字节数
+        """
+        instrumentation = self.instrumentation
+        with instrumentation.phase(PARSE):
+            doc = fitz.open(pdf_path)
+        try:
+            with instrumentation.phase(PARSE):
+                before = self._measure(doc)
+
+            with instrumentation.phase(TRANSFORM):
+                images = self._downsample_images(doc)
+                content_streams = self._recompress_content(doc)
+                if self.settings["subset_fonts"]:
+                    try:
+                        doc.subset_fonts()
+                    except Exception:
+                        # 子集化依赖fontTools，失败时保留原字体
+                        pass
+
+            # garbage=4 合并重复对象，use_objstms 写入对象流和交叉引用流
+            with instrumentation.phase(WRITE):
+                doc.save(
+                    output_path,
+                    garbage=4,
+                    deflate=True,
+                    deflate_images=True,
+                    deflate_fonts=True,
+                    use_objstms=1,
+                )
+        finally:
+            doc.close()
+
+        # 统计输出中各类别的大小需要重新解析输出文件
+        with instrumentation.phase(PARSE):
+            with fitz.open(output_path) as result:
+                after = self._measure(result)
+
+        input_size = os.path.getsize(pdf_path)
+        output_size = os.path.getsize(output_path)
+        instrumentation.count_bytes("read", input_size)
+        instrumentation.count_bytes("written", output_size)
+        saved = {
+            category: before[category] - after[category]
+            for category in ("images", "fonts", "content", "other_streams")
+        }
+        # 剩余差值来自对象去重、对象流和交叉引用流
+        saved["structure"] = (input_size - output_size) - sum(saved.values())
+
+        return {
+            "profile": self.profile,
+            "input_size": input_size,
+            "output_size": output_size,
+            "images_resampled": images,
+            "content_streams_recompressed": content_streams,
+            "saved": saved,
+        }
+
+    def _measure(self, doc):
+        """按类别统计文档中流对象的原始（压缩后）字节数"""
+        content_xrefs = set()
+        for page in doc:
+            content_xrefs.update(page.get_contents())
+
+        sizes = {"images": 0, "fonts": 0, "content": 0, "other_streams": 0}
+        for xref in range(1, doc.xref_length()):
+            if not doc.xref_is_stream(xref):
+                continue
+            length = len(doc.xref_stream_raw(xref))
+            subtype = doc.xref_get_key(xref, "Subtype")[1]
+            if subtype == "/Image":
+                sizes["images"] += length
+            elif xref in content_xrefs:
+                sizes["content"] += length
+            elif subtype in FONT_SUBTYPES or doc.xref_get_key(xref, "Length1")[0] != "null":
+                sizes["fonts"] += length
+            else:
+                sizes["other_streams"] += length
+        return sizes
+
+    def _downsample_images(self, doc):
+        """将超过目标DPI的图片降采样并重新编码为JPEG
+        :return: 被替换的图片数量
+        """
+        target_dpi = self.settings["dpi"]
+        limit_dpi = target_dpi * self.settings["threshold"]
+
+        # 每个图片取所有出现位置中最低的有效DPI，保证最大显示尺寸下的清晰度
+        effective_dpi = {}
+        owner_page = {}
+        for page in doc:
+            for info in page.get_image_info(xrefs=True):
+                xref = info["xref"]
+                bbox = fitz.Rect(info["bbox"])
+                if xref <= 0 or bbox.is_empty:
+                    continue
+                dpi = min(
+                    info["width"] / (bbox.width / 72),
+                    info["height"] / (bbox.height / 72),
+                )
+                if xref not in effective_dpi or dpi < effective_dpi[xref]:
+                    effective_dpi[xref] = dpi
+                    owner_page.setdefault(xref, page.number)
+
+        replaced = 0
+        for number, (xref, dpi) in enumerate(effective_dpi.items(), 1):
+            self.instrumentation.progress(number, len(effective_dpi), unit="image")
+            if dpi <= limit_dpi:
+                continue
+            stream = self._resample_image(doc, xref, target_dpi / dpi)
+            if stream is None:
+                continue
+            doc[owner_page[xref]].replace_image(xref, stream=stream)
+            replaced += 1
+        return replaced
+
+    def _resample_image(self, doc, xref, factor):
+        """按比例缩小单个图片，结果不比原图小时返回None"""
+        # 带软蒙版或非8位深度的图片（如黑白扫描）保持原样
+        if doc.xref_get_key(xref, "SMask")[0] != "null":
+            return None
+        if doc.xref_get_key(xref, "BitsPerComponent")[1] != "8":
+            return None
+
+        try:
+            pix = fitz.Pixmap(doc, xref)
+            if pix.alpha or pix.n not in (1, 3):
+                pix = fitz.Pixmap(fitz.csRGB, pix, 0)
+        except Exception:
+            return None
+
+        mode = "L" if pix.n == 1 else "RGB"
+        image = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+        size = (max(1, round(pix.width * factor)), max(1, round(pix.height * factor)))
+        image = image.resize(size, Image.LANCZOS)
+
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=self.settings["quality"], optimize=True)
+        stream = buffer.getvalue()
+
+        if len(stream) >= len(doc.xref_stream_raw(xref)):
+            return None
+        return stream
+
+    def _recompress_content(self, doc):
+        """用Flate重新压缩未压缩的页面内容流
+        :return: 被重新压缩的内容流数量
+        """
+        recompressed = 0
+        seen = set()
+        for page in doc:
+            for xref in page.get_contents():
+                if xref in seen:
+                    continue
+                seen.add(xref)
+                if doc.xref_get_key(xref, "Filter")[0] != "null":
+                    continue
+                doc.update_stream(xref, doc.xref_stream(xref), compress=True)
+                recompressed += 1
+        return recompressed
@@ -1,21 +1,131 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 from pdf2docx import Converter
+import fitz  # PyMuPDF
 import time
+from utils.instrumentation import NULL_INSTRUMENTATION, PARSE, TRANSFORM, WRITE
+
+
+def _parse_shard(pdf_path, page_indexes, settings):
+    """在子进程中解析一段页面，返回pdf2docx的版面数据"""
+    cv = Converter(pdf_path)
+    try:
+        # 先按全部页面分析文档（节、页眉页脚、页边距），保证各分片结果一致
+        cv.load_pages()
+        for page in cv.pages:
+            page.skip_parsing = True
+        for i in page_indexes:
+            cv.pages[i].skip_parsing = False
+        cv.parse_document(**settings).parse_pages(**settings)
+        return cv.store()
+    finally:
+        cv.close()
+
 
 class PDFConverter:
-    def pdf_to_word(self, pdf_path):
-        """将PDF转换为Word文档"""
+    def __init__(self, max_workers=None, shard_size=20, parallel_min_pages=40, instrumentation=None):
+        """
+        :param max_workers: 并行转换的进程数，默认使用全部CPU
+        :param shard_size: 每个分片包含的页数
+        :param parallel_min_pages: 页数不少于该值时才启用多进程
+        :param instrumentation: 接收逐页进度和分阶段计时，默认不记录
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.shard_size = shard_size
+        self.parallel_min_pages = parallel_min_pages
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
+
+    def pdf_to_word(self, pdf_path, parallel=True, output_dir=None):
+        """将PDF转换为Word文档
+        :param output_dir: 输出目录，默认与输入文件相同
+        """
         try:
             # 生成输出文件路径
-            output_dir = os.path.dirname(pdf_path)
+            output_dir = output_dir or os.path.dirname(pdf_path)
+            os.makedirs(output_dir, exist_ok=True)
             output_path = os.path.join(output_dir, f"converted_{int(time.time())}.docx")
-            
-            # 转换PDF到Word
-            cv = Converter(pdf_path)
-            cv.convert(output_path)
-            cv.close()
-            
+
+            with self.instrumentation.operation("pdf_to_word"):
+                with fitz.open(pdf_path) as doc:
+                    page_count = doc.page_count
+                self.instrumentation.count_file("read", pdf_path)
+
+                # 小文件或单核环境直接单进程转换
+                if not parallel or self.max_workers < 2 or page_count < self.parallel_min_pages:
+                    self._convert_single(pdf_path, output_path)
+                else:
+                    self._convert_sharded(pdf_path, output_path, page_count)
+                self.instrumentation.count_file("written", output_path)
+
             return output_path
-            
+
         except Exception as e:
             raise Exception(f"PDF转Word失败: {str(e)}")
+
+    def _convert_single(self, pdf_path, output_path):
+        """单进程转换；启用instrumentation时逐页解析以便上报进度"""
+        instrumentation = self.instrumentation
+        cv = Converter(pdf_path)
+        try:
+            if not instrumentation.enabled:
+                cv.convert(output_path)
+                return
+
+            settings = cv.default_settings
+            with instrumentation.phase(PARSE):
+                cv.load_pages().parse_document(**settings)
+            with instrumentation.phase(TRANSFORM):
+                # 每次只让一页参与解析，结果与一次解析全部页面相同
+                pages = cv.pages
+                for page in pages:
+                    page.skip_parsing = True
+                for number, page in enumerate(pages, 1):
+                    page.skip_parsing = False
+                    cv.parse_pages(**settings)
+                    page.skip_parsing = True
+                    instrumentation.progress(number, len(pages))
+                for page in pages:
+                    page.skip_parsing = False
+            with instrumentation.phase(WRITE):
+                cv.make_docx(output_path, **settings)
+        finally:
+            cv.close()
+
+    def _convert_sharded(self, pdf_path, output_path, page_count):
+        """按页分片并行解析，再统一生成一个docx
+
+        各分片在子进程中只做版面解析，主进程合并解析结果后一次性生成文档，
+        因此分节符、页面设置和样式与单进程转换保持一致。
+        """
+        shards = [
+            list(range(start, min(start + self.shard_size, page_count)))
+            for start in range(0, page_count, self.shard_size)
+        ]
+
+        instrumentation = self.instrumentation
+        cv = Converter(pdf_path)
+        try:
+            settings = cv.default_settings
+            workers = min(self.max_workers, len(shards))
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = executor.map(
+                    _parse_shard,
+                    [pdf_path] * len(shards),
+                    shards,
+                    [settings] * len(shards)
+                )
+
+                with instrumentation.phase(PARSE):
+                    cv.load_pages()
+                # 按页序恢复各分片的解析结果，等待子进程解析的时间计入transform阶段
+                with instrumentation.phase(TRANSFORM):
+                    done = 0
+                    for shard, data in zip(shards, results):
+                        cv.restore(data)
+                        done += len(shard)
+                        instrumentation.progress(done, page_count)
+
+            with instrumentation.phase(WRITE):
+                cv.make_docx(output_path, **settings)
+        finally:
+            cv.close()
@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+import fitz  # PyMuPDF
+from utils.result_cache import ResultCache
+
+# 索引格式版本，结构变化时递增，旧的索引文件会被重建
+INDEX_VERSION = 1
+
+# 索引目录：位于系统临时目录下，不在用户的PDF旁边写文件
+INDEX_DIR = os.path.join(tempfile.gettempdir(), "pdf_toolkit_index")
+
+# 超过该时间未使用的索引文件在淘汰时删除
+INDEX_TTL_SECONDS = 7 * 24 * 3600
+
+# 每写入多少个索引检查一次过期，避免每次写入都遍历目录
+EVICT_EVERY = 100
+
+# 进程内记住的 (路径, 大小, 修改时间) -> 内容哈希 的条目上限
+HASH_MEMO_SIZE = 1024
+
+_hash_memo = OrderedDict()
+_lock = threading.Lock()
+_writes = 0
+
+
+def content_hash(pdf_path, stat=None):
+    """PDF内容的SHA-256；文件未变化时使用进程内记住的结果，不重复读取"""
+    stat = stat or os.stat(pdf_path)
+    memo_key = (os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+    with _lock:
+        digest = _hash_memo.get(memo_key)
+        if digest is not None:
+            _hash_memo.move_to_end(memo_key)
+            return digest
+    digest = ResultCache.file_hash(pdf_path)
+    with _lock:
+        _hash_memo[memo_key] = digest
+        while len(_hash_memo) > HASH_MEMO_SIZE:
+            _hash_memo.popitem(last=False)
+    return digest
+
+
+def index_path(digest, index_dir=None):
+    """索引文件路径：以内容哈希命名，内容相同的文件共用一个索引"""
+    return os.path.join(index_dir or INDEX_DIR, f"{digest}.json")
+
+
+def evict(index_dir=None, max_age=INDEX_TTL_SECONDS):
+    """删除超过max_age未使用的索引文件
+    :return: 删除的文件数量
+    """
+    index_dir = index_dir or INDEX_DIR
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        names = os.listdir(index_dir)
+    except FileNotFoundError:
+        return 0
+    for name in names:
+        path = os.path.join(index_dir, name)
+        try:
+            if os.stat(path).st_mtime < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+class DocumentIndex:
+    """PDF的轻量索引：页数、每页尺寸和旋转、加密状态、每页图片xref
+
+    只解析一次交叉引用表和页面树，结果以内容哈希为名保存在索引目录中；
+    文件内容变化后哈希不同，自动重建。各项操作和界面读取索引，不再各自打开阅读器。
+    """
+
+    def __init__(self, data):
+        self._data = data
+
+    @classmethod
+    def load(cls, pdf_path, password=None, index_dir=None):
+        """读取索引，不存在时重建
+        :param index_dir: 索引目录，默认为 INDEX_DIR
+        """
+        global _writes
+        path = index_path(content_hash(pdf_path), index_dir)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if (
+                data["version"] == INDEX_VERSION
+                # 之前因缺少密码没能读取页面信息的索引，提供密码后重建
+                and (data["pages"] is not None or password is None)
+            ):
+                # 修改时间记录最近一次使用，用于过期淘汰
+                os.utime(path)
+                return cls(data)
+        except (OSError, ValueError, KeyError):
+            pass
+
+        data = cls.build(pdf_path, password)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # 先写临时文件再原子替换，并发的读取方不会读到写了一半的索引
+            partial_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+            with open(partial_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, separators=(",", ":"))
+            os.replace(partial_path, path)
+        except OSError:
+            # 目录不可写时只在内存中使用
+            return cls(data)
+
+        with _lock:
+            _writes += 1
+            due = _writes % EVICT_EVERY == 0
+        if due:
+            evict(index_dir)
+        return cls(data)
+
+    @staticmethod
+    def build(pdf_path, password=None):
+        """解析PDF生成索引数据
+
+        pages 中每页为 [宽, 高, 旋转角度]（宽高取cropbox，未旋转坐标），
+        images 中每页为 [[xref, 宽, 高, 过滤器], ...]；
+        加密且无法打开时这两项为None，只记录页数和加密状态。
+        """
+        with fitz.open(pdf_path) as doc:
+            encrypted = bool(doc.needs_pass or doc.metadata.get("encryption"))
+            data = {
+                "version": INDEX_VERSION,
+                "page_count": doc.page_count,
+                "encrypted": encrypted,
+                "needs_password": bool(doc.needs_pass),
+                "pages": None,
+                "images": None,
+            }
+            if doc.needs_pass and not (password and doc.authenticate(password)):
+                return data
+
+            pages, images = [], []
+            for page in doc:
+                box = page.cropbox
+                pages.append([round(box.width, 2), round(box.height, 2), page.rotation])
+                # (xref, smask, width, height, bpc, colorspace, alt, name, filter, ...)
+                images.append([[img[0], img[2], img[3], img[8]] for img in page.get_images()])
+            data["pages"] = pages
+            data["images"] = images
+        return data
+
+    @property
+    def page_count(self):
+        return self._data["page_count"]
+
+    @property
+    def encrypted(self):
+        return self._data["encrypted"]
+
+    @property
+    def needs_password(self):
+        return self._data["needs_password"]
+
+    @property
+    def pages(self):
+        """每页的 (宽, 高, 旋转角度)，加密且未提供密码时为None"""
+        if self._data["pages"] is None:
+            return None
+        return [tuple(page) for page in self._data["pages"]]
+
+    def page_images(self, page_index):
+        """某页（从0开始）的图片列表 [(xref, 宽, 高, 过滤器), ...]"""
+        if self._data["images"] is None:
+            return None
+        return [tuple(image) for image in self._data["images"][page_index]]
+
+    def image_xrefs(self):
+        """文档中所有图片的xref，按首次出现的顺序"""
+        seen = {}
+        for page_images in self._data["images"] or []:
+            for image in page_images:
+                seen.setdefault(image[0], None)
+        return list(seen)
+
+    def geometries(self):
+        """文档中出现的不同页面几何 (宽, 高, 旋转角度)"""
+        return sorted(set(self.pages or []))
@@ -1,17 +1,109 @@
 import os
+import re
 import time
+import shutil
 import fitz  # PyMuPDF
 from PIL import Image
-import io
-from pypdf import PdfReader, PdfWriter
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
-import uuid
+from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+from modules.pdf_compressor import PDFCompressor
+from modules.watermark import WatermarkEngine
+from modules.pdf_backends import (
+    select_backend, PyMuPDFBackend, DEFAULT_ENCRYPTION_ALGORITHM, check_encryption_options
+)
+from modules.pdf_index import DocumentIndex
+from utils.buffer_io import is_in_memory
+from utils.page_ranges import parse_pages, parse_ranges
+from utils.instrumentation import NULL_INSTRUMENTATION, PARSE, TRANSFORM, WRITE
+
+def _extract_image_chunk(pdf_path, items):
+    """在子进程中提取一组图片xref，返回 (记录, 图片字节) 列表"""
+    results = []
+    with fitz.open(pdf_path) as pdf_document:
+        for item in items:
+            base_image = pdf_document.extract_image(item["xref"])
+            if not base_image:
+                continue
+            image_bytes = base_image["image"]
+            record = dict(item)
+            record["ext"] = base_image["ext"].lower()
+            record["sha1"] = hashlib.sha1(image_bytes).hexdigest()
+            results.append((record, image_bytes))
+    return results
+
+def _secure_files(operation, items, options, backend):
+    """在子进程中加密或解密一组文件
+    :param items: [(输入路径, 输出路径), ...]
+    :return: 记录列表
+    """
+    records = []
+    for pdf_path, output_path in items:
+        record = {"input": pdf_path, "output": output_path, "status": "ok", "error": None}
+        try:
+            handler = select_backend(backend)
+            if operation == "encrypt":
+                handler.encrypt(
+                    pdf_path, output_path, options["password"], options["algorithm"],
+                    options["permissions"], options["owner_password"]
+                )
+            else:
+                handler.decrypt(pdf_path, output_path, options["password"])
+        except Exception as e:
+            record["status"] = "failed"
+            record["error"] = str(e)
+        records.append(record)
+    return records
+
+# 拆分子进程内打开的源文档，每个进程只打开一次，之后的所有页码范围都从它复制
+_split_source = None
+
+def _init_split_worker(pdf_path):
+    global _split_source
+    _split_source = fitz.open(pdf_path)
+
+def _write_split_parts(source, items, output_dir):
+    """从已打开的源文档写出一组页码范围，返回记录列表
+    :param output_dir: 输出目录；为None时不写文件，PDF字节放在记录的 data 中
+    """
+    results = []
+    for item in items:
+        record = dict(item)
+        with fitz.open() as part:
+            part.insert_pdf(source, from_page=item["start"] - 1, to_page=item["end"] - 1)
+            if item["toc"]:
+                part.set_toc(item["toc"])
+            if output_dir is None:
+                record["data"] = part.tobytes(garbage=1, deflate=True)
+            else:
+                record["path"] = os.path.join(output_dir, item["name"])
+                part.save(record["path"], garbage=1, deflate=True)
+        results.append(record)
+    return results
+
+def _split_parts_in_worker(items, output_dir):
+    return _write_split_parts(_split_source, items, output_dir)
+
+def _sub_toc(toc, start_page, end_page):
+    """截取落在页码范围内的书签，页码改为相对范围起始页，层级调整为从1开始且不跳级"""
+    entries = [(level, title, page) for level, title, page, *_ in toc if start_page <= page <= end_page]
+    if not entries:
+        return []
+    base_level = min(level for level, _, _ in entries) - 1
+    result, previous_level = [], 0
+    for level, title, page in entries:
+        level = min(level - base_level, previous_level + 1)
+        result.append([level, title, page - start_page + 1])
+        previous_level = level
+    return result
 
 class PDFProcessor:
-    def __init__(self):
+    def __init__(self, instrumentation=None):
+        """:param instrumentation: utils.instrumentation.Instrumentation，接收进度和分阶段计时，默认不记录"""
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
         # 新版本PyMuPDF不再使用LINK_JPEG等常量
         self.supported_image_types = {
             'jpeg': ['jpeg', 'jpg'],
@@ -19,241 +111,583 @@ class PDFProcessor:
             'all': ['jpeg', 'jpg', 'png']
         }
     
-    def get_page_count(self, pdf_path):
-        """获取PDF页数"""
-        with open(pdf_path, 'rb') as file:
-            reader = PdfReader(file)
-            return len(reader.pages)
+    def _output_target(self, pdf_path, output, filename):
+        """确定输出位置：指定了output（路径或可写流）时使用它，否则写在输入文件旁边"""
+        if output is not None:
+            return output
+        if is_in_memory(pdf_path):
+            raise ValueError("内存中的输入需要指定output")
+        return os.path.join(os.path.dirname(pdf_path), filename)
+    
+    def get_page_count(self, pdf_path, backend="auto"):
+        """获取PDF页数
+        :param pdf_path: PDF文件路径，或内存中的PDF数据（memoryview、bytes、BytesIO）
+        """
+        if is_in_memory(pdf_path):
+            return select_backend(backend).page_count(pdf_path)
+        # 文件路径从索引读取，只在第一次或文件变化后解析
+        return DocumentIndex.load(pdf_path).page_count
+    
+    def get_document_index(self, pdf_path, password=None):
+        """获取PDF的索引（页数、页面尺寸和旋转、加密状态、图片xref）"""
+        return DocumentIndex.load(pdf_path, password)
     
-    def encrypt_pdf(self, pdf_path, password):
-        """加密PDF文件"""
+    def encrypt_pdf(self, pdf_path, password, backend="auto", output=None, algorithm=DEFAULT_ENCRYPTION_ALGORITHM,
+                    permissions=None, owner_password=None):
+        """加密PDF文件
+        :param backend: PDF后端 ('pypdf', 'pymupdf')，'auto' 使用PyMuPDF
+        :param output: 输出文件路径或可写的二进制流，默认写在输入文件旁边
+        :param algorithm: 加密算法 ('AES-256', 'AES-128', 'RC4-128')
+        :param permissions: 允许的权限名列表，如 ['print', 'copy']，None表示允许全部
+        :param owner_password: 所有者密码，默认与打开密码相同；限制了权限时必须指定且与打开密码不同
+        """
         try:
-            output_dir = os.path.dirname(pdf_path)
-            output_path = os.path.join(output_dir, f"encrypted_{int(time.time())}.pdf")
-            
-            reader = PdfReader(pdf_path)
-            writer = PdfWriter()
-            
-            # 复制所有页面
-            for page in reader.pages:
-                writer.add_page(page)
-            
-            # 设置加密
-            writer.encrypt(password)
-            
-            # 保存加密后的PDF
-            with open(output_path, "wb") as output_file:
-                writer.write(output_file)
+            with self.instrumentation.operation("encrypt_pdf"):
+                output_path = self._output_target(pdf_path, output, f"encrypted_{int(time.time())}.pdf")
+                
+                # 解析、处理和写出都在后端内部完成，整体记为一个阶段
+                self.instrumentation.count_file("read", pdf_path)
+                with self.instrumentation.phase(TRANSFORM):
+                    select_backend(backend).encrypt(
+                        pdf_path, output_path, password, algorithm, permissions, owner_password
+                    )
+                self.instrumentation.count_file("written", output_path)
             
             return output_path
             
         except Exception as e:
             raise Exception(f"PDF加密失败: {str(e)}")
     
-    def decrypt_pdf(self, pdf_path, password):
-        """解密PDF文件"""
+    def decrypt_pdf(self, pdf_path, password, backend="auto", output=None):
+        """解密PDF文件
+        :param backend: PDF后端 ('pypdf', 'pymupdf')，'auto' 使用PyMuPDF
+        :param output: 输出文件路径或可写的二进制流，默认写在输入文件旁边
+        """
         try:
-            output_dir = os.path.dirname(pdf_path)
-            output_path = os.path.join(output_dir, f"decrypted_{int(time.time())}.pdf")
-            
-            reader = PdfReader(pdf_path)
-            writer = PdfWriter()
-            
-            # 尝试解密
-            if reader.is_encrypted:
-                reader.decrypt(password)
-            
-            # 复制所有页面
-            for page in reader.pages:
-                writer.add_page(page)
-            
-            # 保存解密后的PDF
-            with open(output_path, "wb") as output_file:
-                writer.write(output_file)
+            with self.instrumentation.operation("decrypt_pdf"):
+                output_path = self._output_target(pdf_path, output, f"decrypted_{int(time.time())}.pdf")
+                
+                self.instrumentation.count_file("read", pdf_path)
+                with self.instrumentation.phase(TRANSFORM):
+                    select_backend(backend).decrypt(pdf_path, output_path, password)
+                self.instrumentation.count_file("written", output_path)
             
             return output_path
             
         except Exception as e:
             raise Exception(f"PDF解密失败: {str(e)}")
     
-    def compress_pdf(self, pdf_path):
-        """压缩PDF文件"""
+    def compress_pdf(self, pdf_path, profile="ebook", return_report=False):
+        """压缩PDF文件
+        :param pdf_path: PDF文件路径
+        :param profile: 压缩配置 ('screen', 'ebook', 'print')
+        :param return_report: 为True时同时返回各类别节省字节数的报告
+        :return: 输出文件路径，或 (输出文件路径, 压缩报告)
+        """
         try:
             output_dir = os.path.dirname(pdf_path)
             output_path = os.path.join(output_dir, f"compressed_{int(time.time())}.pdf")
             
-            reader = PdfReader(pdf_path)
-            writer = PdfWriter()
-            
-            # 复制页面并应用压缩
-            for page in reader.pages:
-                writer.add_page(page)
-                
-            # 设置压缩选项
-            writer.add_metadata(reader.metadata)
-            
-            # 保存压缩后的PDF
-            with open(output_path, "wb") as output_file:
-                writer.write(output_file)
+            # 降采样图片、重新压缩内容流、去重对象并写入对象流
+            with self.instrumentation.operation("compress_pdf"):
+                report = PDFCompressor(profile, self.instrumentation).compress(pdf_path, output_path)
             
+            if return_report:
+                return output_path, report
             return output_path
             
         except Exception as e:
             raise Exception(f"PDF压缩失败: {str(e)}")
     
-    def split_pdf(self, pdf_path, start_page, end_page):
-        """拆分PDF文件"""
+    def encrypt_pdfs(self, pdf_paths, output_dir, password, algorithm=DEFAULT_ENCRYPTION_ALGORITHM, permissions=None,
+                     owner_password=None, backend="auto", max_workers=None):
+        """批量加密：参数只检查一次，文件按组分给工作进程，单个文件失败不影响其他文件
+        :return: 每个输入的记录列表，包含 input、output、status ('ok'/'failed')、error
+        """
+        # 在分发前检查参数，参数错误时不启动任何进程
+        permissions = check_encryption_options(algorithm, permissions, password, owner_password)
+        options = {
+            "password": password,
+            "algorithm": algorithm,
+            "permissions": permissions,
+            "owner_password": owner_password,
+        }
+        return self._secure_batch("encrypt", pdf_paths, output_dir, options, backend, max_workers)
+    
+    def decrypt_pdfs(self, pdf_paths, output_dir, password, backend="auto", max_workers=None):
+        """批量解密，返回值同 encrypt_pdfs"""
+        return self._secure_batch("decrypt", pdf_paths, output_dir, {"password": password}, backend, max_workers)
+    
+    def _secure_batch(self, operation, pdf_paths, output_dir, options, backend, max_workers):
+        os.makedirs(output_dir, exist_ok=True)
+        items = [(pdf_path, os.path.join(output_dir, os.path.basename(pdf_path))) for pdf_path in pdf_paths]
+        if len(set(output for _, output in items)) != len(items):
+            raise ValueError("输入文件名重复，输出会互相覆盖")
+        
+        max_workers = max_workers or os.cpu_count() or 1
+        chunk_size = max(1, -(-len(items) // (max_workers * 4)))
+        groups = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        
+        instrumentation = self.instrumentation
+        records = []
+        with instrumentation.operation(f"{operation}_pdfs"):
+            if max_workers < 2 or len(groups) < 2:
+                results = (_secure_files(operation, group, options, backend) for group in groups)
+                executor = None
+            else:
+                executor = ProcessPoolExecutor(max_workers=min(max_workers, len(groups)))
+                futures = [executor.submit(_secure_files, operation, group, options, backend) for group in groups]
+                results = (future.result() for future in futures)
+            try:
+                for group_records in results:
+                    records.extend(group_records)
+                    instrumentation.progress(len(records), len(items), unit="file")
+            finally:
+                if executor is not None:
+                    executor.shutdown()
+        return records
+    
+    def split_pdf(self, pdf_path, start_page, end_page, backend="auto", output=None):
+        """拆分PDF文件
+        :param backend: PDF后端 ('pypdf', 'pymupdf')，'auto' 使用PyMuPDF
+        :param output: 输出文件路径或可写的二进制流，默认写在输入文件旁边
+        """
         try:
-            output_dir = os.path.dirname(pdf_path)
-            output_path = os.path.join(output_dir, f"split_{int(time.time())}.pdf")
-            
-            reader = PdfReader(pdf_path)
-            writer = PdfWriter()
-            
-            # 检查页码范围
-            if start_page < 1 or end_page > len(reader.pages):
-                raise ValueError("页码范围无效")
-            
-            # 复制选定范围的页面
-            for page_num in range(start_page - 1, end_page):
-                writer.add_page(reader.pages[page_num])
-            
-            # 保存拆分后的PDF
-            with open(output_path, "wb") as output_file:
-                writer.write(output_file)
+            with self.instrumentation.operation("split_pdf"):
+                output_path = self._output_target(pdf_path, output, f"split_{int(time.time())}.pdf")
+                
+                with self.instrumentation.phase(TRANSFORM):
+                    select_backend(backend).split(pdf_path, output_path, start_page, end_page)
+                self.instrumentation.count_file("written", output_path)
             
             return output_path
             
         except Exception as e:
             raise Exception(f"PDF拆分失败: {str(e)}")
     
-    def merge_pdfs(self, pdf_paths, output_dir):
-        """合并多个PDF文件"""
+    def plan_split(self, pdf_path, ranges=None, chunk_size=None, bookmark_level=None):
+        """确定多路拆分的各个部分，三种方式任选其一
+        :param ranges: 页码范围列表 [(起始页, 结束页), ...]（页码从1开始，包含结束页），或表达式 '1-3,4,10-'
+        :param chunk_size: 每个部分的固定页数
+        :param bookmark_level: 按该层级的书签拆分，每个书签到下一个同级书签之前为一个部分
+        :return: 部分列表，每项为包含 name、start、end、title、toc 的字典
+        """
+        if sum(option is not None for option in (ranges, chunk_size, bookmark_level)) != 1:
+            raise ValueError("ranges、chunk_size、bookmark_level 需要且只能指定一个")
+        
+        source = PyMuPDFBackend._open(pdf_path)
+        try:
+            if source.needs_pass:
+                raise ValueError("PDF已加密，请先解密")
+            page_count = source.page_count
+            toc = source.get_toc(simple=True)
+        finally:
+            source.close()
+        
+        stem = "split" if is_in_memory(pdf_path) else os.path.splitext(os.path.basename(pdf_path))[0]
+        parts = []
+        if ranges is not None:
+            if isinstance(ranges, str):
+                ranges = parse_ranges(ranges, page_count)
+            for start, end in ranges:
+                if start < 1 or end > page_count or start > end:
+                    raise ValueError(f"页码范围无效: {start}-{end}")
+                parts.append((start, end, None))
+        elif chunk_size is not None:
+            if chunk_size < 1:
+                raise ValueError("每部分页数至少为1")
+            parts = [(start, min(start + chunk_size - 1, page_count), None)
+                     for start in range(1, page_count + 1, chunk_size)]
+        else:
+            marks = [(page, title) for level, title, page, *_ in toc if level == bookmark_level and page >= 1]
+            if not marks:
+                raise ValueError(f"没有第{bookmark_level}级书签")
+            # 第一个书签之前的页面单独成为一部分，避免丢页
+            if marks[0][0] > 1:
+                parts.append((1, marks[0][0] - 1, "开头"))
+            for i, (page, title) in enumerate(marks):
+                next_page = marks[i + 1][0] if i + 1 < len(marks) else page_count + 1
+                # 同一页上有多个书签时各自至少包含该页
+                parts.append((page, max(page, next_page - 1), title))
+        
+        plan = []
+        names = set()
+        for number, (start, end, title) in enumerate(parts, 1):
+            if title is None:
+                name = f"{stem}_p{start}-{end}.pdf"
+            else:
+                safe_title = re.sub(r'[\\/:*?"<>|\s]+', "_", title).strip("_")[:60] or "untitled"
+                name = f"{number:03d}_{safe_title}.pdf"
+            # 重复的页码范围加上序号，输出文件和ZIP条目不会互相覆盖
+            if name in names:
+                name = f"{os.path.splitext(name)[0]}_{number:03d}.pdf"
+            names.add(name)
+            plan.append({
+                "number": number,
+                "name": name,
+                "start": start,
+                "end": end,
+                "title": title,
+                "toc": _sub_toc(toc, start, end),
+            })
+        return plan
+    
+    def iter_split(self, pdf_path, output_dir, ranges=None, chunk_size=None, bookmark_level=None, max_workers=None):
+        """多路拆分：源文件只解析一次（每个工作进程打开一次），各部分并行写出，按完成顺序生成结果
+        :param pdf_path: PDF文件路径；内存中的PDF数据在当前进程内拆分
+        :param output_dir: 输出目录；为None时不写文件，PDF字节放在记录的 data 中
+        :param max_workers: 并行写出的进程数，默认使用全部CPU
+        :return: 生成器，每项为包含 number、name、path/data、start、end、title 的字典
+        """
+        instrumentation = self.instrumentation
+        try:
+            with instrumentation.operation("split_pdf_multi"):
+                with instrumentation.phase(PARSE):
+                    plan = self.plan_split(pdf_path, ranges, chunk_size, bookmark_level)
+                if output_dir is not None:
+                    os.makedirs(output_dir, exist_ok=True)
+                
+                max_workers = max_workers or os.cpu_count() or 1
+                chunk = max(1, -(-len(plan) // (max_workers * 4)))
+                groups = [plan[i:i + chunk] for i in range(0, len(plan), chunk)]
+                
+                if max_workers < 2 or len(groups) < 2 or is_in_memory(pdf_path):
+                    source = PyMuPDFBackend._open(pdf_path)
+                    try:
+                        results = (_write_split_parts(source, group, output_dir) for group in groups)
+                        yield from self._report_parts(results, len(plan))
+                    finally:
+                        source.close()
+                    return
+                
+                with ProcessPoolExecutor(
+                    max_workers=min(max_workers, len(groups)),
+                    initializer=_init_split_worker,
+                    initargs=(pdf_path,)
+                ) as executor:
+                    futures = [executor.submit(_split_parts_in_worker, group, output_dir) for group in groups]
+                    results = (future.result() for future in as_completed(futures))
+                    yield from self._report_parts(results, len(plan))
+        
+        except Exception as e:
+            raise Exception(f"PDF拆分失败: {str(e)}")
+    
+    def _report_parts(self, results, total):
+        """逐个生成各组的拆分结果，上报进度和写出的字节数；等待写出的时间计入write阶段"""
+        instrumentation = self.instrumentation
+        done = 0
+        results = iter(results)
+        while True:
+            with instrumentation.phase(WRITE):
+                records = next(results, None)
+            if records is None:
+                return
+            for record in records:
+                done += 1
+                if instrumentation.enabled:
+                    size = len(record["data"]) if "data" in record else os.path.getsize(record["path"])
+                    instrumentation.count_bytes("written", size)
+                    instrumentation.progress(done, total, unit="part")
+                yield record
+    
+    def split_pdf_multi(self, pdf_path, output_dir, ranges=None, chunk_size=None, bookmark_level=None,
+                        max_workers=None):
+        """多路拆分，返回按部分顺序排列的输出路径列表（参数见 iter_split）"""
+        records = sorted(
+            self.iter_split(pdf_path, output_dir, ranges, chunk_size, bookmark_level, max_workers),
+            key=lambda record: record["number"]
+        )
+        return [record["path"] for record in records]
+    
+    def split_pdf_zip(self, pdf_path, archive, ranges=None, chunk_size=None, bookmark_level=None, max_workers=None):
+        """多路拆分，各部分写出后直接加入ZIP，不落地为中间文件；条目按部分顺序排列
+        :param archive: utils.zip_stream.ZipStream
+        :return: 部分数量
+        """
+        # 各组按完成顺序返回，先到的靠后部分暂存，前面的部分都加入后再依次加入
+        pending = {}
+        next_number = 1
+        for record in self.iter_split(pdf_path, None, ranges, chunk_size, bookmark_level, max_workers):
+            pending[record["number"]] = record
+            while next_number in pending:
+                record = pending.pop(next_number)
+                archive.add(record["name"], record["data"])
+                next_number += 1
+        return next_number - 1
+    
+    def merge_pdfs(self, pdf_paths, output_dir, streaming=False, flush_every=10, backend="auto"):
+        """合并多个PDF文件
+        :param pdf_paths: PDF文件路径列表（按合并顺序）
+        :param output_dir: 输出目录
+        :param streaming: 为True时逐个追加并增量写出，内存占用不随文件数量增长
+        :param flush_every: 流式合并时每追加多少个文件写出一次
+        :param backend: 非流式合并使用的PDF后端 ('pypdf', 'pymupdf')，'auto' 使用PyMuPDF
+        """
         try:
-            writer = PdfWriter()
-            
-            # 遍历所有PDF文件并添加页面
-            for pdf_path in pdf_paths:
-                reader = PdfReader(pdf_path)
-                for page in reader.pages:
-                    writer.add_page(page)
-            
             # 生成输出文件路径
+            os.makedirs(output_dir, exist_ok=True)
             output_path = os.path.join(output_dir, "merged.pdf")
             
-            # 保存合并后的PDF
-            with open(output_path, "wb") as output_file:
-                writer.write(output_file)
+            with self.instrumentation.operation("merge_pdfs"):
+                if streaming:
+                    self._merge_pdfs_streaming(pdf_paths, output_path, flush_every)
+                else:
+                    with self.instrumentation.phase(TRANSFORM):
+                        select_backend(backend).merge(pdf_paths, output_path)
+                self.instrumentation.count_file("written", output_path)
             
             return output_path
             
         except Exception as e:
             raise Exception(f"PDF合并失败: {str(e)}")
     
-    def rotate_pdf(self, pdf_path, rotation_angle, pages='all'):
+    def _merge_pdfs_streaming(self, pdf_paths, output_path, flush_every):
+        """流式合并：每批源文件追加后以增量更新写入磁盘并关闭文档
+        
+        源文件在其页面复制完成后立即关闭；输出文档每批写出后重新打开，
+        重新打开时只加载交叉引用表，已写出的对象不会常驻内存。
+        """
+        if not pdf_paths:
+            raise ValueError("没有需要合并的文件")
+        
+        partial_path = output_path + ".part"
+        flush_every = max(1, flush_every)
+        
+        instrumentation = self.instrumentation
+        merged = fitz.open()
+        try:
+            for index, pdf_path in enumerate(pdf_paths):
+                with instrumentation.phase(TRANSFORM):
+                    with fitz.open(pdf_path) as source:
+                        merged.insert_pdf(source)
+                instrumentation.count_file("read", pdf_path)
+                instrumentation.progress(index + 1, len(pdf_paths), unit="file")
+                
+                if (index + 1) % flush_every:
+                    continue
+                
+                # 写出当前批次并释放已完成的对象
+                with instrumentation.phase(WRITE):
+                    if index + 1 == flush_every:
+                        merged.save(partial_path)
+                    else:
+                        merged.saveIncr()
+                    merged.close()
+                    merged = fitz.open(partial_path)
+            
+            with instrumentation.phase(WRITE):
+                if len(pdf_paths) < flush_every:
+                    merged.save(partial_path)
+                elif len(pdf_paths) % flush_every:
+                    merged.saveIncr()
+        except BaseException:
+            # 合并失败时删除写了一半的临时文件
+            merged.close()
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        merged.close()
+        
+        os.replace(partial_path, output_path)
+    
+    def rotate_pdf(self, pdf_path, rotation_angle, pages='all', backend="auto", output=None, incremental=False):
         """旋转PDF页面
         :param pdf_path: PDF文件路径
         :param rotation_angle: 旋转角度（90、180、270）
-        :param pages: 'all'表示所有页面，或者页码列表[1,2,3]
+        :param pages: 'all'表示所有页面，页码列表[1,2,3]，或页码表达式 '1,3,5-7'
+        :param backend: PDF后端 ('pypdf', 'pymupdf')，'auto' 使用PyMuPDF
+        :param output: 输出文件路径或可写的二进制流，默认写在输入文件旁边
+        :param incremental: 为True时只修改各页的 /Rotate 并以增量更新保存（PyMuPDF）：
+            output与输入路径相同时直接追加到原文件，否则先复制原文件再追加；
+            无法增量保存的文件退回完整重写
         """
         try:
-            reader = PdfReader(pdf_path)
-            writer = PdfWriter()
-            
-            # 确定需要旋转的页面
-            if pages == 'all':
-                pages = list(range(len(reader.pages)))
-            else:
-                # 将页码转换为索引（页码从1开始，索引从0开始）
-                pages = [p-1 for p in pages]
-            
-            # 处理每一页
-            for i in range(len(reader.pages)):
-                page = reader.pages[i]
-                if i in pages:
-                    page.rotate(rotation_angle)
-                writer.add_page(page)
-            
-            # 生成输出文件路径
-            output_dir = os.path.dirname(pdf_path)
-            output_path = os.path.join(output_dir, "rotated.pdf")
-            
-            # 保存旋转后的PDF
-            with open(output_path, "wb") as output_file:
-                writer.write(output_file)
-            
-            return output_path
+            with self.instrumentation.operation("rotate_pdf"):
+                self.instrumentation.count_file("read", pdf_path)
+                if isinstance(pages, str) and pages != 'all':
+                    try:
+                        pages = parse_pages(pages)
+                    except ValueError:
+                        # '5-' 这类到末页的范围需要总页数
+                        pages = parse_pages(pages, self.get_page_count(pdf_path))
+                
+                # 确定需要旋转的页面
+                if pages == 'all':
+                    page_indexes = None
+                else:
+                    # 将页码转换为索引（页码从1开始，索引从0开始）
+                    page_indexes = {p-1 for p in pages}
+                
+                # 生成输出文件路径
+                output_path = self._output_target(pdf_path, output, "rotated.pdf")
+                
+                in_place = isinstance(output_path, str) and not is_in_memory(pdf_path) \
+                    and os.path.abspath(output_path) == os.path.abspath(pdf_path)
+                if incremental and isinstance(output_path, str) and not is_in_memory(pdf_path):
+                    if not in_place:
+                        # 复制到新文件（Linux上由内核完成复制），原文件保持不变
+                        with self.instrumentation.phase(WRITE):
+                            shutil.copyfile(pdf_path, output_path)
+                    with self.instrumentation.phase(TRANSFORM):
+                        rotated = PyMuPDFBackend().rotate_in_place(output_path, rotation_angle, page_indexes)
+                    if rotated:
+                        self.instrumentation.count_file("written", output_path)
+                        return output_path
+                    if not in_place:
+                        os.remove(output_path)
+                
+                if in_place:
+                    # 不能边读边覆盖输入文件，先写到临时文件再替换
+                    partial_path = output_path + ".part"
+                    with self.instrumentation.phase(TRANSFORM):
+                        select_backend(backend).rotate(pdf_path, partial_path, rotation_angle, page_indexes)
+                    os.replace(partial_path, output_path)
+                    self.instrumentation.count_file("written", output_path)
+                    return output_path
+                
+                with self.instrumentation.phase(TRANSFORM):
+                    select_backend(backend).rotate(pdf_path, output_path, rotation_angle, page_indexes)
+                self.instrumentation.count_file("written", output_path)
+                
+                return output_path
             
         except Exception as e:
             raise Exception(f"PDF旋转失败: {str(e)}")
     
-    def extract_images(self, pdf_path, output_dir, image_type='all', min_size=100):
+    def extract_images(self, pdf_path, output_dir, image_type='all', min_size=100, max_workers=None):
         """提取PDF中的图片
         :param pdf_path: PDF文件路径
         :param output_dir: 输出目录
         :param image_type: 图片类型 ('jpeg', 'png', 'all')
         :param min_size: 最小图片尺寸（像素）
+        :param max_workers: 并行提取的进程数，默认使用全部CPU
         :return: 提取的图片路径列表
         """
+        records = sorted(
+            self.iter_images(pdf_path, output_dir, image_type, min_size, max_workers),
+            key=lambda record: (record["page"], record["index"])
+        )
+        return [record["path"] for record in records]
+
+    def iter_images(self, pdf_path, output_dir, image_type='all', min_size=100, max_workers=None):
+        """逐个生成提取出的图片，可在整个文档处理完成前开始预览
+        
+        每个图片xref只提取一次，内容相同的图片只保存一份；
+        尺寸直接读取图片字典，不解码像素。
+        :param output_dir: 输出目录；为None时不写文件，图片字节放在记录的 data 中
+        :return: 生成器，每项为包含 name、path/data、page、index、xref、ext、width、height、sha1 的字典
+        """
+        instrumentation = self.instrumentation
         try:
-            # 确保输出目录存在
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # 打开PDF文件
-            pdf_document = fitz.open(pdf_path)
-            image_paths = []
-            
-            # 获取支持的图片类型
-            supported_types = self.supported_image_types.get(image_type.lower(), self.supported_image_types['all'])
-            
-            # 遍历每一页
-            for page_num in range(len(pdf_document)):
-                page = pdf_document[page_num]
+            with instrumentation.operation("extract_images"):
+                # 确保输出目录存在
+                if output_dir is not None:
+                    os.makedirs(output_dir, exist_ok=True)
                 
-                # 获取页面上的图片
-                image_list = page.get_images()
+                # 获取支持的图片类型
+                supported_types = self.supported_image_types.get(image_type.lower(), self.supported_image_types['all'])
                 
-                # 处理每个图片
-                for img_index, img in enumerate(image_list):
-                    xref = img[0]  # 图片引用号
-                    base_image = pdf_document.extract_image(xref)
-                    
-                    if base_image:
-                        image_bytes = base_image["image"]
-                        image_ext = base_image["ext"].lower()
-                        
-                        # 检查图片类型
-                        if image_ext not in supported_types:
-                            continue
+                with instrumentation.phase(PARSE):
+                    candidates = self._collect_image_candidates(pdf_path, supported_types, min_size)
+                if not candidates:
+                    return
+                
+                max_workers = max_workers or os.cpu_count() or 1
+                chunk_size = max(1, -(-len(candidates) // (max_workers * 4)))
+                chunks = [candidates[i:i + chunk_size] for i in range(0, len(candidates), chunk_size)]
+                
+                seen_hashes = set()
+                done = 0
+                with ThreadPoolExecutor(max_workers=max_workers) as writer_pool:
+                    extracted_chunks = iter(self._extract_image_chunks(pdf_path, chunks, max_workers))
+                    while True:
+                        # 等待子进程提取（解码）图片的时间
+                        with instrumentation.phase(TRANSFORM):
+                            extracted = next(extracted_chunks, None)
+                        if extracted is None:
+                            break
+                        done += len(extracted)
+                        instrumentation.progress(done, len(candidates), unit="image")
                         
-                        # 检查图片尺寸
-                        try:
-                            image = Image.open(io.BytesIO(image_bytes))
-                            if min(image.size) < min_size:
+                        pending = []
+                        for record, image_bytes in extracted:
+                            # 检查图片类型
+                            if record["ext"] not in supported_types:
                                 continue
-                        except Exception:
-                            continue
-                        
-                        # 生成输出文件路径
-                        image_path = os.path.join(
-                            output_dir, 
-                            f"page_{page_num + 1}_img_{img_index + 1}.{image_ext}"
-                        )
+                            # 内容相同的图片只保存第一次出现的那份
+                            if record["sha1"] in seen_hashes:
+                                continue
+                            seen_hashes.add(record["sha1"])
+                            instrumentation.count_bytes("written", len(image_bytes))
+                            
+                            record["name"] = f"page_{record['page']}_img_{record['index']}.{record['ext']}"
+                            if output_dir is None:
+                                record["data"] = image_bytes
+                                yield record
+                                continue
+                            
+                            # 生成输出文件路径
+                            record["path"] = os.path.join(output_dir, record["name"])
+                            pending.append((record, writer_pool.submit(self._write_file, record["path"], image_bytes)))
                         
-                        # 保存图片
-                        with open(image_path, "wb") as image_file:
-                            image_file.write(image_bytes)
-                        image_paths.append(image_path)
-            
-            return image_paths
+                        for record, future in pending:
+                            with instrumentation.phase(WRITE):
+                                future.result()
+                            yield record
             
         except Exception as e:
             raise Exception(f"提取图片失败: {str(e)}")
-        finally:
-            if 'pdf_document' in locals():
-                pdf_document.close()
 
-    def add_watermark(self, pdf_path, watermark_text, output_dir, font_size=40, opacity=0.3, angle=45, color=(128,128,128)):
+    def _collect_image_candidates(self, pdf_path, supported_types, min_size):
+        """从文档索引收集待提取的图片xref，每个xref只记录第一次出现的位置"""
+        candidates = []
+        seen_xrefs = set()
+        index = DocumentIndex.load(pdf_path)
+        if index.needs_password:
+            raise ValueError("PDF已加密，请先解密")
+        for page_num in range(index.page_count):
+            for img_index, (xref, width, height, image_filter) in enumerate(index.page_images(page_num)):
+                if xref in seen_xrefs:
+                    continue
+                seen_xrefs.add(xref)
+                
+                # 检查图片尺寸
+                if min(width, height) < min_size:
+                    continue
+                # JPEG图片的过滤器为DCTDecode，可以在提取前排除
+                is_jpeg = image_filter == "DCTDecode"
+                if is_jpeg and 'jpeg' not in supported_types:
+                    continue
+                if not is_jpeg and 'png' not in supported_types:
+                    continue
+                
+                candidates.append({
+                    "page": page_num + 1,
+                    "index": img_index + 1,
+                    "xref": xref,
+                    "width": width,
+                    "height": height,
+                })
+        return candidates
+
+    def _extract_image_chunks(self, pdf_path, chunks, max_workers):
+        """提取各分块的图片，按完成顺序生成结果；分块较少时在当前进程内完成"""
+        if max_workers < 2 or len(chunks) < 2:
+            for chunk in chunks:
+                yield _extract_image_chunk(pdf_path, chunk)
+            return
+        
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(chunks))) as executor:
+            futures = [executor.submit(_extract_image_chunk, pdf_path, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                yield future.result()
+
+    @staticmethod
+    def _write_file(path, data):
+        with open(path, "wb") as f:
+            f.write(data)
+
+    def add_watermark(self, pdf_path, watermark_text, output_dir, font_size=40, opacity=0.3, angle=45, color=(128,128,128), backend="pymupdf"):
         """添加文字水印到PDF
         :param pdf_path: PDF文件路径
         :param watermark_text: 水印文字
@@ -262,160 +696,124 @@ class PDFProcessor:
         :param opacity: 不透明度 (0-1)
         :param angle: 旋转角度
         :param color: RGB颜色元组
+        :param backend: 叠加后端 ('pymupdf', 'pypdf')
         :return: 输出文件路径
         """
         try:
             # 确保输出目录存在
             os.makedirs(output_dir, exist_ok=True)
             
-            # 创建水印PDF
-            watermark_path = os.path.join(output_dir, f"watermark_{uuid.uuid4()}.pdf")
-            
-            # 获取PDF页面大小
-            with open(pdf_path, 'rb') as file:
-                pdf = PdfReader(file)
-                if len(pdf.pages) > 0:
-                    page = pdf.pages[0]
-                    page_width = float(page.mediabox.width)
-                    page_height = float(page.mediabox.height)
-                else:
-                    page_width, page_height = letter
-            
-            # 创建水印
-            c = canvas.Canvas(watermark_path, pagesize=(page_width, page_height))
-            c.setFillColorRGB(color[0]/255, color[1]/255, color[2]/255, opacity)
-            
-            # 使用 Windows 自带的中文字体
+            # 使用 Windows 自带的中文字体，其他系统使用reportlab内置的中文CID字体
             font_path = "C:/Windows/Fonts/simhei.ttf"  # 黑体
-            pdfmetrics.registerFont(TTFont('SimHei', font_path))
-            c.setFont("SimHei", font_size)
-            
-            # 计算水印位置和重复次数
-            text_width = c.stringWidth(watermark_text, "SimHei", font_size)
-            text_height = font_size
-            
-            # 在页面上重复绘制水印
-            x_count = int(page_width / (text_width * 2)) + 2
-            y_count = int(page_height / (text_height * 2)) + 2
-            
-            for i in range(x_count):
-                for j in range(y_count):
-                    x = i * text_width * 2
-                    y = j * text_height * 2
-                    
-                    # 保存当前状态
-                    c.saveState()
-                    # 移动到位置
-                    c.translate(x, y)
-                    # 旋转
-                    c.rotate(angle)
-                    # 绘制文字
-                    c.drawString(0, 0, watermark_text)
-                    # 恢复状态
-                    c.restoreState()
+            if os.path.exists(font_path):
+                pdfmetrics.registerFont(TTFont('SimHei', font_path))
+                font_name = "SimHei"
+            else:
+                pdfmetrics.registerFont(UnicodeCIDFont('STSong-Light'))
+                font_name = "STSong-Light"
             
-            c.save()
+            def render_overlay(watermark_path, page_width, page_height):
+                self._draw_text_watermark(
+                    watermark_path, page_width, page_height,
+                    watermark_text, font_name, font_size, opacity, angle, color
+                )
             
-            # 合并水印和原PDF
+            # 每种页面尺寸和方向只绘制一次水印
             output_path = os.path.join(output_dir, "watermarked.pdf")
-            
-            reader = PdfReader(pdf_path)
-            watermark_reader = PdfReader(watermark_path)
-            writer = PdfWriter()
-            
-            # 将水印添加到每一页
-            for page in reader.pages:
-                page.merge_page(watermark_reader.pages[0])
-                writer.add_page(page)
-            
-            # 保存结果
-            with open(output_path, "wb") as output_file:
-                writer.write(output_file)
-            
-            # 删除临时水印文件
-            os.remove(watermark_path)
+            with self.instrumentation.operation("add_watermark"):
+                WatermarkEngine(backend, self.instrumentation).apply(pdf_path, output_path, render_overlay, output_dir)
             
             return output_path
             
         except Exception as e:
             raise Exception(f"添加水印失败: {str(e)}")
 
-    def add_image_watermark(self, pdf_path, image_path, output_dir, scale=0.3, opacity=0.3):
+    def _draw_text_watermark(self, watermark_path, page_width, page_height, watermark_text, font_name, font_size, opacity, angle, color):
+        """按页面尺寸绘制平铺的文字水印"""
+        c = canvas.Canvas(watermark_path, pagesize=(page_width, page_height))
+        c.setFillColorRGB(color[0]/255, color[1]/255, color[2]/255, opacity)
+        c.setFont(font_name, font_size)
+        
+        # 计算水印位置和重复次数
+        text_width = c.stringWidth(watermark_text, font_name, font_size)
+        text_height = font_size
+        
+        # 在页面上重复绘制水印
+        x_count = int(page_width / (text_width * 2)) + 2
+        y_count = int(page_height / (text_height * 2)) + 2
+        
+        for i in range(x_count):
+            for j in range(y_count):
+                x = i * text_width * 2
+                y = j * text_height * 2
+                
+                # 保存当前状态
+                c.saveState()
+                # 移动到位置
+                c.translate(x, y)
+                # 旋转
+                c.rotate(angle)
+                # 绘制文字
+                c.drawString(0, 0, watermark_text)
+                # 恢复状态
+                c.restoreState()
+        
+        c.save()
+
+    def add_image_watermark(self, pdf_path, image_path, output_dir, scale=0.3, opacity=0.3, backend="pymupdf"):
         """添加图片水印到PDF
         :param pdf_path: PDF文件路径
         :param image_path: 水印图片路径
         :param output_dir: 输出目录
         :param scale: 图片缩放比例 (0-1)
         :param opacity: 不透明度 (0-1)
+        :param backend: 叠加后端 ('pymupdf', 'pypdf')
         :return: 输出文件路径
         """
         try:
             # 确保输出目录存在
             os.makedirs(output_dir, exist_ok=True)
             
-            # 创建水印PDF
-            watermark_path = os.path.join(output_dir, f"watermark_{uuid.uuid4()}.pdf")
-            
-            # 获取PDF页面大小
-            with open(pdf_path, 'rb') as file:
-                pdf = PdfReader(file)
-                if len(pdf.pages) > 0:
-                    page = pdf.pages[0]
-                    page_width = float(page.mediabox.width)
-                    page_height = float(page.mediabox.height)
-                else:
-                    page_width, page_height = letter
-            
-            # 创建水印
-            c = canvas.Canvas(watermark_path, pagesize=(page_width, page_height))
-            
             # 处理图片
             img = Image.open(image_path)
             img_width, img_height = img.size
             
-            # 计算缩放后的尺寸
-            scaled_width = img_width * scale
-            scaled_height = img_height * scale
-            
-            # 计算水印位置和重复次数
-            x_count = int(page_width / (scaled_width * 1.5)) + 1
-            y_count = int(page_height / (scaled_height * 1.5)) + 1
+            def render_overlay(watermark_path, page_width, page_height):
+                self._draw_image_watermark(
+                    watermark_path, page_width, page_height,
+                    image_path, img_width * scale, img_height * scale, opacity
+                )
             
-            # 在页面上重复绘制水印
-            for i in range(x_count):
-                for j in range(y_count):
-                    x = i * scaled_width * 1.5
-                    y = j * scaled_height * 1.5
-                    c.drawImage(
-                        image_path, x, y,
-                        width=scaled_width,
-                        height=scaled_height,
-                        mask='auto',
-                        alpha=opacity
-                    )
-            
-            c.save()
-            
-            # 合并水印和原PDF
+            # 每种页面尺寸和方向只绘制一次水印
             output_path = os.path.join(output_dir, "watermarked.pdf")
-            
-            reader = PdfReader(pdf_path)
-            watermark_reader = PdfReader(watermark_path)
-            writer = PdfWriter()
-            
-            # 将水印添加到每一页
-            for page in reader.pages:
-                page.merge_page(watermark_reader.pages[0])
-                writer.add_page(page)
-            
-            # 保存结果
-            with open(output_path, "wb") as output_file:
-                writer.write(output_file)
-            
-            # 删除临时水印文件
-            os.remove(watermark_path)
+            with self.instrumentation.operation("add_image_watermark"):
+                WatermarkEngine(backend, self.instrumentation).apply(pdf_path, output_path, render_overlay, output_dir)
             
             return output_path
             
         except Exception as e:
             raise Exception(f"添加图片水印失败: {str(e)}")
+
+    def _draw_image_watermark(self, watermark_path, page_width, page_height, image_path, scaled_width, scaled_height, opacity):
+        """按页面尺寸绘制平铺的图片水印"""
+        c = canvas.Canvas(watermark_path, pagesize=(page_width, page_height))
+        # 图片绘制受填充透明度(ca)控制
+        c.setFillAlpha(opacity)
+        
+        # 计算水印位置和重复次数
+        x_count = int(page_width / (scaled_width * 1.5)) + 1
+        y_count = int(page_height / (scaled_height * 1.5)) + 1
+        
+        # 在页面上重复绘制水印
+        for i in range(x_count):
+            for j in range(y_count):
+                x = i * scaled_width * 1.5
+                y = j * scaled_height * 1.5
+                c.drawImage(
+                    image_path, x, y,
+                    width=scaled_width,
+                    height=scaled_height,
+                    mask='auto'
+                )
+        
+        c.save()
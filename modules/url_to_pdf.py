@@ -1,96 +1,501 @@
 import os
+import re
+import glob
+import json
+import hashlib
 import weasyprint
+from weasyprint.urls import URLFetcher, URLFetcherResponse
 import httpx
 import asyncio
-from bs4 import BeautifulSoup
+from urllib.parse import urlsplit
+from concurrent.futures import ProcessPoolExecutor
 import time
+from utils.http_cache import HTTPCache, CacheStats
+from utils.instrumentation import NULL_INSTRUMENTATION, WRITE
+from modules.html_sanitizer import select_sanitizer
+from modules.html_chunker import split_html, merge_chunks
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+
+PAGE_SIZES = {
+    "A4": {"width": "210mm", "height": "297mm"},
+    "Letter": {"width": "215.9mm", "height": "279.4mm"},
+    "Legal": {"width": "215.9mm", "height": "355.6mm"}
+}
+
+# 批量转换时可重试的HTTP状态码
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+# 清理后的HTML达到该大小（字节）时按块并行渲染。较小的页面拆分、合并的开销超过并行带来的收益，
+# 而且分块边界会强制分页，只对很长的页面值得
+LONG_DOCUMENT_MIN_BYTES = 2 * 1024 * 1024
+
+# 每个分块的目标大小（字节）
+CHUNK_TARGET_BYTES = 512 * 1024
+
+
+def _page_css(page_size, orientation):
+    """生成页面尺寸和基础排版的CSS"""
+    page_size_dict = PAGE_SIZES.get(page_size, PAGE_SIZES["A4"])
+
+    # 处理页面方向
+    if orientation == "横向":
+        width, height = page_size_dict["height"], page_size_dict["width"]
+    else:
+        width, height = page_size_dict["width"], page_size_dict["height"]
+
+    return f"""
+        @page {{
+            size: {width} {height};
+            margin: 1cm;
+        }}
+        body {{
+            font-family: Arial, sans-serif;
+        }}
+        img {{
+            max-width: 100%;
+            height: auto;
+        }}
+        @media print {{
+            a {{
+                text-decoration: none;
+                color: black;
+            }}
+        }}
+    """
+
+
+# 渲染进程内共用的同步HTTP客户端，供WeasyPrint获取子资源
+_resource_client = None
+
+
+def _get_resource_client():
+    global _resource_client
+    if _resource_client is None:
+        _resource_client = httpx.Client(timeout=30.0, follow_redirects=True, headers={'User-Agent': USER_AGENT})
+    return _resource_client
+
+
+# 进程内共用的字体配置和预编译样式表：页面尺寸和方向的组合只有几种，
+# 每个进程只解析一次样式表、做一次字体发现
+_font_config = None
+_stylesheets = {}
+
+
+def _get_font_config():
+    global _font_config
+    if _font_config is None:
+        from weasyprint.text.fonts import FontConfiguration
+        _font_config = FontConfiguration()
+    return _font_config
+
+
+def _get_stylesheet(page_size, orientation):
+    """取得 (页面尺寸, 方向) 对应的预编译样式表"""
+    if page_size not in PAGE_SIZES:
+        page_size = "A4"
+    key = (page_size, orientation)
+    if key not in _stylesheets:
+        _stylesheets[key] = weasyprint.CSS(string=_page_css(page_size, orientation), font_config=_get_font_config())
+    return _stylesheets[key]
+
+
+def _init_render_worker():
+    """渲染进程的初始化函数：预先编译所有样式表，第一次渲染不再承担这部分开销"""
+    for page_size in PAGE_SIZES:
+        for orientation in ("纵向", "横向"):
+            _get_stylesheet(page_size, orientation)
+
+
+class CachedURLFetcher(URLFetcher):
+    """WeasyPrint的URL获取器：http(s)资源经过HTTPCache，其他（data:、file:）交给WeasyPrint的默认实现"""
+
+    def __init__(self, http_cache, client, stats, **kwargs):
+        """
+        :param client: httpx.Client，缓存未命中或需要重新验证时使用
+        :param stats: CacheStats，记录命中情况
+        """
+        super().__init__(**kwargs)
+        self.http_cache = http_cache
+        self.client = client
+        self.stats = stats
+
+    def fetch(self, url, headers=None):
+        if not url.startswith(("http://", "https://")):
+            return super().fetch(url, headers)
+        header, body = self.http_cache.fetch(self.client, url, self.stats)
+        content_type = header.get("content_type") or "application/octet-stream"
+        return URLFetcherResponse(header.get("final_url", url), body, {"Content-Type": content_type})
+
+
+def _render_pdf(html_content, output_path, page_size, orientation, base_url=None, http_cache=None):
+    """用WeasyPrint把HTML渲染为PDF（可在进程池中调用）
+    :param base_url: 页面的最终URL，用于解析相对链接和资源路径
+    :param http_cache: HTTPCache，图片、CSS等子资源经由缓存获取
+    :return: 子资源的缓存统计字典
+    """
+    stats = CacheStats()
+    url_fetcher = None
+    if http_cache is not None:
+        url_fetcher = CachedURLFetcher(http_cache, _get_resource_client(), stats)
+    html = weasyprint.HTML(string=html_content, base_url=base_url, url_fetcher=url_fetcher)
+    html.write_pdf(
+        output_path,
+        stylesheets=[_get_stylesheet(page_size, orientation)],
+        font_config=_get_font_config()
+    )
+    return stats.as_dict()
+
+
+def _terminate_workers(executor):
+    """关闭进程池并终止其工作进程，不等待正在运行的任务（进程池中的渲染无法单独中断）"""
+    terminate = getattr(executor, "terminate_workers", None)  # Python 3.14+
+    if terminate is not None:
+        terminate()
+        return
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+
+def _output_name(url):
+    """由URL生成稳定且唯一的输出文件名"""
+    parts = urlsplit(url)
+    slug = re.sub(r"[^\w.-]+", "_", f"{parts.netloc}{parts.path}").strip("_")[:80]
+    return f"{slug}_{hashlib.sha1(url.encode('utf-8')).hexdigest()[:10]}.pdf"
+
 
 class URLToPDFConverter:
-    def __init__(self):
-        self.supported_sizes = {
-            "A4": {"width": "210mm", "height": "297mm"},
-            "Letter": {"width": "215.9mm", "height": "279.4mm"},
-            "Legal": {"width": "215.9mm", "height": "355.6mm"}
-        }
-        self.client = httpx.AsyncClient(
-            timeout=30.0,
+    def __init__(self, cache_dir="temp", sanitizer="auto", long_document_min_bytes=LONG_DOCUMENT_MIN_BYTES,
+                 chunk_target_bytes=CHUNK_TARGET_BYTES, render_workers=None, instrumentation=None):
+        """
+        :param cache_dir: HTTP缓存的基础目录，为None时不使用缓存
+        :param sanitizer: HTML清理器 ('lxml', 'beautifulsoup')，'auto' 在安装了lxml时使用lxml
+        :param long_document_min_bytes: 清理后的HTML达到该大小时分块并行渲染，为None时不分块
+        :param chunk_target_bytes: 每个分块的目标大小
+        :param render_workers: 单个URL分块渲染时的进程数，默认为CPU核数
+        :param instrumentation: 接收下载/渲染/合并阶段的计时和进度，默认不记录
+        """
+        self.supported_sizes = PAGE_SIZES
+        self._client = None
+        self.http_cache = HTTPCache(cache_dir) if cache_dir else None
+        self.sanitizer = select_sanitizer(sanitizer)
+        self.long_document_min_bytes = long_document_min_bytes
+        self.chunk_target_bytes = chunk_target_bytes
+        self.render_workers = render_workers or os.cpu_count() or 1
+        self._executor = None
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
+
+    def render_executor(self):
+        """转换器持有的渲染进程池，首次使用时创建；工作进程启动时预编译样式表并在之后的转换中复用"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.render_workers, initializer=_init_render_worker)
+        return self._executor
+
+    def close(self):
+        """关闭渲染进程池"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    @staticmethod
+    def _create_client(max_connections=100, max_keepalive_connections=20, timeout=30.0):
+        return httpx.AsyncClient(
+            timeout=timeout,
             follow_redirects=True,
-            headers={
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections
+            ),
+            headers={'User-Agent': USER_AGENT}
         )
-    
-    async def _fetch_url_content(self, url):
-        """异步获取URL内容并进行预处理"""
+
+    @property
+    def client(self):
+        """实例自身的HTTP客户端，只在 convert_async 未传入客户端时才创建"""
+        if self._client is None:
+            self._client = self._create_client()
+        return self._client
+
+    async def aclose(self):
+        """关闭HTTP客户端"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _sanitize(self, html):
+        """移除脚本、样式、跟踪像素和过大的内联data URI"""
+        return self.sanitizer.sanitize(html)
+
+    async def _get(self, client, url, stats):
+        """获取URL（启用缓存时经过缓存），返回 (正文, 最终URL)"""
+        if self.http_cache is not None:
+            header, body = await self.http_cache.fetch_async(client, url, stats)
+            return body, header.get("final_url", url)
+        response = await client.get(url)
+        response.raise_for_status()
+        stats.record("miss", len(response.content))
+        return response.content, str(response.url)
+
+    async def _fetch_url_content(self, url, client=None, stats=None):
+        """异步获取URL内容并进行预处理
+        :param client: 使用的HTTP客户端，默认为实例自身的客户端（请求结束后不关闭，可继续复用）
+        :return: (处理后的HTML, 最终URL)
+        """
         try:
-            response = await self.client.get(url)
-            response.raise_for_status()
-            
-            # 使用BeautifulSoup处理HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # 移除不需要的元素
-            for script in soup(["script", "style"]):
-                script.decompose()
-                
-            return str(soup)
+            body, final_url = await self._get(client or self.client, url, stats or CacheStats())
+            # 清理是CPU密集的解析，放到线程中执行，不阻塞事件循环上的其他请求
+            html_content = await asyncio.get_running_loop().run_in_executor(None, self._sanitize, body)
+            return html_content, final_url
         except Exception as e:
             raise Exception(f"获取URL内容失败: {str(e)}")
-        finally:
-            await self.client.aclose()
-    
-    async def convert_async(self, url, output_dir, page_size="A4", orientation="纵向"):
-        """异步将URL转换为PDF"""
+
+    def _note_cache_writes(self, stats):
+        """子资源在渲染进程中写入缓存，由本进程按未命中数累计并触发淘汰"""
+        if self.http_cache is not None:
+            self.http_cache.note_writes(stats.misses)
+
+    def _chunks_for(self, html_content):
+        """长页面拆分为多个分块，其他情况返回只含原文档的列表"""
+        if self.long_document_min_bytes is None or len(html_content) < self.long_document_min_bytes:
+            return [html_content]
+        return split_html(html_content, self.chunk_target_bytes)
+
+    async def _render(self, executor, html_content, output_path, page_size, orientation, base_url,
+                      report_chunks=False):
+        """在进程池中渲染，长页面的各分块并行渲染后合并
+        :param report_chunks: 为True时按完成的分块上报进度（批量转换时各URL并发渲染，不逐块上报）
+        :return: 子资源的缓存统计字典
+        """
+        loop = asyncio.get_running_loop()
+        chunks = self._chunks_for(html_content)
+        if len(chunks) == 1:
+            return await loop.run_in_executor(
+                executor, _render_pdf, html_content, output_path, page_size, orientation, base_url, self.http_cache
+            )
+
+        stats = CacheStats()
+        chunk_paths = [f"{output_path}.chunk{index}" for index in range(len(chunks))]
+        done = 0
+
+        async def render_chunk(chunk, chunk_path):
+            nonlocal done
+            result = await loop.run_in_executor(
+                executor, _render_pdf, chunk, chunk_path, page_size, orientation, base_url, self.http_cache
+            )
+            done += 1
+            if report_chunks:
+                self.instrumentation.progress(done, len(chunks), unit="chunk")
+            return result
+
         try:
-            # 获取并处理HTML内容
-            html_content = await self._fetch_url_content(url)
-            
-            # 设置PDF样式
-            page_size_dict = self.supported_sizes.get(page_size, self.supported_sizes["A4"])
-            
-            # 处理页面方向
-            if orientation == "横向":
-                width, height = page_size_dict["height"], page_size_dict["width"]
+            # 各分块使用相同的@page样式和base_url
+            results = await asyncio.gather(*(
+                render_chunk(chunk, chunk_path) for chunk, chunk_path in zip(chunks, chunk_paths)
+            ))
+            for result in results:
+                stats.merge(result)
+            if report_chunks:
+                with self.instrumentation.phase(WRITE):
+                    await loop.run_in_executor(None, merge_chunks, chunk_paths, output_path)
             else:
-                width, height = page_size_dict["width"], page_size_dict["height"]
-            
-            # 创建CSS样式
-            css_string = f"""
-                @page {{
-                    size: {width} {height};
-                    margin: 1cm;
-                }}
-                body {{
-                    font-family: Arial, sans-serif;
-                }}
-                img {{
-                    max-width: 100%;
-                    height: auto;
-                }}
-                @media print {{
-                    a {{
-                        text-decoration: none;
-                        color: black;
-                    }}
-                }}
-            """
-            
-            # 确保输出目录存在
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # 生成输出文件路径
-            output_path = os.path.join(output_dir, f"converted_{int(time.time())}.pdf")
-            
-            # 转换为PDF
-            html = weasyprint.HTML(string=html_content)
-            css = weasyprint.CSS(string=css_string)
-            html.write_pdf(output_path, stylesheets=[css])
+                await loop.run_in_executor(None, merge_chunks, chunk_paths, output_path)
+        finally:
+            for chunk_path in chunk_paths:
+                if os.path.exists(chunk_path):
+                    os.remove(chunk_path)
+        return stats.as_dict()
+
+    async def convert_async(self, url, output_dir, page_size="A4", orientation="纵向", client=None, return_stats=False):
+        """异步将URL转换为PDF
+        :param return_stats: 为True时同时返回本次转换的缓存统计
+        """
+        instrumentation = self.instrumentation
+        try:
+            with instrumentation.operation("url_to_pdf"):
+                # 获取并处理HTML内容
+                stats = CacheStats()
+                with instrumentation.phase("fetch"):
+                    html_content, final_url = await self._fetch_url_content(url, client, stats)
+                instrumentation.count_bytes("read", len(html_content))
+
+                # 确保输出目录存在
+                os.makedirs(output_dir, exist_ok=True)
+
+                # 生成输出文件路径
+                output_path = os.path.join(output_dir, f"converted_{int(time.time())}.pdf")
+
+                # 转换为PDF；长页面在进程池中分块并行渲染
+                with instrumentation.phase("render"):
+                    if len(self._chunks_for(html_content)) > 1:
+                        stats.merge(await self._render(
+                            self.render_executor(), html_content, output_path, page_size, orientation, final_url,
+                            report_chunks=True
+                        ))
+                    else:
+                        stats.merge(_render_pdf(
+                            html_content, output_path, page_size, orientation, final_url, self.http_cache
+                        ))
+                self._note_cache_writes(stats)
+                instrumentation.count_file("written", output_path)
             
+            if return_stats:
+                return output_path, stats.as_dict()
             return output_path
-            
+
         except Exception as e:
             raise Exception(f"URL转换PDF失败: {str(e)}")
-    
-    def convert(self, url, output_dir, page_size="A4", orientation="纵向"):
+
+    def convert(self, url, output_dir, page_size="A4", orientation="纵向", return_stats=False):
         """同步方法包装异步转换功能"""
-        return asyncio.run(self.convert_async(url, output_dir, page_size, orientation))
+        async def run():
+            # 每次调用都有新的事件循环，客户端需在同一循环内创建和关闭
+            async with self._create_client() as client:
+                return await self.convert_async(url, output_dir, page_size, orientation, client, return_stats)
+        return asyncio.run(run())
+
+    def convert_batch(self, urls, output_dir, page_size="A4", orientation="纵向", **options):
+        """批量将URL转换为PDF，参数见 convert_batch_async
+        :return: 清单（每个URL的结果记录列表）
+        """
+        return asyncio.run(self.convert_batch_async(urls, output_dir, page_size, orientation, **options))
+
+    async def convert_batch_async(
+        self,
+        urls,
+        output_dir,
+        page_size="A4",
+        orientation="纵向",
+        max_connections=50,
+        per_host=4,
+        render_workers=None,
+        fetch_timeout=30.0,
+        render_timeout=300.0,
+        retries=2,
+        backoff=1.0,
+        manifest_path=None,
+        skip_existing=True
+    ):
+        """批量将URL转换为PDF
+
+        所有请求共用一个带连接池（keep-alive）的客户端，每个主机同时进行的请求数受限；
+        获取到的HTML交给进程池渲染，渲染与后续URL的获取同时进行。
+        :param max_connections: 连接池的最大连接数
+        :param per_host: 每个主机的最大并发请求数
+        :param render_workers: 渲染进程数，默认使用转换器自身的渲染进程池（跨批次复用）
+        :param fetch_timeout: 单次请求的超时时间（秒）
+        :param render_timeout: 单个URL渲染的超时时间（秒）
+        :param retries: 网络错误或可重试状态码时的重试次数
+        :param backoff: 重试的初始等待时间（秒），每次翻倍
+        :param manifest_path: 清单JSON路径，默认为输出目录下的 manifest.json
+        :param skip_existing: 输出文件已存在时跳过，便于中断后续跑
+        :return: 清单（每个URL的结果记录列表，顺序与输入一致）
+        """
+        instrumentation = self.instrumentation
+        urls = list(urls)
+        os.makedirs(output_dir, exist_ok=True)
+        manifest_path = manifest_path or os.path.join(output_dir, "manifest.json")
+        host_limits = {}
+        if render_workers in (None, self.render_workers):
+            executor = self.render_executor()
+            render_workers = self.render_workers
+        else:
+            executor = ProcessPoolExecutor(max_workers=render_workers, initializer=_init_render_worker)
+        # 同时处理中的URL数：足够占满连接池和渲染进程，又不会一次把所有页面读入内存
+        in_flight = asyncio.Semaphore(max(max_connections, render_workers * 2))
+        loop = asyncio.get_running_loop()
+        timed_out = False
+
+        async def fetch(client, url, record, stats):
+            host = urlsplit(url).netloc
+            semaphore = host_limits.setdefault(host, asyncio.Semaphore(per_host))
+            for attempt in range(retries + 1):
+                record["attempts"] = attempt + 1
+                try:
+                    async with semaphore:
+                        return await self._get(client, url, stats)
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+                    if attempt >= retries or (status is not None and status not in RETRY_STATUS_CODES):
+                        raise
+                    await asyncio.sleep(backoff * (2 ** attempt))
+
+        async def process(client, executor, url):
+            nonlocal timed_out
+            output_path = os.path.join(output_dir, _output_name(url))
+            record = {"url": url, "output": output_path, "status": "ok", "error": None, "attempts": 0}
+            if skip_existing and os.path.exists(output_path):
+                record["status"] = "skipped"
+                return record
+
+            started = time.perf_counter()
+            stats = CacheStats()
+            try:
+                async with in_flight:
+                    body, final_url = await fetch(client, url, record, stats)
+                    html_content = await loop.run_in_executor(None, self._sanitize, body)
+                    record["fetch_seconds"] = round(time.perf_counter() - started, 4)
+
+                    # 先渲染到临时文件，完成后原子替换，输出文件存在即代表该URL已完成
+                    render_started = time.perf_counter()
+                    partial_path = f"{output_path}.part"
+                    stats.merge(await asyncio.wait_for(
+                        self._render(executor, html_content, partial_path, page_size, orientation, final_url),
+                        timeout=render_timeout
+                    ))
+                    os.replace(partial_path, output_path)
+                    self._note_cache_writes(stats)
+                    record["render_seconds"] = round(time.perf_counter() - render_started, 4)
+                    record["output_size"] = os.path.getsize(output_path)
+                    instrumentation.count_bytes("written", record["output_size"])
+            except asyncio.TimeoutError:
+                # 进程池中的渲染无法中断，超时后丢弃其结果，批次结束时终止工作进程
+                timed_out = True
+                record.update(status="failed", error=f"渲染超时（{render_timeout}秒）")
+            except Exception as e:
+                record.update(status="failed", error=str(e) or e.__class__.__name__)
+            if record["status"] == "failed" and os.path.exists(f"{output_path}.part"):
+                os.remove(f"{output_path}.part")
+            record["cache"] = stats.as_dict()
+            record["seconds"] = round(time.perf_counter() - started, 4)
+            return record
+
+        # 各URL并发处理，不单独计阶段，按完成的URL数上报进度
+        completed = 0
+
+        async def process_and_report(client, executor, url):
+            nonlocal completed
+            record = await process(client, executor, url)
+            completed += 1
+            instrumentation.progress(completed, len(urls), unit="url")
+            return record
+
+        async with self._create_client(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            timeout=fetch_timeout
+        ) as client:
+            try:
+                with instrumentation.operation("url_to_pdf_batch"):
+                    records = await asyncio.gather(*(process_and_report(client, executor, url) for url in urls))
+            finally:
+                if timed_out:
+                    # 超时的渲染仍占着工作进程，正常关闭会一直等它完成；
+                    # 转换器自身的进程池也一并丢弃，下次使用时重新创建
+                    _terminate_workers(executor)
+                    if executor is self._executor:
+                        self._executor = None
+                    # 终止前超时的渲染可能又写出了临时文件
+                    for url in urls:
+                        pattern = f"{glob.escape(os.path.join(output_dir, _output_name(url)))}.part*"
+                        for partial_path in glob.glob(pattern):
+                            os.remove(partial_path)
+                elif executor is not self._executor:
+                    executor.shutdown()
+
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(records, f, ensure_ascii=False, indent=2)
+        return records
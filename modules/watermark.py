@@ -0,0 +1,157 @@
+import os
+import time
+import uuid
+import fitz  # PyMuPDF
+from pypdf import PdfReader, PdfWriter, Transformation
+from utils.instrumentation import NULL_INSTRUMENTATION, PARSE, TRANSFORM, WRITE
+
+# 可选的水印叠加后端
+BACKENDS = ("pymupdf", "pypdf")
+
+
+class WatermarkEngine:
+    """按页面几何（宽、高、旋转）分组生成水印叠加层并复用
+
+    render_overlay(path, width, height) 负责在给定的可视尺寸上绘制一页水印PDF，
+    同一几何的所有页面共用一个叠加层。
+    """
+
+    def __init__(self, backend="pymupdf", instrumentation=None):
+        """:param instrumentation: 接收逐页进度和分阶段计时，默认不记录"""
+        if backend not in BACKENDS:
+            raise ValueError(f"未知的水印后端: {backend}")
+        self.backend = backend
+        self.instrumentation = instrumentation or NULL_INSTRUMENTATION
+
+    def apply(self, pdf_path, output_path, render_overlay, work_dir):
+        """将水印叠加到PDF的每一页
+        :param pdf_path: PDF文件路径
+        :param output_path: 输出文件路径
+        :param render_overlay: 绘制水印叠加层的函数
+        :param work_dir: 存放临时叠加层文件的目录
+        :return: 生成的叠加层数量
+        """
+        overlays = {}
+        try:
+            self.instrumentation.count_file("read", pdf_path)
+            if self.backend == "pymupdf":
+                self._apply_pymupdf(pdf_path, output_path, render_overlay, work_dir, overlays)
+            else:
+                self._apply_pypdf(pdf_path, output_path, render_overlay, work_dir, overlays)
+            self.instrumentation.count_file("written", output_path)
+        finally:
+            # 删除临时水印文件
+            for overlay_path in overlays.values():
+                if os.path.exists(overlay_path):
+                    os.remove(overlay_path)
+        return len(overlays)
+
+    def _overlay_for(self, overlays, key, visual_size, render_overlay, work_dir):
+        """取得某个几何对应的叠加层文件，不存在时绘制"""
+        if key not in overlays:
+            overlay_path = os.path.join(work_dir, f"watermark_{uuid.uuid4()}.pdf")
+            render_overlay(overlay_path, *visual_size)
+            overlays[key] = overlay_path
+        return overlays[key]
+
+    def _apply_pymupdf(self, pdf_path, output_path, render_overlay, work_dir, overlays):
+        """PyMuPDF后端：叠加层作为Form XObject插入，同一源页面的资源只复制一次"""
+        instrumentation = self.instrumentation
+        with instrumentation.phase(PARSE):
+            doc = fitz.open(pdf_path)
+        overlay_docs = {}
+        try:
+            with instrumentation.phase(TRANSFORM):
+                for page in doc:
+                    rotation = page.rotation
+                    key = (round(page.cropbox.width, 2), round(page.cropbox.height, 2), rotation)
+                    if key not in overlay_docs:
+                        overlay_path = self._overlay_for(
+                            overlays, key, (page.rect.width, page.rect.height), render_overlay, work_dir
+                        )
+                        overlay_docs[key] = fitz.open(overlay_path)
+
+                    # 叠加层按可视方向绘制，插入时转换回未旋转的页面坐标
+                    page.show_pdf_page(
+                        page.rect * page.derotation_matrix,
+                        overlay_docs[key],
+                        0,
+                        rotate=rotation,
+                        overlay=True
+                    )
+                    instrumentation.progress(page.number + 1, doc.page_count)
+
+            with instrumentation.phase(WRITE):
+                doc.save(output_path, garbage=1, deflate=True)
+        finally:
+            for overlay_doc in overlay_docs.values():
+                overlay_doc.close()
+            doc.close()
+
+    def _apply_pypdf(self, pdf_path, output_path, render_overlay, work_dir, overlays):
+        """pypdf后端：逐页merge叠加层，旋转页面通过变换矩阵对齐"""
+        instrumentation = self.instrumentation
+        with instrumentation.phase(PARSE):
+            reader = PdfReader(pdf_path)
+            page_count = len(reader.pages)
+        writer = PdfWriter()
+        overlay_pages = {}
+
+        with instrumentation.phase(TRANSFORM):
+            for number, page in enumerate(reader.pages, 1):
+                box = page.cropbox
+                x0, y0 = float(box.left), float(box.bottom)
+                width, height = float(box.width), float(box.height)
+                rotation = page.rotation % 360
+                key = (round(width, 2), round(height, 2), rotation)
+
+                if key not in overlay_pages:
+                    visual_size = (height, width) if rotation in (90, 270) else (width, height)
+                    overlay_path = self._overlay_for(overlays, key, visual_size, render_overlay, work_dir)
+                    overlay_pages[key] = PdfReader(overlay_path).pages[0]
+
+                page.merge_transformed_page(
+                    overlay_pages[key],
+                    Transformation(self._derotation_ctm(rotation, x0, y0, width, height))
+                )
+                writer.add_page(page)
+                instrumentation.progress(number, page_count)
+
+        # 保存结果
+        with instrumentation.phase(WRITE):
+            with open(output_path, "wb") as output_file:
+                writer.write(output_file)
+
+    @staticmethod
+    def _derotation_ctm(rotation, x0, y0, width, height):
+        """可视坐标（已旋转）到未旋转页面坐标的变换矩阵"""
+        if rotation == 90:
+            return (0, 1, -1, 0, x0 + width, y0)
+        if rotation == 180:
+            return (-1, 0, 0, -1, x0 + width, y0 + height)
+        if rotation == 270:
+            return (0, -1, 1, 0, x0, y0 + height)
+        return (1, 0, 0, 1, x0, y0)
+
+
+def benchmark_backends(pdf_path, render_overlay, work_dir, backends=BACKENDS, repeat=3):
+    """比较各后端添加水印的耗时
+    :return: {后端: {'best': 最短秒数, 'mean': 平均秒数, 'output_size': 输出字节数}}
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    results = {}
+    for backend in backends:
+        engine = WatermarkEngine(backend)
+        output_path = os.path.join(work_dir, f"benchmark_{backend}.pdf")
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            engine.apply(pdf_path, output_path, render_overlay, work_dir)
+            timings.append(time.perf_counter() - start)
+        results[backend] = {
+            "best": min(timings),
+            "mean": sum(timings) / len(timings),
+            "output_size": os.path.getsize(output_path),
+        }
+        os.remove(output_path)
+    return results
@@ -0,0 +1,55 @@
+import fitz  # PyMuPDF
+
+import cli
+
+
+def _make_pdf(path, pages=3):
+    doc = fitz.open()
+    for index in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {index + 1}", fontsize=14)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def _ops(*specs):
+    return [cli.parse_operation(spec) for spec in specs]
+
+
+def test_chain_can_repeat_operations(tmp_path):
+    source = _make_pdf(tmp_path / "source.pdf")
+    operations = _ops(
+        "watermark text=first", "watermark text=second",
+        "rotate angle=90", "rotate angle=90 pages=1-2 incremental=1",
+        "compress", "compress"
+    )
+    output_path = str(tmp_path / "out" / "source.pdf")
+    (tmp_path / "out").mkdir()
+
+    record = cli.process_one(source, operations, output_path, str(tmp_path))
+
+    assert record["status"] == "ok", record["error"]
+    assert [step["op"] for step in record["steps"]] == [name for name, _ in operations]
+    with fitz.open(output_path) as doc:
+        assert [page.rotation for page in doc] == [180, 180, 90]
+        text = doc[0].get_text()
+    assert "first" in text and "second" in text
+    # 临时目录已清理，输入文件保持不变
+    assert not list(tmp_path.glob("job_*"))
+    with fitz.open(source) as doc:
+        assert [page.rotation for page in doc] == [0, 0, 0]
+
+
+def test_run_batch_skips_existing_outputs(tmp_path):
+    inputs = [_make_pdf(tmp_path / "a.pdf"), _make_pdf(tmp_path / "b.pdf", pages=1)]
+    operations = _ops("rotate angle=90", "rotate angle=90")
+    output_dir = str(tmp_path / "out")
+
+    first = cli.run_batch(inputs, operations, output_dir, workers=2)
+    assert (first["ok"], first["failed"], first["skipped"]) == (2, 0, 0)
+    with fitz.open(str(tmp_path / "out" / "b.pdf")) as doc:
+        assert doc[0].rotation == 180
+
+    second = cli.run_batch(inputs, operations, output_dir, workers=2)
+    assert (second["ok"], second["skipped"]) == (0, 2)
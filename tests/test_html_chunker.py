@@ -0,0 +1,27 @@
+import pytest
+
+pytest.importorskip("lxml")
+
+import lxml.html
+
+from modules.html_chunker import split_html, CHUNK_LINK_PREFIX
+
+
+def test_split_keeps_body_attributes_escaped():
+    html = (
+        '<html><head><title>t</title></head>'
+        '<body class="a&quot;b" data-x=\'say "hi" &lt;b&gt;\' onload="">'
+        '<p id="top">one</p><p>two</p><p><a href="#top">back</a></p></body></html>'
+    )
+    chunks = split_html(html, target_chunk_bytes=1)
+    assert len(chunks) == 3
+
+    for chunk in chunks:
+        body = lxml.html.document_fromstring(chunk).find("body")
+        assert body.get("class") == 'a"b'
+        assert body.get("data-x") == 'say "hi" <b>'
+        assert len(body) == 1
+
+    # 指向其他分块的链接改写为占位前缀
+    link = lxml.html.document_fromstring(chunks[2]).find(".//a")
+    assert link.get("href") == CHUNK_LINK_PREFIX + "top"
@@ -0,0 +1,108 @@
+import os
+import time
+
+import httpx
+import pytest
+
+from utils import http_cache
+from utils.http_cache import HTTPCache, CacheStats
+
+LAST_MODIFIED = "Wed, 01 Oct 2025 00:00:00 GMT"
+
+# (路径, If-None-Match, If-Modified-Since)
+request_log = []
+
+
+def _handler(request):
+    """/etag 和 /dated 每次都需重新验证，条件请求匹配时返回304；/fresh 可缓存1小时；/private 不可缓存"""
+    request_log.append((request.url.path, request.headers.get("if-none-match"),
+                        request.headers.get("if-modified-since")))
+    path = request.url.path
+    if path == "/etag":
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, content=b"etag body", headers={"ETag": '"v1"', "Cache-Control": "no-cache"})
+    if path == "/dated":
+        if request.headers.get("if-modified-since") == LAST_MODIFIED:
+            return httpx.Response(304)
+        return httpx.Response(200, content=b"dated body",
+                              headers={"Last-Modified": LAST_MODIFIED, "Cache-Control": "max-age=0"})
+    if path == "/fresh":
+        return httpx.Response(200, content=b"fresh body", headers={"Cache-Control": "max-age=3600"})
+    if path == "/private":
+        return httpx.Response(200, content=b"private", headers={"Cache-Control": "no-store"})
+    return httpx.Response(200, content=path.encode() * 10)
+
+
+@pytest.fixture
+def client():
+    request_log.clear()
+    with httpx.Client(transport=httpx.MockTransport(_handler)) as client:
+        yield client
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return HTTPCache(str(tmp_path))
+
+
+def _fetch_twice(cache, client, url):
+    stats = CacheStats()
+    first = cache.fetch(client, url, stats)[1]
+    second = cache.fetch(client, url, stats)[1]
+    return first, second, stats.as_dict()
+
+
+def test_fresh_entry_does_not_hit_network(cache, client):
+    first, second, stats = _fetch_twice(cache, client, "http://example.test/fresh")
+    assert first == second == b"fresh body"
+    assert len(request_log) == 1
+    assert (stats["misses"], stats["hits"], stats["bytes_from_cache"]) == (1, 1, len(b"fresh body"))
+
+
+def test_revalidates_with_etag(cache, client):
+    first, second, stats = _fetch_twice(cache, client, "http://example.test/etag")
+    assert first == second == b"etag body"
+    assert [entry[1] for entry in request_log] == [None, '"v1"']
+    assert (stats["misses"], stats["revalidated"]) == (1, 1)
+
+
+def test_revalidates_with_last_modified(cache, client):
+    first, second, stats = _fetch_twice(cache, client, "http://example.test/dated")
+    assert first == second == b"dated body"
+    assert [entry[2] for entry in request_log] == [None, LAST_MODIFIED]
+    assert (stats["misses"], stats["revalidated"]) == (1, 1)
+
+
+def test_no_store_is_not_cached(cache, client):
+    _, _, stats = _fetch_twice(cache, client, "http://example.test/private")
+    assert stats["misses"] == 2
+    assert cache.stats()["entries"] == 0
+
+
+def test_evict_keeps_size_bound_by_access_time(cache, client):
+    stats = CacheStats()
+    urls = [f"http://example.test/item{index}" for index in range(4)]
+    for index, url in enumerate(urls):
+        cache.fetch(client, url, stats)
+        stamp = time.time() - 100 + index
+        os.utime(cache._entry_path(url), (stamp, stamp))
+    # 访问第一个条目，使其成为最近使用的
+    cache.fetch(client, urls[0], stats)
+    entry_size = os.path.getsize(cache._entry_path(urls[1]))
+    cache.max_size = entry_size * 2
+
+    assert cache.evict() == 2
+    assert cache.stats()["size_bytes"] <= cache.max_size
+    assert os.path.exists(cache._entry_path(urls[0]))
+    assert os.path.exists(cache._entry_path(urls[3]))
+    assert not os.path.exists(cache._entry_path(urls[1]))
+
+
+def test_note_writes_evicts_every_n_writes(cache, monkeypatch):
+    calls = []
+    monkeypatch.setattr(cache, "evict", lambda: calls.append(1))
+    cache.note_writes(http_cache.EVICT_EVERY - 1)
+    assert calls == []
+    cache.note_writes(1)
+    assert calls == [1]
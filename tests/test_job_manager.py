@@ -0,0 +1,136 @@
+import os
+import time
+
+import pytest
+
+from utils import job_manager as jobs
+from utils.job_manager import JobManager, DONE, FAILED, CANCELLED, QUEUED, RUNNING
+
+
+class GatedTarget:
+    """测试用的任务对象：wait 一直运行到闸门文件出现"""
+
+    def __init__(self, instrumentation=None):
+        self.instrumentation = instrumentation
+
+    def wait(self, gate_path, result):
+        while not os.path.exists(gate_path):
+            time.sleep(0.02)
+        return result
+
+    def fail(self):
+        raise ValueError("boom")
+
+
+@pytest.fixture
+def gate(tmp_path):
+    return tmp_path / "gate"
+
+
+@pytest.fixture
+def manager(monkeypatch, gate):
+    # 工作进程由fork创建，继承这里登记的任务对象
+    monkeypatch.setitem(jobs.JOB_TARGETS, "gated", (__name__, "GatedTarget"))
+    manager = JobManager(max_workers=2, max_jobs_per_session=2)
+    yield manager
+    # 断言失败时也打开闸门，工作进程才能退出
+    gate.touch()
+    manager.shutdown()
+
+
+def _wait_for(manager, work_dir, job_id, states, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = manager.status(work_dir, job_id)
+        if status["state"] in states:
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"任务 {job_id} 未进入 {states}，当前 {status['state']}")
+
+
+def _wait_until_idle(manager, job_id, timeout=20):
+    deadline = time.time() + timeout
+    while manager._occupies_worker(job_id) and time.time() < deadline:
+        time.sleep(0.05)
+
+
+def test_submit_runs_job_and_records_result(manager, gate, tmp_path):
+    work_dir = str(tmp_path)
+    gate.touch()
+    job_id = manager.submit(work_dir, "gated", "wait", str(gate), "out.pdf")
+
+    status = _wait_for(manager, work_dir, job_id, (DONE,))
+    assert status["result"] == "out.pdf"
+    assert status["progress"] == 1.0
+    assert status["finished_at"] >= status["started_at"] >= status["submitted_at"]
+    assert manager.active_jobs(work_dir) == []
+
+
+def test_failure_is_reported_with_error_class(manager, tmp_path):
+    work_dir = str(tmp_path)
+    job_id = manager.submit(work_dir, "gated", "fail")
+
+    status = _wait_for(manager, work_dir, job_id, (FAILED,))
+    assert status["error"] == "boom"
+    assert status["error_type"] == "ValueError"
+
+
+def test_session_job_limit(manager, gate, tmp_path):
+    work_dir = str(tmp_path)
+    first = manager.submit(work_dir, "gated", "wait", str(gate), 1)
+    second = manager.submit(work_dir, "gated", "wait", str(gate), 2)
+    with pytest.raises(RuntimeError):
+        manager.submit(work_dir, "gated", "wait", str(gate), 3)
+
+    # 其他会话不受影响
+    other = manager.submit(str(tmp_path / "other"), "gated", "wait", str(gate), 4)
+
+    gate.touch()
+    for job_id, directory in ((first, work_dir), (second, work_dir), (other, str(tmp_path / "other"))):
+        _wait_for(manager, directory, job_id, (DONE,))
+    assert manager.submit(work_dir, "gated", "wait", str(gate), 5)
+
+
+def test_cancel_is_sticky_and_still_counts_until_worker_finishes(manager, gate, tmp_path):
+    work_dir = str(tmp_path)
+    running = manager.submit(work_dir, "gated", "wait", str(gate), "result")
+    _wait_for(manager, work_dir, running, (RUNNING,))
+
+    assert manager.cancel(work_dir, running) is False
+    assert manager.status(work_dir, running)["state"] == CANCELLED
+
+    # 取消后工作进程仍在执行，不能立即占用新的名额
+    manager.submit(work_dir, "gated", "wait", str(gate), "second")
+    with pytest.raises(RuntimeError):
+        manager.submit(work_dir, "gated", "wait", str(gate), "third")
+
+    # 任务进程结束时不会把取消覆盖为完成
+    gate.touch()
+    _wait_until_idle(manager, running)
+    status = manager.status(work_dir, running)
+    assert status["state"] == CANCELLED
+    assert status["result"] is None
+    assert running not in manager.active_jobs(work_dir)
+
+
+def test_cancel_before_start(manager, gate, tmp_path):
+    work_dir = str(tmp_path)
+    # 占满两个工作进程，后面的任务留在队列中
+    blockers = [manager.submit(str(tmp_path / f"s{i}"), "gated", "wait", str(gate), i) for i in range(2)]
+    for i, job_id in enumerate(blockers):
+        _wait_for(manager, str(tmp_path / f"s{i}"), job_id, (RUNNING,))
+    queued = manager.submit(work_dir, "gated", "wait", str(gate), "queued")
+    assert manager.status(work_dir, queued)["state"] == QUEUED
+
+    # 已交给进程池内部队列的任务无法撤回，开始执行时会看到取消标记直接返回
+    manager.cancel(work_dir, queued)
+    assert manager.status(work_dir, queued)["state"] == CANCELLED
+
+    gate.touch()
+    for i, job_id in enumerate(blockers):
+        _wait_for(manager, str(tmp_path / f"s{i}"), job_id, (DONE,))
+    _wait_until_idle(manager, queued)
+    status = manager.status(work_dir, queued)
+    assert status["state"] == CANCELLED
+    assert "started_at" not in status
+    assert manager.active_jobs(work_dir) == []
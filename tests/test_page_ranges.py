@@ -0,0 +1,25 @@
+import pytest
+
+from utils.page_ranges import parse_pages, parse_ranges
+
+
+def test_ranges_keep_order():
+    assert parse_ranges("1-3,8,10-", 12) == [(1, 3), (8, 8), (10, 12)]
+    assert parse_ranges(" 5 - 6 , -2 ,", 10) == [(5, 6), (1, 2)]
+
+
+def test_pages_are_sorted_and_unique():
+    assert parse_pages("1-3,8,10-", 12) == [1, 2, 3, 8, 10, 11, 12]
+    assert parse_pages("3,1-3,2") == [1, 2, 3]
+    assert parse_pages(" ALL ") == "all"
+
+
+def test_open_range_needs_page_count():
+    with pytest.raises(ValueError, match="页码格式无效: 10-"):
+        parse_pages("1-3,8,10-")
+
+
+@pytest.mark.parametrize("expression", ["", ",", "a", "1-b", "-", "0", "3-2", "1--3", "5-11"])
+def test_invalid_expressions(expression):
+    with pytest.raises(ValueError):
+        parse_ranges(expression, 10)
@@ -0,0 +1,95 @@
+import fitz  # PyMuPDF
+import pytest
+
+from modules.pdf_backends import BACKENDS, select_backend
+
+PASSWORD = "secret"
+
+# pypdf的AES需要cryptography，两个后端统一使用RC4-128
+ALGORITHM = "RC4-128"
+
+
+def _make_pdf(path, pages, rotated=()):
+    """带页码文字的PDF，rotated中的页面（从0开始）预先旋转90度，最后一页使用横向尺寸"""
+    doc = fitz.open()
+    for index in range(pages):
+        width, height = (842, 595) if index == pages - 1 else (595, 842)
+        page = doc.new_page(width=width, height=height)
+        page.insert_text((72, 72), f"Page {index + 1}", fontsize=14)
+        if index in rotated:
+            page.set_rotation(90)
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def _pages(pdf_path, password=None):
+    """每页的 (文字, 旋转角度)"""
+    with fitz.open(pdf_path) as doc:
+        if doc.needs_pass:
+            assert doc.authenticate(password)
+        return [(" ".join(page.get_text().split()), page.rotation) for page in doc]
+
+
+@pytest.fixture
+def source(tmp_path):
+    return _make_pdf(tmp_path / "source.pdf", 5, rotated={1})
+
+
+def _run_both(tmp_path, name, call, password=None):
+    """用两个后端执行同一操作，返回 {后端名: 每页特征}"""
+    results = {}
+    for backend_name, backend in BACKENDS.items():
+        output_path = str(tmp_path / f"{name}_{backend_name}.pdf")
+        call(backend, output_path)
+        results[backend_name] = _pages(output_path, password)
+    return results
+
+
+def test_split_matches(tmp_path, source):
+    results = _run_both(tmp_path, "split", lambda b, out: b.split(source, out, 2, 4))
+    assert results["pypdf"] == results["pymupdf"]
+    assert [text for text, _ in results["pymupdf"]] == ["Page 2", "Page 3", "Page 4"]
+    assert results["pymupdf"][0][1] == 90
+
+
+def test_merge_matches(tmp_path, source):
+    other = _make_pdf(tmp_path / "other.pdf", 2)
+    results = _run_both(tmp_path, "merge", lambda b, out: b.merge([source, other], out))
+    assert results["pypdf"] == results["pymupdf"]
+    assert len(results["pymupdf"]) == 7
+
+
+@pytest.mark.parametrize("angle, page_indexes", [(90, None), (270, {0, 1, 4}), (180, {2})])
+def test_rotate_matches(tmp_path, source, angle, page_indexes):
+    results = _run_both(tmp_path, "rotate", lambda b, out: b.rotate(source, out, angle, page_indexes))
+    assert results["pypdf"] == results["pymupdf"]
+    original = _pages(source)
+    for index, (_, rotation) in enumerate(results["pymupdf"]):
+        expected = original[index][1]
+        if page_indexes is None or index in page_indexes:
+            expected = (expected + angle) % 360
+        assert rotation == expected
+
+
+def test_encrypt_and_decrypt_match_across_backends(tmp_path, source):
+    encrypted = _run_both(
+        tmp_path, "encrypt", lambda b, out: b.encrypt(source, out, PASSWORD, ALGORITHM), password=PASSWORD
+    )
+    assert encrypted["pypdf"] == encrypted["pymupdf"] == _pages(source)
+
+    # 一个后端加密的文件由另一个后端解密
+    for encrypt_name, decrypt_name in (("pypdf", "pymupdf"), ("pymupdf", "pypdf")):
+        decrypted = str(tmp_path / f"decrypted_{decrypt_name}.pdf")
+        BACKENDS[decrypt_name].decrypt(str(tmp_path / f"encrypt_{encrypt_name}.pdf"), decrypted, PASSWORD)
+        assert _pages(decrypted) == _pages(source)
+
+
+def test_page_count_matches(source):
+    assert BACKENDS["pypdf"].page_count(source) == BACKENDS["pymupdf"].page_count(source) == 5
+
+
+def test_auto_uses_pymupdf():
+    assert select_backend("auto") is BACKENDS["pymupdf"]
+    with pytest.raises(ValueError):
+        select_backend("unknown")
@@ -0,0 +1,56 @@
+import os
+import time
+
+import fitz  # PyMuPDF
+import pytest
+
+from modules import pdf_index
+from modules.pdf_index import DocumentIndex
+
+
+def _make_pdf(path, pages):
+    doc = fitz.open()
+    for _ in range(pages):
+        doc.new_page()
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    directory = tmp_path / "index"
+    monkeypatch.setattr(pdf_index, "INDEX_DIR", str(directory))
+    return directory
+
+
+def test_index_is_stored_by_content_hash_outside_input_dir(tmp_path, index_dir):
+    inputs = tmp_path / "inputs"
+    inputs.mkdir()
+    first = _make_pdf(inputs / "a.pdf", 3)
+
+    assert DocumentIndex.load(first).page_count == 3
+    assert sorted(os.listdir(inputs)) == ["a.pdf"]
+    assert os.listdir(index_dir) == [f"{pdf_index.content_hash(first)}.json"]
+
+    # 内容相同的文件共用索引，内容变化后使用新的索引
+    copy = inputs / "b.pdf"
+    copy.write_bytes(open(first, "rb").read())
+    assert DocumentIndex.load(str(copy)).page_count == 3
+    assert len(os.listdir(index_dir)) == 1
+
+    _make_pdf(inputs / "a.pdf", 5)
+    assert DocumentIndex.load(first).page_count == 5
+    assert len(os.listdir(index_dir)) == 2
+
+
+def test_evict_removes_unused_entries(tmp_path, index_dir):
+    old = _make_pdf(tmp_path / "old.pdf", 1)
+    recent = _make_pdf(tmp_path / "recent.pdf", 2)
+    DocumentIndex.load(old)
+    DocumentIndex.load(recent)
+    stale = time.time() - pdf_index.INDEX_TTL_SECONDS - 60
+    os.utime(pdf_index.index_path(pdf_index.content_hash(old)), (stale, stale))
+
+    assert pdf_index.evict() == 1
+    assert os.listdir(index_dir) == [f"{pdf_index.content_hash(recent)}.json"]
@@ -0,0 +1,87 @@
+import os
+import time
+
+from utils import result_cache as result_cache_module
+from utils.result_cache import ResultCache
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def _compute(tmp_path, data, calls):
+    """返回compute函数：每次调用写出新的结果文件并记录调用次数"""
+    def compute():
+        calls.append(1)
+        return _write(tmp_path / f"result_{len(calls)}.pdf", data)
+    return compute
+
+
+def test_get_or_compute_hits_for_same_content_and_params(tmp_path):
+    cache = ResultCache(base_dir=str(tmp_path / "base"))
+    source = _write(tmp_path / "in.pdf", b"input")
+    calls = []
+
+    first = cache.get_or_compute(source, "compress", _compute(tmp_path, b"out", calls), profile="ebook")
+    second = cache.get_or_compute(source, "compress", _compute(tmp_path, b"out", calls), profile="ebook")
+    assert first == second
+    assert len(calls) == 1
+    # 结果文件移入缓存
+    assert not os.path.exists(tmp_path / "result_1.pdf")
+    with open(first, "rb") as f:
+        assert f.read() == b"out"
+
+    # 参数或内容不同时重新计算；内容相同的另一个文件命中
+    cache.get_or_compute(source, "compress", _compute(tmp_path, b"out", calls), profile="screen")
+    copy = _write(tmp_path / "copy.pdf", b"input")
+    assert cache.get_or_compute(copy, "compress", _compute(tmp_path, b"out", calls), profile="ebook") == first
+    assert len(calls) == 2
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (2, 2, 2)
+
+
+def test_changed_input_gets_new_key(tmp_path):
+    cache = ResultCache(base_dir=str(tmp_path))
+    source = tmp_path / "in.pdf"
+    _write(source, b"v1")
+    before = cache.make_key(str(source), "rotate")
+    _write(source, b"v2-longer")
+    assert cache.make_key(str(source), "rotate") != before
+
+
+def test_evict_expired_and_least_recently_used(tmp_path):
+    cache = ResultCache(base_dir=str(tmp_path / "base"), ttl_hours=1)
+    entries = {}
+    for index, name in enumerate(("old", "used", "new")):
+        entries[name] = cache.put(f"key{index}", _write(tmp_path / f"{name}.pdf", b"x" * 4))
+        # 访问时间相差一秒，淘汰顺序确定
+        stamp = time.time() - 10 + index
+        os.utime(entries[name], (stamp, stamp))
+    cache.get("key1")
+    cache.max_size = 10
+
+    # 12字节超过上限10字节：淘汰最久未访问的一个
+    assert cache.evict() == 1
+    assert not os.path.exists(entries["old"])
+    assert cache.get("key1") == entries["used"]
+
+    expired = time.time() - 2 * 3600
+    os.utime(entries["new"], (expired, expired))
+    assert cache.get("key2") is None
+    assert not os.path.exists(entries["new"])
+
+
+def test_hash_memo_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(result_cache_module, "HASH_MEMO_SIZE", 3)
+    cache = ResultCache(base_dir=str(tmp_path / "base"))
+    paths = [_write(tmp_path / f"{index}.pdf", str(index).encode()) for index in range(5)]
+    for path in paths:
+        cache.make_key(path, "op")
+    assert list(cache._hash_memo) == [os.path.abspath(path) for path in paths[2:]]
+
+    # 文件变化后替换同一路径的条目，不新增
+    _write(tmp_path / "4.pdf", b"changed content")
+    cache.make_key(paths[4], "op")
+    assert len(cache._hash_memo) == 3
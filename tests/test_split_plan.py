@@ -0,0 +1,78 @@
+import io
+import zipfile
+
+import fitz  # PyMuPDF
+import pytest
+
+from modules.pdf_processor import PDFProcessor
+from utils.zip_stream import ZipStream
+
+
+@pytest.fixture
+def source(tmp_path):
+    """10页的PDF，第2页和第4页有一级书签，第5页有二级书签"""
+    doc = fitz.open()
+    for index in range(10):
+        doc.new_page().insert_text((72, 72), f"Page {index + 1}")
+    doc.set_toc([[1, "Intro", 2], [1, "Body: part/1", 4], [2, "Detail", 5]])
+    path = str(tmp_path / "report.pdf")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def _summary(plan):
+    return [(part["number"], part["name"], part["start"], part["end"]) for part in plan]
+
+
+def test_ranges_keep_order_and_unique_names(source):
+    plan = PDFProcessor().plan_split(source, ranges="8-,1-3,1-3,5")
+    assert _summary(plan) == [
+        (1, "report_p8-10.pdf", 8, 10),
+        (2, "report_p1-3.pdf", 1, 3),
+        (3, "report_p1-3_003.pdf", 1, 3),
+        (4, "report_p5-5.pdf", 5, 5),
+    ]
+
+
+def test_chunks_cover_all_pages(source):
+    plan = PDFProcessor().plan_split(source, chunk_size=4)
+    assert [(part["start"], part["end"]) for part in plan] == [(1, 4), (5, 8), (9, 10)]
+
+
+def test_bookmarks_name_parts_by_title(source):
+    plan = PDFProcessor().plan_split(source, bookmark_level=1)
+    # 第一个书签之前的页面单独成为一部分，标题中的非法字符替换为下划线
+    assert _summary(plan) == [
+        (1, "001_开头.pdf", 1, 1),
+        (2, "002_Intro.pdf", 2, 3),
+        (3, "003_Body_part_1.pdf", 4, 10),
+    ]
+    assert plan[2]["toc"][0][:2] == [1, "Body: part/1"]
+
+
+@pytest.mark.parametrize("options", [
+    {"ranges": "3-2"},
+    {"ranges": "1-11"},
+    {"chunk_size": 0},
+    {"bookmark_level": 3},
+    {"ranges": "1", "chunk_size": 2},
+])
+def test_invalid_options(source, options):
+    with pytest.raises(ValueError):
+        PDFProcessor().plan_split(source, **options)
+
+
+def test_zip_entries_follow_part_order(source):
+    with ZipStream() as archive:
+        count = PDFProcessor().split_pdf_zip(source, archive, chunk_size=1, max_workers=3)
+        data = archive.finish().read()
+    assert count == 10
+
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        names = archive.namelist()
+        assert names == [f"report_p{page}-{page}.pdf" for page in range(1, 11)]
+        for page, name in enumerate(names, 1):
+            with fitz.open(stream=archive.read(name), filetype="pdf") as part:
+                assert part.page_count == 1
+                assert f"Page {page}" in part[0].get_text()
@@ -0,0 +1,89 @@
+import os
+import time
+
+import pytest
+
+from utils.temp_storage import TempStorage, PINNED_SESSION_RETRY_SECONDS
+
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = TempStorage(base_dir=str(tmp_path), session_quota_mb=1, budget_mb=10, session_ttl_hours=1)
+    yield storage
+    storage.close()
+
+
+def _file(directory, name, size):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"\0" * size)
+    return path
+
+
+def _session(storage, tmp_path, session_id="s1"):
+    work_dir = str(tmp_path / session_id)
+    os.makedirs(work_dir, exist_ok=True)
+    storage.touch_session(session_id, work_dir)
+    return work_dir
+
+
+def test_quota_evicts_oldest_file_of_session(storage, tmp_path):
+    work_dir = _session(storage, tmp_path)
+    first = _file(work_dir, "a.pdf", MB // 2)
+    second = _file(work_dir, "b.pdf", MB // 2)
+    assert storage.track("s1", first) == 0
+    assert storage.track("s1", second) == 0
+
+    third = _file(work_dir, "c.pdf", MB // 2)
+    assert storage.track("s1", third) == MB // 2
+    assert not os.path.exists(first)
+    assert os.path.exists(second) and os.path.exists(third)
+    assert storage.usage("s1")["session_bytes"] == MB
+
+
+def test_reap_removes_expired_files_and_sessions(storage, tmp_path):
+    work_dir = _session(storage, tmp_path)
+    short = _file(work_dir, "short.pdf", 10)
+    storage.track("s1", short, ttl_hours=0.5)
+    # 未登记的文件（如任务状态）随会话目录一起删除
+    _file(os.path.join(work_dir, "jobs"), "state.json", 5)
+
+    result = storage.reap(now=time.time() + 1800 + 1)
+    assert (result["files"], result["sessions"]) == (1, 0)
+    assert not os.path.exists(short)
+    assert os.path.isdir(work_dir)
+
+    result = storage.reap(now=time.time() + 3600 + 1)
+    assert result["sessions"] == 1
+    assert not os.path.exists(work_dir)
+    assert storage.usage()["sessions"] == 0
+
+
+def test_pinned_files_survive_quota_and_session_expiry(storage, tmp_path):
+    work_dir = _session(storage, tmp_path)
+    pinned = _file(work_dir, "input.pdf", MB // 2)
+    storage.track("s1", pinned)
+    storage.pin("job1", [pinned])
+
+    # 配额淘汰跳过被pin的文件
+    storage.track("s1", _file(work_dir, "b.pdf", MB // 2))
+    storage.track("s1", _file(work_dir, "c.pdf", MB // 2))
+    assert os.path.exists(pinned)
+    assert not os.path.exists(os.path.join(work_dir, "b.pdf"))
+    assert storage.clear_session("s1") == MB // 2
+    assert os.path.exists(pinned)
+
+    # 会话过期时仍有pin：推迟删除
+    later = time.time() + 3600 + 1
+    result = storage.reap(now=later)
+    assert result["sessions"] == 0
+    assert os.path.exists(pinned)
+
+    # 解除pin后的下一次清理删除整个会话
+    storage.unpin("job1")
+    result = storage.reap(now=later + PINNED_SESSION_RETRY_SECONDS + 1)
+    assert result["sessions"] == 1
+    assert not os.path.exists(work_dir)
@@ -0,0 +1,67 @@
+import io
+import os
+
+from utils.file_handler import UploadRegistry
+
+
+class FakeUpload(io.BytesIO):
+    """与Streamlit的UploadedFile相同的接口：name、file_id、size、getbuffer()"""
+
+    def __init__(self, name, data, file_id):
+        super().__init__(data)
+        self.name = name
+        self.file_id = file_id
+        self.size = len(data)
+
+
+def test_rerun_and_reupload_reuse_saved_file(tmp_path):
+    saved = []
+    registry = UploadRegistry({}, on_save=saved.append)
+    upload = FakeUpload("doc.pdf", b"%PDF-1 same", "id-1")
+
+    entry = registry.register(upload, str(tmp_path))
+    assert os.path.dirname(entry["path"]) == str(tmp_path / "uploads" / entry["sha256"][:16])
+    with open(entry["path"], "rb") as f:
+        assert f.read() == b"%PDF-1 same"
+
+    # 重跑（同一file_id）和重新上传相同内容（新的file_id）都复用已保存的文件
+    assert registry.register(upload, str(tmp_path)) is entry
+    assert registry.register(FakeUpload("renamed.pdf", b"%PDF-1 same", "id-2"), str(tmp_path)) is entry
+    assert saved == [entry["path"]]
+
+
+def test_same_name_different_content_kept_apart(tmp_path):
+    registry = UploadRegistry({})
+    first = registry.register(FakeUpload("doc.pdf", b"first", "id-1"), str(tmp_path))
+    second = registry.register(FakeUpload("doc.pdf", b"second", "id-2"), str(tmp_path))
+    assert first["path"] != second["path"]
+    assert os.path.basename(first["path"]) == os.path.basename(second["path"]) == "doc.pdf"
+    with open(first["path"], "rb") as f:
+        assert f.read() == b"first"
+
+
+def test_missing_file_is_saved_again(tmp_path):
+    registry = UploadRegistry({})
+    upload = FakeUpload("doc.pdf", b"data", "id-1")
+    path = registry.register(upload, str(tmp_path))["path"]
+    os.remove(path)
+    assert registry.register(upload, str(tmp_path))["path"] == path
+    assert os.path.exists(path)
+
+
+def test_cached_metadata_computed_once(tmp_path):
+    registry = UploadRegistry({})
+    path = registry.register(FakeUpload("doc.pdf", b"data", "id-1"), str(tmp_path))["path"]
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return 7
+
+    assert registry.cached(path, "page_count", compute) == 7
+    assert registry.cached(path, "page_count", compute) == 7
+    assert len(calls) == 1
+    # 未登记的路径每次都直接计算
+    assert registry.cached(str(tmp_path / "other.pdf"), "page_count", compute) == 7
+    assert len(calls) == 2
+    assert registry.find(path)["metadata"] == {"page_count": 7}
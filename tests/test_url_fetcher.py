@@ -0,0 +1,94 @@
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import httpx
+import pytest
+
+try:
+    from weasyprint.urls import fetch
+    from modules.url_to_pdf import CachedURLFetcher
+except (ImportError, OSError) as e:
+    # WeasyPrint缺少系统库（pango等）时导入会抛出OSError
+    pytest.skip(f"WeasyPrint不可用: {e}", allow_module_level=True)
+
+from utils.http_cache import HTTPCache, CacheStats
+
+CSS = b"body { color: red; }"
+IMAGE = b"\x89PNG\r\n\x1a\nfake"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """/fresh.png 可缓存1小时；/style.css 每次都需重新验证，带ETag时返回304"""
+
+    def do_GET(self):
+        self.server.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/fresh.png":
+            self._send(200, IMAGE, {"Content-Type": "image/png", "Cache-Control": "max-age=3600"})
+        elif self.path == "/style.css":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self._send(304, b"", {"ETag": '"v1"'})
+            else:
+                self._send(200, CSS, {
+                    "Content-Type": "text/css; charset=utf-8", "Cache-Control": "no-cache", "ETag": '"v1"'
+                })
+        else:
+            self._send(404, b"", {})
+
+    def _send(self, status, body, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    httpd.requests = []
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    with httpx.Client() as client:
+        yield CachedURLFetcher(HTTPCache(str(tmp_path)), client, CacheStats())
+
+
+def _get(fetcher, url):
+    """按WeasyPrint内部的方式调用获取器，返回 (正文, 类型, 字符集)"""
+    with fetch(fetcher, url) as response:
+        return response.read(), response.content_type, response.charset
+
+
+def test_fresh_entry_is_served_from_cache(server, fetcher):
+    url = f"http://127.0.0.1:{server.server_address[1]}/fresh.png"
+    assert _get(fetcher, url) == (IMAGE, "image/png", None)
+    assert _get(fetcher, url) == (IMAGE, "image/png", None)
+
+    assert [path for path, _ in server.requests] == ["/fresh.png"]
+    stats = fetcher.stats.as_dict()
+    assert (stats["misses"], stats["hits"]) == (1, 1)
+
+
+def test_stale_entry_is_revalidated_with_etag(server, fetcher):
+    url = f"http://127.0.0.1:{server.server_address[1]}/style.css"
+    assert _get(fetcher, url) == (CSS, "text/css", "utf-8")
+    assert _get(fetcher, url) == (CSS, "text/css", "utf-8")
+
+    assert server.requests == [("/style.css", None), ("/style.css", '"v1"')]
+    stats = fetcher.stats.as_dict()
+    assert (stats["misses"], stats["revalidated"]) == (1, 1)
+
+
+def test_non_http_urls_use_default_fetcher(fetcher):
+    body, content_type, _ = _get(fetcher, "data:text/plain;base64,aGVsbG8=")
+    assert (body, content_type) == (b"hello", "text/plain")
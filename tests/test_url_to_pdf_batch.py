@@ -0,0 +1,115 @@
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+try:
+    from modules.url_to_pdf import URLToPDFConverter
+except (ImportError, OSError) as e:
+    # WeasyPrint缺少系统库（pango等）时导入会抛出OSError
+    pytest.skip(f"WeasyPrint不可用: {e}", allow_module_level=True)
+
+
+PAGE = b"<html><body><h1>batch</h1><p>content</p></body></html>"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """/page/N 延迟返回页面并记录并发数；/flaky 第一次返回503；/missing 返回404"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+            hits = server.hits[self.path]
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        try:
+            if self.path.startswith("/page/"):
+                time.sleep(0.2)
+                self._send(200, PAGE)
+            elif self.path == "/flaky":
+                self._send(503 if hits == 1 else 200, PAGE)
+            else:
+                self._send(404, b"not found")
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.daemon_threads = True
+    httpd.lock = threading.Lock()
+    httpd.hits = {}
+    httpd.active = 0
+    httpd.max_active = 0
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _base_url(httpd):
+    return f"http://127.0.0.1:{httpd.server_address[1]}"
+
+
+def test_batch_limits_per_host_retries_and_writes_manifest(server, tmp_path):
+    base = _base_url(server)
+    urls = [f"{base}/page/{i}" for i in range(6)] + [f"{base}/flaky", f"{base}/missing"]
+    converter = URLToPDFConverter(cache_dir=None, render_workers=1)
+    try:
+        records = converter.convert_batch(urls, str(tmp_path), per_host=2, retries=2, backoff=0.01)
+    finally:
+        converter.close()
+
+    # 同一主机同时进行的请求不超过per_host
+    assert server.max_active <= 2
+
+    # 清单顺序与输入一致
+    assert [record["url"] for record in records] == urls
+    by_path = {record["url"][len(base):]: record for record in records}
+    for i in range(6):
+        record = by_path[f"/page/{i}"]
+        assert record["status"] == "ok"
+        assert record["attempts"] == 1
+        with open(record["output"], "rb") as f:
+            assert f.read(5) == b"%PDF-"
+
+    # 可重试的状态码重试后成功，其他错误不重试
+    assert by_path["/flaky"]["status"] == "ok"
+    assert by_path["/flaky"]["attempts"] == 2
+    assert server.hits["/flaky"] == 2
+    assert by_path["/missing"]["status"] == "failed"
+    assert by_path["/missing"]["attempts"] == 1
+    assert server.hits["/missing"] == 1
+
+    with open(tmp_path / "manifest.json", encoding="utf-8") as f:
+        assert json.load(f) == records
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_batch_skips_existing_outputs(server, tmp_path):
+    urls = [f"{_base_url(server)}/page/0"]
+    converter = URLToPDFConverter(cache_dir=None, render_workers=1)
+    try:
+        first = converter.convert_batch(urls, str(tmp_path))
+        second = converter.convert_batch(urls, str(tmp_path))
+    finally:
+        converter.close()
+
+    assert first[0]["status"] == "ok"
+    assert second[0]["status"] == "skipped"
+    assert server.hits["/page/0"] == 1
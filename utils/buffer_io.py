@@ -0,0 +1,38 @@
+import os
+
+# 结果文件达到该大小（字节）时，下载在点击时才读取文件，而不是预先读入内存
+DEFERRED_MIN_BYTES = 8 * 1024 * 1024
+
+
+def upload_view(uploaded_file):
+    """返回上传文件内容的memoryview，与上传缓冲区共享内存，不产生副本"""
+    return uploaded_file.getbuffer()
+
+
+def is_in_memory(source):
+    """输入是否为内存中的数据（而不是文件路径）"""
+    return isinstance(source, (bytes, bytearray, memoryview)) or hasattr(source, "read")
+
+
+def save_upload(uploaded_file, file_path):
+    """把上传内容直接从上传缓冲区写入磁盘"""
+    with upload_view(uploaded_file) as view, open(file_path, "wb") as f:
+        f.write(view)
+    return file_path
+
+
+def open_download(file_path):
+    """以二进制流打开结果文件，由Streamlit在点击下载时读取，不先复制一份到内存"""
+    return open(file_path, "rb")
+
+
+def deferred_download(file_path, deferred_min_bytes=DEFERRED_MIN_BYTES):
+    """返回供st.download_button使用的数据
+
+    小文件直接返回bytes；大文件返回一个可调用对象，只在用户点击下载时才打开文件读取，
+    页面重跑时不会把结果读入内存。
+    """
+    if os.path.getsize(file_path) < deferred_min_bytes:
+        with open(file_path, "rb") as f:
+            return f.read()
+    return lambda: open_download(file_path)
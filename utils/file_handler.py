@@ -1,11 +1,20 @@
 import os
 import shutil
+import hashlib
 from datetime import datetime, timedelta
+from utils.result_cache import CACHE_DIR_NAME
+from utils.http_cache import HTTP_CACHE_DIR_NAME
+from utils.buffer_io import save_upload, upload_view
+from utils.temp_storage import TEMP_INDEX_NAME
 
 class FileManager:
-    def __init__(self, base_dir="temp", max_age_hours=24):
+    def __init__(self, base_dir="temp", max_age_hours=24, storage=None):
+        """
+        :param storage: 可选的TempStorage；指定时清理只处理其索引中已过期的条目，不再遍历基础目录
+        """
         self.base_dir = base_dir
         self.max_age_hours = max_age_hours
+        self.storage = storage
         
         # 确保基础目录存在
         os.makedirs(self.base_dir, exist_ok=True)
@@ -16,11 +25,23 @@ class FileManager:
         os.makedirs(session_dir, exist_ok=True)
         return session_dir
     
-    def cleanup_old_files(self):
-        """清理过期文件"""
+    def cleanup_old_files(self, result_cache=None):
+        """清理过期文件
+        :param result_cache: 可选的ResultCache，结果缓存目录由其自身按TTL和容量淘汰；
+            HTTP缓存目录由HTTPCache按容量淘汰
+        :return: 使用TempStorage时返回本轮清理结果（见 TempStorage.reap），否则返回None
+        """
+        if self.storage is not None:
+            result = self.storage.reap()
+            if result_cache is not None:
+                result_cache.evict()
+            return result
+        
         cutoff_time = datetime.now() - timedelta(hours=self.max_age_hours)
         
         for item in os.listdir(self.base_dir):
+            if item in (CACHE_DIR_NAME, HTTP_CACHE_DIR_NAME) or item.startswith(TEMP_INDEX_NAME):
+                continue
             item_path = os.path.join(self.base_dir, item)
             if os.path.getctime(item_path) < cutoff_time.timestamp():
                 try:
@@ -30,13 +51,13 @@ class FileManager:
                         shutil.rmtree(item_path)
                 except Exception as e:
                     print(f"清理文件失败 {item_path}: {str(e)}")
+        
+        if result_cache is not None:
+            result_cache.evict()
     
     def save_uploaded_file(self, uploaded_file, session_dir):
         """保存上传的文件"""
-        file_path = os.path.join(session_dir, uploaded_file.name)
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        return file_path
+        return save_upload(uploaded_file, os.path.join(session_dir, uploaded_file.name))
     
     def get_file_size(self, file_path):
         """获取文件大小（MB）"""
@@ -45,3 +66,77 @@ class FileManager:
     def is_file_allowed(self, file_path, max_size_mb=100):
         """检查文件是否允许（大小限制）"""
         return self.get_file_size(file_path) <= max_size_mb
+
+
+class UploadRegistry:
+    """会话内已保存上传文件的登记表
+
+    以 (file_id, 大小) 为键记录保存路径和内容哈希，Streamlit重跑时直接复用已保存的文件；
+    同一内容重新上传（file_id不同）时按哈希复用。页数等元数据也记录在条目中，只计算一次。
+    """
+
+    UPLOAD_DIR_NAME = "uploads"
+
+    def __init__(self, entries, on_save=None):
+        """
+        :param entries: 保存条目的字典（通常位于st.session_state中，随会话存在）
+        :param on_save: 新保存文件后以其路径调用，如登记到TempStorage
+        """
+        self._entries = entries
+        self._on_save = on_save
+
+    @staticmethod
+    def _key(uploaded_file):
+        return f"{uploaded_file.file_id}:{uploaded_file.size}"
+
+    def register(self, uploaded_file, work_dir):
+        """保存上传文件（已保存过则直接复用）
+        :return: 登记条目，包含 path、sha256、size
+        """
+        key = self._key(uploaded_file)
+        entry = self._entries.get(key)
+        if entry and os.path.exists(entry["path"]):
+            return entry
+
+        # 新的file_id：在内存中计算哈希，内容相同的文件只写一次
+        with upload_view(uploaded_file) as view:
+            sha256 = hashlib.sha256(view).hexdigest()
+        entry = next(
+            (
+                existing for existing in self._entries.values()
+                if existing["sha256"] == sha256 and os.path.exists(existing["path"])
+            ),
+            None
+        )
+        if entry is None:
+            # 按内容哈希分目录，同名的不同文件互不覆盖，文件名保持不变
+            upload_dir = os.path.join(work_dir, self.UPLOAD_DIR_NAME, sha256[:16])
+            os.makedirs(upload_dir, exist_ok=True)
+            entry = {
+                "path": save_upload(uploaded_file, os.path.join(upload_dir, uploaded_file.name)),
+                "sha256": sha256,
+                "size": uploaded_file.size,
+                "metadata": {},
+            }
+            if self._on_save is not None:
+                self._on_save(entry["path"])
+        self._entries[key] = entry
+        return entry
+
+    def find(self, file_path):
+        """按保存路径查找登记条目"""
+        return next((entry for entry in self._entries.values() if entry["path"] == file_path), None)
+
+    def cached(self, file_path, name, compute):
+        """返回该文件缓存的元数据，没有时调用compute()计算并记录
+        :param name: 元数据名称，如 'page_count'
+        """
+        entry = self.find(file_path)
+        if entry is None:
+            return compute()
+        if name not in entry["metadata"]:
+            entry["metadata"][name] = compute()
+        return entry["metadata"][name]
+
+    def clear(self):
+        self._entries.clear()
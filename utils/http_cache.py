@@ -0,0 +1,231 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+
+# HTTP缓存目录名，位于FileManager的基础目录下，清理会话目录时跳过
+HTTP_CACHE_DIR_NAME = "_http_cache"
+
+# 每写入多少个条目检查一次容量，避免每次写入都遍历目录
+EVICT_EVERY = 50
+
+
+class CacheStats:
+    """一次转换中的缓存统计"""
+
+    def __init__(self):
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.bytes_from_cache = 0
+        self.bytes_from_network = 0
+        self._lock = threading.Lock()
+
+    def record(self, outcome, size):
+        """:param outcome: 'hit'（未访问网络）、'revalidated'（304）或 'miss'"""
+        with self._lock:
+            if outcome == "hit":
+                self.hits += 1
+            elif outcome == "revalidated":
+                self.revalidated += 1
+            else:
+                self.misses += 1
+            if outcome == "miss":
+                self.bytes_from_network += size
+            else:
+                self.bytes_from_cache += size
+
+    def merge(self, other):
+        """合并另一份统计（如渲染子进程返回的字典）"""
+        if isinstance(other, CacheStats):
+            other = other.as_dict()
+        with self._lock:
+            for name in ("hits", "revalidated", "misses", "bytes_from_cache", "bytes_from_network"):
+                setattr(self, name, getattr(self, name) + other.get(name, 0))
+
+    def as_dict(self):
+        requests = self.hits + self.revalidated + self.misses
+        return {
+            "hits": self.hits,
+            "revalidated": self.revalidated,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.revalidated) / requests if requests else 0.0,
+            "bytes_from_cache": self.bytes_from_cache,
+            "bytes_from_network": self.bytes_from_network,
+        }
+
+
+class HTTPCache:
+    """URL转PDF使用的HTTP磁盘缓存
+
+    每个URL一个条目文件：首行为JSON头（URL、类型、ETag、Last-Modified、有效期），其后为响应正文；
+    文件修改时间记录最近一次确认内容有效的时间，访问时间用于LRU淘汰。
+    新鲜期内直接使用缓存，过期后带 If-None-Match / If-Modified-Since 重新验证，304时不重新下载。
+    条目以原子替换写入，多个渲染进程可共享同一目录。
+    渲染进程中使用的是pickle副本，写入计数不会传回，由持有缓存的进程调用 note_writes() 触发淘汰。
+    """
+
+    def __init__(self, base_dir="temp", max_size_mb=200, fresh_seconds=3600):
+        self.cache_dir = os.path.join(base_dir, HTTP_CACHE_DIR_NAME)
+        self.max_size = max_size_mb * 1024 * 1024
+        self.fresh_seconds = fresh_seconds
+        self._writes = 0
+
+        # 确保缓存目录存在
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _entry_path(self, url):
+        return os.path.join(self.cache_dir, f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.entry")
+
+    def _read(self, url):
+        """读取条目，返回 (头, 正文, 确认时间)，不存在时返回None"""
+        path = self._entry_path(url)
+        try:
+            with open(path, "rb") as f:
+                header = json.loads(f.readline())
+                body = f.read()
+            stat = os.stat(path)
+            # 更新访问时间，保留确认时间
+            os.utime(path, (time.time(), stat.st_mtime))
+        except (OSError, ValueError):
+            return None
+        if header.get("url") != url:
+            return None
+        return header, body, stat.st_mtime
+
+    def _write(self, url, header, body):
+        path = self._entry_path(url)
+        partial_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        with open(partial_path, "wb") as f:
+            f.write(json.dumps(dict(header, url=url), ensure_ascii=False).encode("utf-8"))
+            f.write(b"\n")
+            f.write(body)
+        os.replace(partial_path, path)
+
+    def _max_age(self, response):
+        """响应的新鲜期：Cache-Control优先，否则使用默认值；不可缓存时返回None"""
+        cache_control = response.headers.get("cache-control", "").lower()
+        if "no-store" in cache_control:
+            return None
+        if "no-cache" in cache_control:
+            return 0
+        match = re.search(r"max-age=(\d+)", cache_control)
+        return int(match.group(1)) if match else self.fresh_seconds
+
+    def _store(self, url, response, body):
+        max_age = self._max_age(response)
+        if max_age is None or response.status_code != 200 or len(body) > self.max_size:
+            return
+        self._write(url, {
+            "final_url": str(response.url),
+            "content_type": response.headers.get("content-type", ""),
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "max_age": max_age,
+        }, body)
+
+    @staticmethod
+    def _conditional_headers(header):
+        headers = {}
+        if header.get("etag"):
+            headers["If-None-Match"] = header["etag"]
+        if header.get("last_modified"):
+            headers["If-Modified-Since"] = header["last_modified"]
+        return headers
+
+    def _lookup(self, url):
+        """返回 (缓存条目, 是否仍在新鲜期内)"""
+        cached = self._read(url)
+        if cached is None:
+            return None, False
+        header, _, validated_at = cached
+        return cached, time.time() - validated_at <= header["max_age"]
+
+    def _handle_response(self, url, cached, response, stats):
+        """处理网络响应，返回 (头, 正文)"""
+        if cached is not None and response.status_code == 304:
+            header, body, _ = cached
+            # 重新验证通过，刷新确认时间
+            path = self._entry_path(url)
+            os.utime(path, (time.time(), time.time()))
+            stats.record("revalidated", len(body))
+            return header, body
+
+        response.raise_for_status()
+        body = response.content
+        self._store(url, response, body)
+        stats.record("miss", len(body))
+        return {
+            "final_url": str(response.url),
+            "content_type": response.headers.get("content-type", ""),
+        }, body
+
+    def fetch(self, client, url, stats):
+        """同步获取URL，返回 (头, 正文)
+        :param client: httpx.Client
+        :param stats: CacheStats
+        """
+        cached, fresh = self._lookup(url)
+        if fresh:
+            stats.record("hit", len(cached[1]))
+            return cached[0], cached[1]
+        headers = self._conditional_headers(cached[0]) if cached else {}
+        response = client.get(url, headers=headers)
+        return self._handle_response(url, cached, response, stats)
+
+    async def fetch_async(self, client, url, stats):
+        """异步获取URL，返回 (头, 正文)
+        :param client: httpx.AsyncClient
+        """
+        cached, fresh = self._lookup(url)
+        if fresh:
+            stats.record("hit", len(cached[1]))
+            return cached[0], cached[1]
+        headers = self._conditional_headers(cached[0]) if cached else {}
+        response = await client.get(url, headers=headers)
+        return self._handle_response(url, cached, response, stats)
+
+    def note_writes(self, count):
+        """记录新写入的条目数（如一次转换的未命中数），累计达到 EVICT_EVERY 时检查容量"""
+        self._writes += count
+        if self._writes >= EVICT_EVERY:
+            self._writes = 0
+            self.evict()
+
+    def evict(self):
+        """按最近访问时间淘汰条目，直到总大小不超过上限
+        :return: 删除的条目数量
+        """
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".entry"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+                entries.append((stat.st_atime, stat.st_size, path))
+            except FileNotFoundError:
+                continue
+
+        removed = 0
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total_size -= size
+        return removed
+
+    def stats(self):
+        """缓存的条目数和占用大小"""
+        sizes = [
+            os.path.getsize(os.path.join(self.cache_dir, name))
+            for name in os.listdir(self.cache_dir) if name.endswith(".entry")
+        ]
+        return {"entries": len(sizes), "size_bytes": sum(sizes)}
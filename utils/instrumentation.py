@@ -0,0 +1,200 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager, nullcontext
+
+# 通用的阶段名；URL转PDF另有 fetch、render
+PARSE = "parse"
+TRANSFORM = "transform"
+SERIALIZE = "serialize"
+WRITE = "write"
+
+
+class Instrumentation:
+    """操作的进度、分阶段计时和字节计数，事件交给一个或多个sink处理
+
+    sink可以实现以下任意方法（缺少的方法直接跳过）：
+        on_start(operation)
+        on_phase(operation, phase, seconds)
+        on_progress(operation, done, total, unit)
+        on_finish(operation, summary)  summary包含 status、seconds、phases、bytes、error
+
+    用法：
+        with instrumentation.operation("compress_pdf"):
+            with instrumentation.phase(PARSE):
+                ...
+            instrumentation.progress(i, total)
+            instrumentation.count_bytes("written", size)
+    """
+
+    enabled = True
+
+    def __init__(self, *sinks):
+        self.sinks = sinks
+        self._local = threading.local()
+
+    def _emit(self, event, *args):
+        for sink in self.sinks:
+            handler = getattr(sink, event, None)
+            if handler is not None:
+                handler(*args)
+
+    @property
+    def _current(self):
+        return getattr(self._local, "current", None)
+
+    @contextmanager
+    def operation(self, name):
+        """一次操作；嵌套调用时并入外层操作（如拆分内部调用的读取）"""
+        if self._current is not None:
+            yield
+            return
+        state = {"name": name, "phases": {}, "bytes": {}}
+        self._local.current = state
+        self._emit("on_start", name)
+        started = time.perf_counter()
+        summary = {"status": "ok", "error": None}
+        try:
+            yield
+        except GeneratorExit:
+            # 生成器式操作（如 iter_split）被调用方提前关闭，不算失败
+            raise
+        except BaseException as e:
+            summary.update(status="failed", error=type(e).__name__)
+            raise
+        finally:
+            self._local.current = None
+            summary.update(
+                seconds=time.perf_counter() - started,
+                phases=state["phases"],
+                bytes=state["bytes"],
+            )
+            self._emit("on_finish", name, summary)
+
+    @contextmanager
+    def phase(self, name):
+        """为操作中的一个阶段计时，同名阶段的耗时累加"""
+        state = self._current
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - started
+            if state is not None:
+                state["phases"][name] = state["phases"].get(name, 0.0) + seconds
+                self._emit("on_phase", state["name"], name, seconds)
+
+    def progress(self, done, total, unit="page"):
+        """上报进度，如第 done / total 页完成"""
+        state = self._current
+        if state is not None:
+            self._emit("on_progress", state["name"], done, total, unit)
+
+    def count_bytes(self, name, count):
+        """累加字节计数，如 'read'、'written'"""
+        state = self._current
+        if state is not None and count:
+            state["bytes"][name] = state["bytes"].get(name, 0) + count
+
+    def count_file(self, name, path):
+        """按文件大小累加字节计数，路径不是文件（如内存数据、可写流）时忽略"""
+        if isinstance(path, str) and os.path.isfile(path):
+            self.count_bytes(name, os.path.getsize(path))
+
+
+class NullInstrumentation:
+    """未启用时使用：所有方法都是空操作，上下文管理器复用同一个对象，不计时也不分配"""
+
+    enabled = False
+
+    _context = nullcontext()
+
+    def operation(self, name):
+        return self._context
+
+    def phase(self, name):
+        return self._context
+
+    def progress(self, done, total, unit="page"):
+        pass
+
+    def count_bytes(self, name, count):
+        pass
+
+    def count_file(self, name, path):
+        pass
+
+
+NULL_INSTRUMENTATION = NullInstrumentation()
+
+
+class StreamlitSink:
+    """更新Streamlit进度条，显示当前阶段；进度只在百分比变化时刷新"""
+
+    PHASE_LABELS = {
+        PARSE: "解析",
+        TRANSFORM: "处理",
+        SERIALIZE: "生成",
+        WRITE: "写入",
+        "fetch": "下载",
+        "render": "渲染",
+    }
+
+    def __init__(self, progress_bar):
+        """:param progress_bar: st.progress() 返回的元素"""
+        self.progress_bar = progress_bar
+        self._percent = -1
+
+    def on_phase(self, operation, phase, seconds):
+        label = f"{self.PHASE_LABELS.get(phase, phase)}完成"
+        self.progress_bar.progress(max(self._percent, 0) / 100, text=label)
+
+    def on_progress(self, operation, done, total, unit):
+        percent = int(done * 100 / total) if total else 100
+        if percent != self._percent:
+            self._percent = percent
+            self.progress_bar.progress(min(percent, 100) / 100, text=f"{done}/{total}")
+
+    def on_finish(self, operation, summary):
+        self.progress_bar.progress(1.0, text="完成" if summary["status"] == "ok" else "失败")
+
+
+class LoggingSink:
+    """以JSON格式写结构化日志；进度每前进 progress_step 才记录一次"""
+
+    def __init__(self, logger=None, level=logging.INFO, progress_step=0.1):
+        self.logger = logger or logging.getLogger("pdf_tools")
+        self.level = level
+        self.progress_step = progress_step
+        self._next_progress = {}
+
+    def _log(self, **fields):
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, json.dumps(fields, ensure_ascii=False))
+
+    def on_start(self, operation):
+        self._next_progress[operation] = 0.0
+        self._log(event="start", operation=operation)
+
+    def on_phase(self, operation, phase, seconds):
+        self._log(event="phase", operation=operation, phase=phase, seconds=round(seconds, 6))
+
+    def on_progress(self, operation, done, total, unit):
+        fraction = done / total if total else 1.0
+        if fraction >= self._next_progress.get(operation, 0.0) or done == total:
+            self._next_progress[operation] = fraction + self.progress_step
+            self._log(event="progress", operation=operation, done=done, total=total, unit=unit)
+
+    def on_finish(self, operation, summary):
+        self._next_progress.pop(operation, None)
+        self._log(
+            event="finish",
+            operation=operation,
+            status=summary["status"],
+            error=summary["error"],
+            seconds=round(summary["seconds"], 6),
+            phases={name: round(seconds, 6) for name, seconds in summary["phases"].items()},
+            bytes=summary["bytes"],
+        )
@@ -0,0 +1,216 @@
+import os
+import json
+import time
+import uuid
+import importlib
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from utils.instrumentation import Instrumentation
+from utils.telemetry import error_class
+
+# 可提交为后台任务的对象: 名称 -> (模块, 类名)
+JOB_TARGETS = {
+    "processor": ("modules.pdf_processor", "PDFProcessor"),
+    "converter": ("modules.pdf_converter", "PDFConverter"),
+}
+
+# 任务状态
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+
+def _cancel_path(job_path):
+    """取消标记文件：与状态文件分开保存，任务进程写回状态时不会覆盖取消"""
+    return f"{os.path.splitext(job_path)[0]}.cancel"
+
+
+def _read_status(job_path):
+    with open(job_path, "r", encoding="utf-8") as f:
+        status = json.load(f)
+    if status["state"] != CANCELLED:
+        try:
+            cancelled_at = os.path.getmtime(_cancel_path(job_path))
+        except FileNotFoundError:
+            return status
+        status.update(state=CANCELLED, finished_at=cancelled_at)
+    return status
+
+
+def _write_status(job_path, status):
+    """先写临时文件再原子替换，轮询方不会读到写了一半的状态"""
+    partial_path = f"{job_path}.{os.getpid()}.{threading.get_ident()}.part"
+    with open(partial_path, "w", encoding="utf-8") as f:
+        json.dump(status, f, ensure_ascii=False)
+    os.replace(partial_path, job_path)
+
+
+def _update_status(job_path, **changes):
+    """更新状态；已结束（完成、失败、取消）的任务状态不再改变"""
+    status = _read_status(job_path)
+    if status["state"] not in ACTIVE_STATES:
+        return status
+    status.update(changes)
+    _write_status(job_path, status)
+    return status
+
+
+def update_progress(job_path, progress):
+    """在任务进程内上报进度 (0-1)"""
+    _update_status(job_path, progress=max(0.0, min(1.0, progress)))
+
+
+class JobProgressSink:
+    """把instrumentation的进度写入任务状态文件，页面轮询时显示；至少间隔interval秒写一次"""
+
+    def __init__(self, job_path, interval=0.5):
+        self.job_path = job_path
+        self.interval = interval
+        self._last_write = 0.0
+
+    def on_progress(self, operation, done, total, unit):
+        now = time.monotonic()
+        if total and now - self._last_write >= self.interval:
+            self._last_write = now
+            update_progress(self.job_path, done / total)
+
+
+def _run_job(job_path, target, method, args, kwargs):
+    """在工作进程中执行任务并把结果写入状态文件"""
+    # 排队期间已被取消
+    if _read_status(job_path)["state"] == CANCELLED:
+        return
+
+    _update_status(job_path, state=RUNNING, started_at=time.time())
+    try:
+        module_name, class_name = JOB_TARGETS[target]
+        instance = getattr(importlib.import_module(module_name), class_name)(
+            instrumentation=Instrumentation(JobProgressSink(job_path))
+        )
+        result = getattr(instance, method)(*args, **kwargs)
+    except Exception as e:
+        _update_status(job_path, state=FAILED, error=str(e), error_type=error_class(e), finished_at=time.time())
+        return
+
+    # 运行期间被取消时丢弃结果
+    if _read_status(job_path)["state"] == CANCELLED:
+        return
+    _update_status(job_path, state=DONE, progress=1.0, result=result, finished_at=time.time())
+
+
+class JobManager:
+    """在有界进程池中运行PDFProcessor/PDFConverter操作
+
+    任务状态以JSON保存在会话工作目录的 jobs 子目录下，页面按任务ID轮询；
+    每个会话同时进行的任务数量受限，避免少数用户占满进程池。
+    """
+
+    def __init__(self, max_workers=None, max_jobs_per_session=2):
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) // 2)
+        self.max_jobs_per_session = max_jobs_per_session
+        self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._futures = {}
+        self._lock = threading.Lock()
+
+    def _job_dir(self, work_dir):
+        job_dir = os.path.join(work_dir, "jobs")
+        os.makedirs(job_dir, exist_ok=True)
+        return job_dir
+
+    def _job_path(self, work_dir, job_id):
+        return os.path.join(self._job_dir(work_dir), f"{job_id}.json")
+
+    def submit(self, work_dir, target, method, *args, **kwargs):
+        """提交任务
+        :param work_dir: 会话工作目录
+        :param target: 'processor' 或 'converter'
+        :param method: 要调用的方法名，如 'pdf_to_word'
+        :return: 任务ID
+        """
+        if target not in JOB_TARGETS:
+            raise ValueError(f"未知的任务对象: {target}")
+
+        with self._lock:
+            if len(self.active_jobs(work_dir)) >= self.max_jobs_per_session:
+                raise RuntimeError(f"当前会话已有 {self.max_jobs_per_session} 个任务在运行，请稍后再试")
+
+            job_id = uuid.uuid4().hex
+            job_path = self._job_path(work_dir, job_id)
+            _write_status(job_path, {
+                "id": job_id,
+                "target": target,
+                "method": method,
+                "state": QUEUED,
+                "progress": 0.0,
+                "result": None,
+                "error": None,
+                "submitted_at": time.time(),
+            })
+            self._futures[job_id] = self._executor.submit(_run_job, job_path, target, method, args, kwargs)
+        return job_id
+
+    def status(self, work_dir, job_id):
+        """读取任务状态"""
+        job_path = self._job_path(work_dir, job_id)
+        status = _read_status(job_path)
+
+        future = self._futures.get(job_id)
+        if status["state"] in ACTIVE_STATES:
+            if future is None:
+                # 服务重启后遗留的任务不会再被执行
+                status = _update_status(job_path, state=FAILED, error="任务已丢失（服务已重启）", error_type="JobLost")
+            elif future.done() and future.exception() is not None:
+                status = _update_status(
+                    job_path, state=FAILED, error=str(future.exception()),
+                    error_type=error_class(future.exception()), finished_at=time.time()
+                )
+
+        # 已取消但仍在执行的任务保留future，直到工作进程真正结束
+        if status["state"] not in ACTIVE_STATES and (future is None or future.done()):
+            self._futures.pop(job_id, None)
+        return status
+
+    def cancel(self, work_dir, job_id):
+        """取消任务；已开始执行的任务会在完成后丢弃结果
+        :return: 任务是否在开始前被取消
+        """
+        job_path = self._job_path(work_dir, job_id)
+        status = _read_status(job_path)
+        if status["state"] not in ACTIVE_STATES:
+            return False
+
+        future = self._futures.get(job_id)
+        cancelled_before_start = future is not None and future.cancel()
+        # 不读改写状态文件：任务进程可能同时在写进度或结果
+        open(_cancel_path(job_path), "w").close()
+        return cancelled_before_start
+
+    def active_jobs(self, work_dir):
+        """返回会话中排队或运行中的任务ID；已取消但仍占用工作进程的任务也计入，取消后立即重新提交不能绕过数量限制"""
+        active = []
+        job_dir = self._job_dir(work_dir)
+        for name in os.listdir(job_dir):
+            if not name.endswith(".json"):
+                continue
+            job_id = name[:-len(".json")]
+            try:
+                if self.status(work_dir, job_id)["state"] in ACTIVE_STATES or self._occupies_worker(job_id):
+                    active.append(job_id)
+            except (OSError, ValueError):
+                continue
+        return active
+
+    def _occupies_worker(self, job_id):
+        future = self._futures.get(job_id)
+        return future is not None and not future.done()
+
+    def queue_depth(self):
+        """进程池中尚未结束的任务数量"""
+        with self._lock:
+            return sum(1 for future in self._futures.values() if not future.done())
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
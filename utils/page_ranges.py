@@ -0,0 +1,45 @@
+def _parse_part(part, page_count):
+    """解析单个片段：'5'、'3-7'，以及需要总页数的 '5-'（到末页）和 '-3'（从第1页）"""
+    start, dash, end = part.partition("-")
+    start, end = start.strip(), end.strip()
+    if not dash:
+        return int(start), int(start)
+    if not start and not end:
+        raise ValueError
+    if not end:
+        if page_count is None:
+            raise ValueError
+        end = page_count
+    return int(start or 1), int(end)
+
+
+def parse_ranges(expression, page_count=None):
+    """解析页码范围表达式，如 '1-3,4,5-9' -> [(1, 3), (4, 4), (5, 9)]，保持顺序
+    :param page_count: 总页数；指定时检查范围，并支持 '5-' 表示到最后一页
+    """
+    ranges = []
+    for part in str(expression).split(","):
+        if not part.strip():
+            continue
+        try:
+            start, end = _parse_part(part, page_count)
+        except ValueError:
+            raise ValueError(f"页码格式无效: {part.strip()}")
+        if start < 1 or start > end or (page_count is not None and end > page_count):
+            raise ValueError(f"页码范围无效: {part.strip()}")
+        ranges.append((start, end))
+    if not ranges:
+        raise ValueError("没有指定页码")
+    return ranges
+
+
+def parse_pages(expression, page_count=None):
+    """解析页码表达式，如 '1,3,5-7'；'all' 表示所有页面
+    :return: 'all'，或去重后按顺序排列的页码列表（页码从1开始）
+    """
+    if str(expression).strip().lower() == "all":
+        return "all"
+    pages = set()
+    for start, end in parse_ranges(expression, page_count):
+        pages.update(range(start, end + 1))
+    return sorted(pages)
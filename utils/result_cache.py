@@ -0,0 +1,186 @@
+import os
+import glob
+import json
+import shutil
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# 缓存目录名，位于FileManager的基础目录下，清理会话目录时跳过
+CACHE_DIR_NAME = "_cache"
+
+# 记住内容哈希的输入文件数量上限
+HASH_MEMO_SIZE = 1024
+
+
+class ResultCache:
+    """以输入文件内容哈希和操作参数为键的磁盘结果缓存
+
+    条目的修改时间记录写入时间，用于TTL过期；访问时间在命中时更新，用于LRU淘汰。
+    """
+
+    def __init__(self, base_dir="temp", max_size_mb=500, ttl_hours=24):
+        self.cache_dir = os.path.join(base_dir, CACHE_DIR_NAME)
+        self.max_size = max_size_mb * 1024 * 1024
+        self.ttl_seconds = ttl_hours * 3600
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # 路径 -> (大小, 修改时间, 内容哈希)，同一输入反复操作时不重复读取；按最近使用淘汰
+        self._hash_memo = OrderedDict()
+
+        # 确保缓存目录存在
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def file_hash(file_path, chunk_size=1024 * 1024):
+        """分块计算文件的SHA-256"""
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _input_hash(self, file_path):
+        stat = os.stat(file_path)
+        memo_key = os.path.abspath(file_path)
+        with self._lock:
+            memo = self._hash_memo.get(memo_key)
+            if memo is not None and memo[:2] == (stat.st_size, stat.st_mtime_ns):
+                self._hash_memo.move_to_end(memo_key)
+                return memo[2]
+        digest = self.file_hash(file_path)
+        with self._lock:
+            # 文件变化后同一路径的旧哈希直接被替换
+            self._hash_memo[memo_key] = (stat.st_size, stat.st_mtime_ns, digest)
+            self._hash_memo.move_to_end(memo_key)
+            while len(self._hash_memo) > HASH_MEMO_SIZE:
+                self._hash_memo.popitem(last=False)
+        return digest
+
+    def make_key(self, input_paths, operation, **params):
+        """根据输入文件内容、操作名称和参数生成缓存键
+        :param input_paths: 输入文件路径或路径列表（顺序有意义）
+        :param operation: 操作名称，如 'encrypt_pdf'
+        :param params: 操作参数
+        """
+        if isinstance(input_paths, str):
+            input_paths = [input_paths]
+        description = json.dumps(
+            {
+                "inputs": [self._input_hash(path) for path in input_paths],
+                "operation": operation,
+                "params": params,
+            },
+            sort_keys=True,
+            default=str,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(description.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """查找缓存条目，命中时返回缓存文件路径，否则返回None"""
+        now = time.time()
+        for path in glob.glob(os.path.join(self.cache_dir, f"{key}.*")):
+            if path.endswith(".part"):
+                continue
+            try:
+                stat = os.stat(path)
+                if now - stat.st_mtime > self.ttl_seconds:
+                    os.remove(path)
+                    continue
+                # 更新访问时间，保留写入时间
+                os.utime(path, (now, stat.st_mtime))
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self.hits += 1
+            return path
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, result_path):
+        """将结果文件移入缓存并返回缓存文件路径"""
+        # 超过缓存上限的结果不缓存，直接返回原文件
+        if os.path.getsize(result_path) > self.max_size:
+            return result_path
+
+        ext = os.path.splitext(result_path)[1] or ".bin"
+        cached_path = os.path.join(self.cache_dir, f"{key}{ext}")
+
+        # 先写临时文件再原子替换，避免并发读取到不完整的条目
+        partial_path = f"{cached_path}.{os.getpid()}.{threading.get_ident()}.part"
+        try:
+            # 结果与缓存通常在同一文件系统，直接移动不复制数据；调用方此后使用返回的缓存路径
+            os.replace(result_path, partial_path)
+        except OSError:
+            shutil.copyfile(result_path, partial_path)
+        os.replace(partial_path, cached_path)
+
+        self.evict(keep=cached_path)
+        return cached_path
+
+    def get_or_compute(self, input_paths, operation, compute, **params):
+        """命中时直接返回缓存结果，否则调用compute()生成结果并写入缓存
+        :param compute: 无参数的可调用对象，返回结果文件路径
+        """
+        key = self.make_key(input_paths, operation, **params)
+        cached_path = self.get(key)
+        if cached_path:
+            return cached_path
+        return self.put(key, compute())
+
+    def evict(self, keep=None):
+        """删除过期条目，并按最近访问时间淘汰直到总大小不超过上限
+        :param keep: 不参与容量淘汰的条目路径（如刚写入的条目）
+        :return: 删除的条目数量
+        """
+        now = time.time()
+        removed = 0
+        entries = []
+
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+                if now - stat.st_mtime > self.ttl_seconds:
+                    os.remove(path)
+                    removed += 1
+                elif not name.endswith(".part"):
+                    entries.append((stat.st_atime, stat.st_size, path))
+            except FileNotFoundError:
+                continue
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+        return removed
+
+    def stats(self):
+        """返回命中统计和缓存占用"""
+        entries = [
+            os.path.join(self.cache_dir, name)
+            for name in os.listdir(self.cache_dir)
+            if not name.endswith(".part")
+        ]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(entries),
+            "size_bytes": sum(os.path.getsize(path) for path in entries if os.path.exists(path)),
+        }
@@ -1,11 +1,15 @@
 import streamlit as st
 import uuid
 import os
+import shutil
 from datetime import datetime
+from utils.file_handler import UploadRegistry
 
 class SessionManager:
-    def initialize_session(self):
-        """初始化会话状态"""
+    def initialize_session(self, storage=None):
+        """初始化会话状态
+        :param storage: 可选的TempStorage，登记会话目录并顺延其过期时间
+        """
         if 'session_id' not in st.session_state:
             st.session_state.session_id = str(uuid.uuid4())
             
@@ -16,6 +20,12 @@ class SessionManager:
             
         if 'created_at' not in st.session_state:
             st.session_state.created_at = datetime.now()
+            
+        if 'uploads' not in st.session_state:
+            st.session_state.uploads = {}
+        
+        if storage is not None:
+            storage.touch_session(st.session_state.session_id, st.session_state.work_dir)
     
     def get_session_id(self):
         """获取会话ID"""
@@ -25,8 +35,24 @@ class SessionManager:
         """获取工作目录"""
         return st.session_state.work_dir
     
-    def clear_session(self):
-        """清理会话数据"""
+    def get_upload_registry(self, storage=None):
+        """获取会话的上传文件登记表
+        :param storage: 可选的TempStorage，新保存的上传文件计入会话配额
+        """
+        on_save = None
+        if storage is not None:
+            session_id = st.session_state.session_id
+            on_save = lambda path: storage.track(session_id, path)
+        return UploadRegistry(st.session_state.uploads, on_save)
+    
+    def clear_session(self, storage=None):
+        """清理会话数据
+        :param storage: 可选的TempStorage；指定时同时删除会话中登记的全部文件（包括子目录中的输出）
+        :return: TempStorage回收的字节数，未指定storage时为0
+        """
+        reclaimed = 0
+        if storage is not None and 'session_id' in st.session_state:
+            reclaimed = storage.clear_session(st.session_state.session_id)
         if 'work_dir' in st.session_state:
             work_dir = st.session_state.work_dir
             if os.path.exists(work_dir):
@@ -35,8 +61,12 @@ class SessionManager:
                         item_path = os.path.join(work_dir, item)
                         if os.path.isfile(item_path):
                             os.remove(item_path)
+                    shutil.rmtree(os.path.join(work_dir, UploadRegistry.UPLOAD_DIR_NAME), ignore_errors=True)
                 except Exception as e:
                     print(f"清理会话文件失败: {str(e)}")
+        if 'uploads' in st.session_state:
+            st.session_state.uploads.clear()
+        return reclaimed
     
     def is_session_expired(self, max_age_hours=24):
         """检查会话是否过期"""
@@ -0,0 +1,257 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# 延迟直方图的桶上界（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# 输入/输出大小直方图的桶上界（字节），1KB 到 1GB，每档4倍
+SIZE_BUCKETS = tuple(1024 * 4 ** i for i in range(11))
+
+
+def error_class(exc):
+    """异常的类别名；处理器把原始异常包装为 Exception("...失败: ...")，取异常链最底层的类型"""
+    while True:
+        inner = exc.__cause__ or exc.__context__
+        if inner is None:
+            return type(exc).__name__
+        exc = inner
+
+
+def size_of(value):
+    """文件路径、路径列表、字节串、字节数或文件对象的大小，无法确定时返回None"""
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return os.path.getsize(value) if os.path.isfile(value) else None
+    if isinstance(value, (list, tuple)):
+        sizes = [size_of(item) for item in value]
+        return sum(size for size in sizes if size is not None) if any(size is not None for size in sizes) else None
+    if hasattr(value, "seek") and hasattr(value, "tell"):
+        position = value.tell()
+        size = value.seek(0, os.SEEK_END)
+        value.seek(position)
+        return size
+    return None
+
+
+def _number(value):
+    return str(int(value)) if float(value).is_integer() else repr(round(float(value), 6))
+
+
+class Histogram:
+    """固定桶的直方图，导出时按Prometheus语义累计（le桶包含不超过上界的观测）"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.counts):
+            self.counts[index] += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{_number(bound)}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{name}_sum{{{labels}}} {_number(self.sum)}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class Span:
+    """track() 中的一次操作，调用方在操作完成后记录输出"""
+
+    __slots__ = ("input_size", "output_size")
+
+    def __init__(self, input_size=None):
+        self.input_size = input_size
+        self.output_size = None
+
+    def set_output(self, result):
+        """:param result: 输出文件路径、路径列表、字节数或文件对象"""
+        self.output_size = size_of(result)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.server.telemetry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Telemetry:
+    """按 (页面, 操作) 统计请求数、错误类别、延迟和输入/输出大小，导出为Prometheus文本格式
+
+    导出方式（可同时使用）：
+        metrics_path - 每次记录后原子替换该文件（node_exporter textfile格式）
+        serve(port)  - 在后台线程提供 /metrics 抓取端点
+    也可作为instrumentation的sink（实现了on_phase），累计各操作阶段的耗时。
+    所有计数只在当前进程内累计。
+    """
+
+    def __init__(self, metrics_path=None, prefix="pdf_tools"):
+        self.metrics_path = metrics_path
+        self.prefix = prefix
+        self._requests = {}  # (页面, 操作, 状态) -> 次数
+        self._errors = {}  # (页面, 操作, 异常类别) -> 次数
+        self._latency = {}  # (页面, 操作) -> Histogram
+        self._queue_latency = {}  # (页面, 操作) -> Histogram，后台任务排队时间
+        self._sizes = {}  # (页面, 操作, input/output) -> Histogram
+        self._phases = {}  # (操作, 阶段) -> 秒
+        self._gauges = {}  # 名称 -> (说明, 取值函数)
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._server = None
+
+    def register_gauge(self, name, callback, help_text=""):
+        """导出时调用callback取当前值，如后台任务的队列深度"""
+        self._gauges[name] = (help_text, callback)
+
+    @contextmanager
+    def track(self, page, operation, input=None):
+        """计时一次同步操作；异常照常抛出，同时按类别计数
+        :param input: 输入文件路径（或路径列表），用于记录输入大小
+        :return: Span，调用方用 set_output() 记录输出
+        """
+        span = Span(size_of(input))
+        started = time.perf_counter()
+        try:
+            yield span
+        except Exception as e:
+            self.record(
+                page, operation, time.perf_counter() - started,
+                status="failed", error=error_class(e), input_size=span.input_size
+            )
+            raise
+        self.record(
+            page, operation, time.perf_counter() - started,
+            input_size=span.input_size, output_size=span.output_size
+        )
+
+    def record(self, page, operation, seconds=None, status="ok", error=None, input_size=None, output_size=None,
+               queue_seconds=None):
+        """记录一次操作
+        :param seconds: 总耗时；为None时（如缓存命中、被拒绝）只计数，不计入延迟直方图
+        :param status: 'ok'、'failed'、'cached'、'rejected'、'cancelled'
+        :param error: 失败时的异常类别
+        :param queue_seconds: 后台任务在队列中等待的时间
+        """
+        key = (page, operation)
+        with self._lock:
+            self._requests[key + (status,)] = self._requests.get(key + (status,), 0) + 1
+            if error:
+                self._errors[key + (error,)] = self._errors.get(key + (error,), 0) + 1
+            if seconds is not None:
+                self._latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            if queue_seconds is not None:
+                self._queue_latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(queue_seconds)
+            for direction, size in (("input", input_size), ("output", output_size)):
+                if size is not None:
+                    self._sizes.setdefault(key + (direction,), Histogram(SIZE_BUCKETS)).observe(size)
+        if self.metrics_path:
+            self.write()
+
+    def on_phase(self, operation, phase, seconds):
+        with self._lock:
+            self._phases[(operation, phase)] = self._phases.get((operation, phase), 0.0) + seconds
+
+    def render(self):
+        """当前指标的Prometheus文本格式"""
+        p = self.prefix
+        lines = []
+        with self._lock:
+            lines.append(f"# HELP {p}_requests_total 各页面操作的请求数，按结果状态区分")
+            lines.append(f"# TYPE {p}_requests_total counter")
+            for (page, operation, status), count in sorted(self._requests.items()):
+                lines.append(f'{p}_requests_total{{page="{page}",operation="{operation}",status="{status}"}} {count}')
+
+            lines.append(f"# HELP {p}_errors_total 失败的操作，按异常类别区分")
+            lines.append(f"# TYPE {p}_errors_total counter")
+            for (page, operation, error), count in sorted(self._errors.items()):
+                lines.append(f'{p}_errors_total{{page="{page}",operation="{operation}",error="{error}"}} {count}')
+
+            lines.append(f"# HELP {p}_request_seconds 操作耗时（后台任务为提交到完成）")
+            lines.append(f"# TYPE {p}_request_seconds histogram")
+            for (page, operation), histogram in sorted(self._latency.items()):
+                lines.extend(histogram.lines(f"{p}_request_seconds", f'page="{page}",operation="{operation}"'))
+
+            lines.append(f"# HELP {p}_queue_seconds 后台任务的排队时间")
+            lines.append(f"# TYPE {p}_queue_seconds histogram")
+            for (page, operation), histogram in sorted(self._queue_latency.items()):
+                lines.extend(histogram.lines(f"{p}_queue_seconds", f'page="{page}",operation="{operation}"'))
+
+            lines.append(f"# HELP {p}_file_bytes 输入和输出文件大小")
+            lines.append(f"# TYPE {p}_file_bytes histogram")
+            for (page, operation, direction), histogram in sorted(self._sizes.items()):
+                labels = f'page="{page}",operation="{operation}",direction="{direction}"'
+                lines.extend(histogram.lines(f"{p}_file_bytes", labels))
+
+            lines.append(f"# HELP {p}_phase_seconds_total 各操作阶段的累计耗时")
+            lines.append(f"# TYPE {p}_phase_seconds_total counter")
+            for (operation, phase), seconds in sorted(self._phases.items()):
+                lines.append(f'{p}_phase_seconds_total{{operation="{operation}",phase="{phase}"}} {seconds:.6f}')
+
+        for name, (help_text, callback) in sorted(self._gauges.items()):
+            try:
+                value = callback()
+            except Exception:
+                continue
+            if help_text:
+                lines.append(f"# HELP {p}_{name} {help_text}")
+            lines.append(f"# TYPE {p}_{name} gauge")
+            lines.append(f"{p}_{name} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path=None):
+        """把当前指标原子写入文件"""
+        path = path or self.metrics_path
+        text = self.render()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._write_lock:
+            partial_path = f"{path}.{os.getpid()}.part"
+            with open(partial_path, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(partial_path, path)
+
+    def serve(self, port, host="127.0.0.1"):
+        """在后台线程启动 /metrics 抓取端点
+        :return: 实际监听的端口（port为0时由系统分配）
+        """
+        if self._server is None:
+            self._server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            self._server.daemon_threads = True
+            self._server.telemetry = self
+            threading.Thread(target=self._server.serve_forever, name="metrics-endpoint", daemon=True).start()
+        return self._server.server_address[1]
+
+    def close(self):
+        """停止抓取端点"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
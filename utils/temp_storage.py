@@ -0,0 +1,440 @@
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from utils.result_cache import CACHE_DIR_NAME
+from utils.http_cache import HTTP_CACHE_DIR_NAME
+
+# 索引数据库文件名，位于基础目录下，清理会话目录时跳过
+TEMP_INDEX_NAME = "_temp_index.sqlite3"
+
+# 会话过期时仍有文件被pin，推迟这么久后再检查
+PINNED_SESSION_RETRY_SECONDS = 60
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    session TEXT PRIMARY KEY,
+    dir TEXT,
+    bytes INTEGER NOT NULL DEFAULT 0,
+    last_seen REAL NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    session TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    added REAL NOT NULL,
+    expires REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_expires ON files (expires);
+CREATE INDEX IF NOT EXISTS files_added ON files (added);
+CREATE INDEX IF NOT EXISTS files_session ON files (session, added);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+
+def _remove_tree(path):
+    """删除目录树
+    :return: (删除的字节数, 删除的文件数)
+    """
+    removed_bytes = removed_files = 0
+    for root, dirs, files in os.walk(path, topdown=False):
+        for name in files:
+            file_path = os.path.join(root, name)
+            try:
+                size = os.path.getsize(file_path)
+                os.remove(file_path)
+                removed_bytes += size
+                removed_files += 1
+            except OSError:
+                continue
+        for name in dirs:
+            try:
+                os.rmdir(os.path.join(root, name))
+            except OSError:
+                continue
+    try:
+        os.rmdir(path)
+    except OSError:
+        pass
+    return removed_bytes, removed_files
+
+
+class TempStorage:
+    """临时文件空间管理：会话配额、全局预算和按过期时间索引的持久记录
+
+    会话目录和其中登记的文件记录在基础目录下的SQLite索引中，过期时间建有索引，
+    清理只查询已过期的条目（与过期条目数成正比），不再遍历整个基础目录；
+    会话超出配额或全部会话超出预算时，按登记时间淘汰最早的文件；后台任务正在使用的文件（pin）不会被淘汰，
+    其所在的会话过期时也推迟删除。
+    结果缓存和HTTP缓存目录由各自按容量淘汰，不计入预算。
+    """
+
+    def __init__(self, base_dir="temp", session_quota_mb=500, budget_mb=5 * 1024, session_ttl_hours=24,
+                 file_ttl_hours=None, touch_interval=60, reap_batch=200):
+        """
+        :param session_quota_mb: 每个会话登记文件的总大小上限
+        :param budget_mb: 所有会话登记文件的总大小上限
+        :param session_ttl_hours: 会话最后一次访问后的保留时间，过期后删除整个会话目录
+        :param file_ttl_hours: 登记文件的保留时间，默认与会话相同
+        :param touch_interval: 同一会话刷新访问时间的最小间隔（秒），避免每次重跑都写索引
+        :param reap_batch: 每轮清理最多处理的过期文件数和会话数
+        """
+        self.base_dir = base_dir
+        self.session_quota = session_quota_mb * 1024 * 1024
+        self.budget = budget_mb * 1024 * 1024
+        self.session_ttl = session_ttl_hours * 3600
+        self.file_ttl = (file_ttl_hours if file_ttl_hours is not None else session_ttl_hours) * 3600
+        self.touch_interval = touch_interval
+        self.reap_batch = reap_batch
+        self._lock = threading.Lock()
+        # 会话 -> 上次写入访问时间
+        self._touched = {}
+        # 任务ID -> (正在使用的文件路径, 失效时间)
+        self._pins = {}
+        self._reaper = None
+        self._stop = threading.Event()
+
+        os.makedirs(base_dir, exist_ok=True)
+        index_path = os.path.join(base_dir, TEMP_INDEX_NAME)
+        is_new = not os.path.exists(index_path)
+        # 多个服务进程共用同一索引时由SQLite的文件锁串行化写入
+        self._db = sqlite3.connect(index_path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        if is_new:
+            self._adopt_existing()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    @staticmethod
+    def _add(db, name, delta):
+        if delta:
+            db.execute(
+                "INSERT INTO counters (name, value) VALUES (?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+                (name, delta)
+            )
+
+    def _adopt_existing(self):
+        """首次创建索引时登记基础目录中已有的会话目录和文件，按创建时间计算过期时间（只执行一次）"""
+        with self._transaction() as db:
+            for name in os.listdir(self.base_dir):
+                if name in (CACHE_DIR_NAME, HTTP_CACHE_DIR_NAME) or name.startswith(TEMP_INDEX_NAME):
+                    continue
+                path = os.path.join(self.base_dir, name)
+                try:
+                    created = os.path.getctime(path)
+                    if os.path.isdir(path):
+                        db.execute(
+                            "INSERT OR IGNORE INTO sessions (session, dir, last_seen, expires) VALUES (?, ?, ?, ?)",
+                            (name, path, created, created + self.session_ttl)
+                        )
+                    else:
+                        size = os.path.getsize(path)
+                        db.execute(
+                            "INSERT OR IGNORE INTO files (path, session, size, added, expires) VALUES (?, '', ?, ?, ?)",
+                            (os.path.abspath(path), size, created, created + self.file_ttl)
+                        )
+                        self._add(db, "usage_bytes", size)
+                except OSError:
+                    continue
+
+    def touch_session(self, session_id, work_dir):
+        """登记会话目录并顺延其过期时间；同一会话在touch_interval内只写一次索引"""
+        now = time.time()
+        if now - self._touched.get(session_id, 0) < self.touch_interval:
+            return
+        self._touched[session_id] = now
+        with self._transaction() as db:
+            db.execute(
+                "INSERT INTO sessions (session, dir, last_seen, expires) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(session) DO UPDATE SET dir = excluded.dir, last_seen = excluded.last_seen, "
+                "expires = excluded.expires",
+                (session_id, work_dir, now, now + self.session_ttl)
+            )
+
+    def _session_dir(self, session_id, path):
+        """文件所在的会话目录：基础目录下与会话同名的第一级子目录，不在其中时返回None"""
+        relative = os.path.relpath(path, os.path.abspath(self.base_dir))
+        if relative.split(os.sep, 1)[0] != session_id or os.sep not in relative:
+            return None
+        return os.path.join(self.base_dir, session_id)
+
+    def pin(self, job_id, paths, ttl_hours=None):
+        """登记后台任务正在使用的文件（如合并的输入），在 unpin 之前配额、预算和过期清理都跳过这些文件
+        :param ttl_hours: 未调用 unpin 时的失效时间，默认与会话保留时间相同
+        """
+        if isinstance(paths, str):
+            paths = [paths]
+        expires = time.time() + (ttl_hours * 3600 if ttl_hours is not None else self.session_ttl)
+        with self._lock:
+            self._pins[job_id] = ({os.path.abspath(path) for path in paths}, expires)
+
+    def unpin(self, job_id):
+        """任务结束后解除 pin"""
+        with self._lock:
+            self._pins.pop(job_id, None)
+
+    def _drop_expired_pins(self):
+        """删除已失效的pin；调用方持有 self._lock"""
+        now = time.time()
+        for job_id in [job_id for job_id, (_, expires) in self._pins.items() if expires <= now]:
+            del self._pins[job_id]
+
+    def _protected(self, keep=None):
+        """淘汰时跳过的路径：刚登记的文件和未失效的pin；调用方持有 self._lock"""
+        self._drop_expired_pins()
+        protected = {keep or ""}
+        for paths, _ in self._pins.values():
+            protected.update(paths)
+        return tuple(protected)
+
+    @staticmethod
+    def _not_in(paths):
+        return f"path NOT IN ({', '.join('?' * len(paths))})"
+
+    def track(self, session_id, path, ttl_hours=None):
+        """登记会话中的文件（已登记时更新大小），随后检查会话配额和全局预算
+        :param ttl_hours: 该文件的保留时间，默认为 file_ttl_hours
+        :return: 为满足配额和预算淘汰的字节数（刚登记的文件不会被淘汰）
+        """
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return 0
+        path = os.path.abspath(path)
+        now = time.time()
+        expires = now + (ttl_hours * 3600 if ttl_hours is not None else self.file_ttl)
+        with self._transaction() as db:
+            row = db.execute("SELECT session, size FROM files WHERE path = ?", (path,)).fetchone()
+            if row is not None and row[0] != session_id:
+                # 其他会话登记过的路径，改为记在当前会话
+                db.execute("UPDATE sessions SET bytes = bytes - ? WHERE session = ?", (row[1], row[0]))
+                self._add(db, "usage_bytes", -row[1])
+                row = None
+            delta = size - (row[1] if row else 0)
+            db.execute(
+                "INSERT INTO files (path, session, size, added, expires) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET session = excluded.session, size = excluded.size, "
+                "expires = excluded.expires",
+                (path, session_id, size, now, expires)
+            )
+            # 未经 touch_session 登记的会话由文件所在目录确定会话目录，过期时整个目录才会被删除
+            db.execute(
+                "INSERT INTO sessions (session, dir, last_seen, expires) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(session) DO UPDATE SET dir = COALESCE(sessions.dir, excluded.dir)",
+                (session_id, self._session_dir(session_id, path), now, now + self.session_ttl)
+            )
+            db.execute("UPDATE sessions SET bytes = bytes + ? WHERE session = ?", (delta, session_id))
+            self._add(db, "usage_bytes", delta)
+            return self._enforce_quota(db, session_id, keep=path) + self._enforce_budget(db, keep=path)
+
+    def _remove_file(self, db, path, session_id, size):
+        """删除登记的文件和索引条目，文件已不存在时只删除条目
+        :return: 实际回收的字节数
+        """
+        try:
+            reclaimed = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            reclaimed = 0
+        except OSError as e:
+            print(f"清理文件失败 {path}: {str(e)}")
+            reclaimed = 0
+        db.execute("DELETE FROM files WHERE path = ?", (path,))
+        db.execute("UPDATE sessions SET bytes = bytes - ? WHERE session = ?", (size, session_id))
+        self._add(db, "usage_bytes", -size)
+        self._add(db, "reclaimed_bytes", reclaimed)
+        self._add(db, "reclaimed_files", 1 if reclaimed else 0)
+        return reclaimed
+
+    def _session_pinned(self, db, session_id, directory):
+        """会话目录中或登记在该会话下的文件是否被pin；调用方持有 self._lock"""
+        self._drop_expired_pins()
+        prefix = os.path.abspath(directory) + os.sep if directory else None
+        for paths, _ in self._pins.values():
+            for path in paths:
+                if prefix and path.startswith(prefix):
+                    return True
+                if db.execute("SELECT 1 FROM files WHERE path = ? AND session = ?", (path, session_id)).fetchone():
+                    return True
+        return False
+
+    def _remove_session(self, db, session_id, directory):
+        """删除会话的全部登记文件和会话目录（包括未登记的文件，如任务状态）
+        :return: 回收的字节数；会话中有文件被pin时不删除，推迟到之后的清理，返回None
+        """
+        if self._session_pinned(db, session_id, directory):
+            db.execute(
+                "UPDATE sessions SET expires = ? WHERE session = ?",
+                (time.time() + PINNED_SESSION_RETRY_SECONDS, session_id)
+            )
+            return None
+        reclaimed = 0
+        for path, size in db.execute("SELECT path, size FROM files WHERE session = ?", (session_id,)).fetchall():
+            reclaimed += self._remove_file(db, path, session_id, size)
+        if directory and os.path.isdir(directory):
+            removed_bytes, removed_files = _remove_tree(directory)
+            self._add(db, "reclaimed_bytes", removed_bytes)
+            self._add(db, "reclaimed_files", removed_files)
+            reclaimed += removed_bytes
+        db.execute("DELETE FROM sessions WHERE session = ?", (session_id,))
+        self._touched.pop(session_id, None)
+        return reclaimed
+
+    def _enforce_quota(self, db, session_id, keep=None):
+        """会话超出配额时按登记时间淘汰该会话最早的文件"""
+        row = db.execute("SELECT bytes FROM sessions WHERE session = ?", (session_id,)).fetchone()
+        used = row[0] if row else 0
+        if used <= self.session_quota:
+            return 0
+        reclaimed = 0
+        protected = self._protected(keep)
+        oldest = db.execute(
+            f"SELECT path, size FROM files WHERE session = ? AND {self._not_in(protected)} ORDER BY added",
+            (session_id, *protected)
+        ).fetchall()
+        for path, size in oldest:
+            if used <= self.session_quota:
+                break
+            reclaimed += self._remove_file(db, path, session_id, size)
+            used -= size
+        return reclaimed
+
+    def _enforce_budget(self, db, keep=None):
+        """全部登记文件超出预算时，按登记时间淘汰最早的文件（不区分会话）"""
+        reclaimed = 0
+        protected = self._protected(keep)
+        while self._counter(db, "usage_bytes") > self.budget:
+            oldest = db.execute(
+                f"SELECT path, session, size FROM files WHERE {self._not_in(protected)} ORDER BY added LIMIT ?",
+                (*protected, self.reap_batch)
+            ).fetchall()
+            if not oldest:
+                break
+            for path, session_id, size in oldest:
+                reclaimed += self._remove_file(db, path, session_id, size)
+                if self._counter(db, "usage_bytes") <= self.budget:
+                    break
+        return reclaimed
+
+    @staticmethod
+    def _counter(db, name):
+        row = db.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else 0
+
+    def reap(self, now=None):
+        """删除已过期的文件和会话，并检查全局预算；每轮最多处理 reap_batch 个文件和会话
+        :return: {'files': 删除的过期文件数, 'sessions': 删除的会话数, 'bytes': 回收的字节数}
+        """
+        now = now or time.time()
+        result = {"files": 0, "sessions": 0, "bytes": 0}
+        with self._transaction() as db:
+            protected = self._protected()
+            expired_files = db.execute(
+                f"SELECT path, session, size FROM files WHERE expires <= ? AND {self._not_in(protected)} "
+                "ORDER BY expires LIMIT ?",
+                (now, *protected, self.reap_batch)
+            ).fetchall()
+            for path, session_id, size in expired_files:
+                result["bytes"] += self._remove_file(db, path, session_id, size)
+                result["files"] += 1
+
+            expired_sessions = db.execute(
+                "SELECT session, dir FROM sessions WHERE expires <= ? ORDER BY expires LIMIT ?",
+                (now, self.reap_batch)
+            ).fetchall()
+            for session_id, directory in expired_sessions:
+                reclaimed = self._remove_session(db, session_id, directory)
+                if reclaimed is not None:
+                    result["bytes"] += reclaimed
+                    result["sessions"] += 1
+
+            result["bytes"] += self._enforce_budget(db)
+        return result
+
+    def clear_session(self, session_id):
+        """删除会话的全部登记文件（被pin的文件除外），会话目录本身保留
+        :return: 回收的字节数
+        """
+        reclaimed = 0
+        with self._transaction() as db:
+            protected = self._protected()
+            for path, size in db.execute(
+                f"SELECT path, size FROM files WHERE session = ? AND {self._not_in(protected)}",
+                (session_id, *protected)
+            ).fetchall():
+                reclaimed += self._remove_file(db, path, session_id, size)
+        return reclaimed
+
+    def start_reaper(self, interval=60):
+        """启动后台清理线程；上一轮达到 reap_batch 时不等待，直接继续清理积压"""
+        if self._reaper is not None:
+            return
+
+        def run():
+            while not self._stop.is_set():
+                try:
+                    result = self.reap()
+                    backlog = result["files"] >= self.reap_batch or result["sessions"] >= self.reap_batch
+                except Exception as e:
+                    print(f"清理临时文件失败: {str(e)}")
+                    backlog = False
+                if not backlog:
+                    self._stop.wait(interval)
+
+        self._stop.clear()
+        self._reaper = threading.Thread(target=run, name="temp-reaper", daemon=True)
+        self._reaper.start()
+
+    def stop(self):
+        """停止后台清理线程"""
+        if self._reaper is not None:
+            self._stop.set()
+            self._reaper.join()
+            self._reaper = None
+
+    def usage(self, session_id=None):
+        """返回空间占用和累计回收量
+        :param session_id: 指定时同时返回该会话的占用（session_bytes）
+        """
+        with self._lock:
+            counters = dict(self._db.execute("SELECT name, value FROM counters").fetchall())
+            sessions = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+            files = self._db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            session_row = self._db.execute(
+                "SELECT bytes FROM sessions WHERE session = ?", (session_id,)
+            ).fetchone() if session_id else None
+        usage = {
+            "usage_bytes": counters.get("usage_bytes", 0),
+            "budget_bytes": self.budget,
+            "session_quota_bytes": self.session_quota,
+            "sessions": sessions,
+            "files": files,
+            "reclaimed_bytes": counters.get("reclaimed_bytes", 0),
+            "reclaimed_files": counters.get("reclaimed_files", 0),
+        }
+        if session_id:
+            usage["session_bytes"] = session_row[0] if session_row else 0
+        return usage
+
+    def close(self):
+        self.stop()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,51 @@
+import os
+import zipfile
+import tempfile
+
+# 已经压缩过的格式直接存储，再次deflate只会浪费CPU
+STORED_EXTENSIONS = {".jpeg", ".jpg", ".jpx", ".jp2", ".jb2", ".zip", ".docx"}
+
+
+class ZipStream:
+    """将内存中的条目直接写入ZIP，不经过中间文件
+
+    归档写入SpooledTemporaryFile：小于spool_max_size时完全在内存中，
+    超过后自动转存到dir下的临时文件，整个结果只写一次、读一次。
+    """
+
+    def __init__(self, spool_max_size=32 * 1024 * 1024, dir=None):
+        self.file = tempfile.SpooledTemporaryFile(max_size=spool_max_size, dir=dir)
+        self.zip = zipfile.ZipFile(self.file, "w")
+        self.count = 0
+
+    def add(self, name, data):
+        """添加一个条目，按扩展名选择存储或deflate压缩"""
+        ext = os.path.splitext(name)[1].lower()
+        compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+        self.zip.writestr(name, data, compress_type=compress_type)
+        self.count += 1
+
+    def add_file(self, path, arcname=None):
+        """添加磁盘上的文件，按扩展名选择存储或deflate压缩"""
+        arcname = arcname or os.path.basename(path)
+        ext = os.path.splitext(arcname)[1].lower()
+        compress_type = zipfile.ZIP_STORED if ext in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+        self.zip.write(path, arcname, compress_type=compress_type)
+        self.count += 1
+
+    def finish(self):
+        """写入中央目录并返回定位到开头的归档文件对象"""
+        self.zip.close()
+        self.file.seek(0)
+        return self.file
+
+    def close(self):
+        self.zip.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.close()